@@ -28,12 +28,31 @@ export interface SearchParams {
 export interface SearchResults {
   places: Place[];
   count: number;
+  total?: number;
+  offset?: number;
+  next_cursor?: string | null;
+  partial?: boolean;
   query: string;
   radius_meters: number;
   center?: {
     lat: number;
     lng: number;
   };
+  groups?: SearchGroup[];
+}
+
+/** Resultados de un centro en search_places_batch (índices sobre SearchResults.places) */
+export interface SearchGroup {
+  label?: string | null;
+  center: {
+    lat: number;
+    lng: number;
+  } | null;
+  error?: string;
+  results: {
+    index: number;
+    distance_meters: number;
+  }[];
 }
 
 export type SearchStatus = 'idle' | 'loading' | 'success' | 'error';
@@ -5,13 +5,14 @@ Sirve el widget HTML y maneja las herramientas MCP para búsqueda de lugares.
 """
 import os
 import sys
-import json
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
@@ -22,18 +23,48 @@ if mcp_server_dir not in sys.path:
     sys.path.insert(0, mcp_server_dir)
 
 # Importar los módulos
-from src.overpass_client import OverpassClient
-from src.nominatim_client import NominatimClient
+from src.offline_poi import create_poi_client
+from src.nominatim_client import NominatimClient, nominatim_rate_limiter, nominatim_single_flight
+from src.overpass_client import overpass_single_flight, overpass_endpoints, ADAPTIVE_MAX_RADIUS, BATCH_MAX_TEXT_CENTERS
+from src.http_client import close_http_client
+from src.geocode_cache import GeocodeCache
+from src.reverse_geocode_cache import ReverseGeocodeCache
+from src.result_cache import OverpassResultCache
+from src.tile_cache import TilePoiCache
+from src.widget_template import WidgetTemplate, WIDGET_INLINE_RESULTS
+from src.json_payload import RawJSON, PayloadJSONResponse, dumps_payload, loads_payload
+from src.progress import ProgressCallback, SseProgressStream
+from src.deadline import Deadline
+from src.search_results import batch_search_results
+from src.pagination import ResultPager, clamp_page_size, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PAGINATION_MAX_PAGES
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Inicializar clientes
-overpass_client = OverpassClient()
-nominatim_client = NominatimClient()
+geocode_cache = GeocodeCache()
+reverse_geocode_cache = ReverseGeocodeCache()
+nominatim_client = NominatimClient(cache=geocode_cache, reverse_cache=reverse_geocode_cache)
+overpass_result_cache = OverpassResultCache()
+tile_poi_cache = TilePoiCache()
+overpass_client = create_poi_client(
+    nominatim_client=nominatim_client,
+    result_cache=overpass_result_cache,
+    tile_cache=tile_poi_cache
+)
+result_pager = ResultPager()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Ciclo de vida de la aplicación: cierra el pool HTTP compartido al apagar."""
+    yield
+    await close_http_client()
+    geocode_cache.close()
+
 
 # Crear aplicación FastAPI
-app = FastAPI(title="MySherlock 🔎 - MCP Server")
+app = FastAPI(title="MySherlock 🔎 - MCP Server", lifespan=lifespan)
 
 # CORS middleware para permitir requests desde ChatGPT
 app.add_middleware(
@@ -54,52 +85,16 @@ WIDGET_DIR = BASE_DIR / "app-ui" / "dist"
 WIDGET_HTML = WIDGET_DIR / "index.html"
 
 
-def load_widget_html(search_results: Dict[str, Any] = None) -> str:
-    """Carga el HTML del widget compilado e inyecta los datos si se proporcionan."""
+widget_template = WidgetTemplate(WIDGET_HTML)
+
+
+def load_widget_html(results_json: Optional[str] = None) -> str:
+    """Devuelve el HTML del widget compilado con los datos (ya serializados) inyectados si se proporcionan."""
     try:
-        if WIDGET_HTML.exists():
-            with open(WIDGET_HTML, "r", encoding="utf-8") as f:
-                html = f.read()
-            
-            # Obtener la URL base del servidor (para producción)
-            import os
-            server_url = os.getenv("RENDER_EXTERNAL_URL", "https://mysherlock-mcp.onrender.com")
-            
-            # Reemplazar rutas absolutas por rutas relativas o con URL base
-            # Para que funcionen cuando se inyecta como recurso
-            html = html.replace('href="/assets/', f'href="{server_url}/assets/')
-            html = html.replace('src="/assets/', f'src="{server_url}/assets/')
-            html = html.replace('href="/vite.svg', f'href="{server_url}/vite.svg')
-            
-            # Si hay datos de búsqueda, inyectarlos en el HTML para que el widget los pueda usar
-            if search_results:
-                import json
-                data_script = f"""
-<script>
-  // Inyectar datos de búsqueda en el widget
-  window.__MYSHERLOCK_SEARCH_RESULTS__ = {json.dumps(search_results, ensure_ascii=False)};
-  
-  // Configurar toolOutput para el SDK de OpenAI Apps
-  if (typeof window !== 'undefined') {{
-    window.openai = window.openai || {{}};
-    window.openai.toolOutput = window.openai.toolOutput || {{}};
-    window.openai.toolOutput.searchResults = {json.dumps(search_results, ensure_ascii=False)};
-  }}
-</script>
-"""
-                # Insertar el script antes del cierre de </head> o al inicio de <body>
-                if '</head>' in html:
-                    html = html.replace('</head>', data_script + '</head>')
-                elif '<body>' in html:
-                    html = html.replace('<body>', '<body>' + data_script)
-                else:
-                    # Si no hay head ni body, añadir al inicio
-                    html = data_script + html
-            
-            return html
-        else:
-            logger.warning(f"Widget HTML no encontrado en {WIDGET_HTML}")
-            return "<html><body><h1>Widget no encontrado. Ejecuta 'npm run build' en app-ui</h1></body></html>"
+        return widget_template.render(results_json)
+    except FileNotFoundError:
+        logger.warning(f"Widget HTML no encontrado en {WIDGET_HTML}")
+        return "<html><body><h1>Widget no encontrado. Ejecuta 'npm run build' en app-ui</h1></body></html>"
     except Exception as e:
         logger.error(f"Error cargando widget HTML: {e}")
         return f"<html><body><h1>Error cargando widget: {e}</h1></body></html>"
@@ -113,7 +108,18 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint para Render.com"""
-    return {"status": "healthy", "service": "MySherlock 🔎"}
+    return {
+        "status": "healthy",
+        "service": "MySherlock 🔎",
+        "nominatim_rate_limiter": nominatim_rate_limiter.stats(),
+        "nominatim_single_flight": nominatim_single_flight.stats(),
+        "overpass_single_flight": overpass_single_flight.stats(),
+        "overpass_endpoints": overpass_endpoints.stats(),
+        "geocode_cache": geocode_cache.stats(),
+        "reverse_geocode_cache": reverse_geocode_cache.stats(),
+        "overpass_result_cache": overpass_result_cache.stats(),
+        "tile_poi_cache": tile_poi_cache.stats()
+    }
 
 
 @app.get("/widget", response_class=HTMLResponse)
@@ -123,12 +129,295 @@ async def get_widget():
     return HTMLResponse(content=html)
 
 
+# Máximo de peticiones en un batch JSON-RPC
+MCP_BATCH_MAX_SIZE = int(os.getenv("MCP_BATCH_MAX_SIZE", "20"))
+# Máximo de centros en search_places_batch y lugares por centro por defecto
+SEARCH_BATCH_MAX_CENTERS = int(os.getenv("SEARCH_BATCH_MAX_CENTERS", "50"))
+SEARCH_BATCH_DEFAULT_LIMIT = 10
+
+# Herramientas MCP expuestas por el servidor
+MCP_TOOLS = [
+    {
+        "name": "search_places",
+        "description": (
+            "Busca lugares (cafeterías, parques, bibliotecas, etc.) cerca de una ubicación "
+            "usando OpenStreetMap y Overpass API. "
+            "Puedes proporcionar coordenadas (lat/lng) o un texto de ubicación (location_text). "
+            "Si solo proporcionas location_text, se geocodificará automáticamente."
+        ),
+        "metadata": {
+            "outputTemplate": "ui://widget/mysherlock.html",
+            "invokingMessage": "Buscando lugares...",
+            "invokedMessage": "Búsqueda completada"
+        },
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": (
+                        "Descripción del tipo de lugar a buscar. "
+                        "Ejemplos: 'cafeterías', 'parques', 'bibliotecas', 'museos', 'restaurantes'. "
+                        "Puedes usar términos en español o inglés. No hace falta si se indica cursor."
+                    )
+                },
+                "lat": {
+                    "type": "number",
+                    "description": "Latitud del centro de búsqueda (opcional si se proporciona location_text)"
+                },
+                "lng": {
+                    "type": "number",
+                    "description": "Longitud del centro de búsqueda (opcional si se proporciona location_text)"
+                },
+                "location_text": {
+                    "type": "string",
+                    "description": (
+                        "Texto de la ubicación (dirección, nombre de lugar, ciudad). "
+                        "Ejemplos: 'Plaza de España, Madrid', 'Sagrada Familia, Barcelona'. "
+                        "Se usará para geocodificar si no se proporcionan lat/lng."
+                    )
+                },
+                "radius_meters": {
+                    "type": "integer",
+                    "description": "Radio de búsqueda en metros. Por defecto: 1000 (1 km)",
+                    "default": 1000
+                },
+                "target_count": {
+                    "type": "integer",
+                    "description": (
+                        "Búsqueda adaptativa: número de lugares que se quiere encontrar. Si se indica, "
+                        "radius_meters es el radio inicial y se amplía por pasos (hasta max_radius_meters) "
+                        "hasta encontrarlos. Útil para peticiones como 'las 10 cafeterías más cercanas'."
+                    ),
+                    "minimum": 1,
+                    "maximum": MAX_PAGE_SIZE
+                },
+                "max_radius_meters": {
+                    "type": "integer",
+                    "description": f"Radio máximo de la búsqueda adaptativa en metros. Por defecto: {ADAPTIVE_MAX_RADIUS}",
+                    "default": ADAPTIVE_MAX_RADIUS
+                },
+                "limit": {
+                    "type": "integer",
+                    "description": f"Número máximo de lugares por página (los más cercanos). Por defecto: {DEFAULT_PAGE_SIZE}",
+                    "default": DEFAULT_PAGE_SIZE,
+                    "minimum": 1,
+                    "maximum": MAX_PAGE_SIZE
+                },
+                "cursor": {
+                    "type": "string",
+                    "description": (
+                        "Cursor de paginación devuelto en 'next_cursor' por una búsqueda anterior. "
+                        "Si se indica, devuelve la siguiente página sin repetir la búsqueda."
+                    )
+                },
+                "include_all_tags": {
+                    "type": "boolean",
+                    "description": "Incluir todos los tags OSM de cada lugar (por defecto solo los más relevantes)",
+                    "default": False
+                }
+            },
+            # query solo es obligatorio en la primera página (con cursor se ignora)
+            "anyOf": [
+                {"required": ["query", "lat", "lng"]},
+                {"required": ["query", "location_text"]},
+                {"required": ["cursor"]}
+            ]
+        }
+    },
+    {
+        "name": "search_places_batch",
+        "description": (
+            "Busca el mismo tipo de lugar alrededor de varios puntos a la vez "
+            "(por ejemplo, farmacias cerca de cada uno de varios hoteles). "
+            "Devuelve los resultados agrupados por punto en una sola llamada; "
+            "úsala en lugar de llamar a search_places una vez por punto."
+        ),
+        "metadata": {
+            "outputTemplate": "ui://widget/mysherlock.html",
+            "invokingMessage": "Buscando lugares...",
+            "invokedMessage": "Búsqueda completada"
+        },
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "query": {
+                    "type": "string",
+                    "description": "Descripción del tipo de lugar a buscar (igual que en search_places)"
+                },
+                "centers": {
+                    "type": "array",
+                    "description": (
+                        "Puntos alrededor de los que buscar: coordenadas o texto de ubicación. "
+                        "Los textos se geocodifican de uno en uno (Nominatim admite una petición por segundo): "
+                        f"en una llamada caben unos {BATCH_MAX_TEXT_CENTERS} puntos de texto nuevos; los que no "
+                        "dan tiempo vuelven con error y el resultado se marca como parcial. "
+                        "Usa lat/lng siempre que las conozcas."
+                    ),
+                    "minItems": 1,
+                    "maxItems": SEARCH_BATCH_MAX_CENTERS,
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "label": {"type": "string", "description": "Nombre del punto (opcional, p. ej. el hotel)"},
+                            "lat": {"type": "number", "description": "Latitud"},
+                            "lng": {"type": "number", "description": "Longitud"},
+                            "location_text": {"type": "string", "description": "Texto a geocodificar si no hay lat/lng"}
+                        },
+                        "anyOf": [
+                            {"required": ["lat", "lng"]},
+                            {"required": ["location_text"]}
+                        ]
+                    }
+                },
+                "radius_meters": {
+                    "type": "integer",
+                    "description": "Radio de búsqueda alrededor de cada punto, en metros. Por defecto: 1000",
+                    "default": 1000
+                },
+                "limit_per_center": {
+                    "type": "integer",
+                    "description": f"Máximo de lugares por punto (los más cercanos). Por defecto: {SEARCH_BATCH_DEFAULT_LIMIT}",
+                    "default": SEARCH_BATCH_DEFAULT_LIMIT,
+                    "minimum": 1,
+                    "maximum": MAX_PAGE_SIZE
+                },
+                "include_all_tags": {
+                    "type": "boolean",
+                    "description": "Incluir todos los tags OSM de cada lugar (por defecto solo los más relevantes)",
+                    "default": False
+                }
+            },
+            "required": ["query", "centers"]
+        }
+    },
+    {
+        "name": "reverse_geocode",
+        "description": (
+            "Convierte coordenadas (latitud, longitud) en una dirección legible "
+            "usando geocodificación inversa de OpenStreetMap."
+        ),
+        "metadata": {
+            "invokingMessage": "Obteniendo dirección...",
+            "invokedMessage": "Dirección obtenida"
+        },
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "lat": {"type": "number", "description": "Latitud"},
+                "lng": {"type": "number", "description": "Longitud"}
+            },
+            "required": ["lat", "lng"]
+        }
+    }
+]
+# tools/list no cambia entre peticiones: se serializa una sola vez
+TOOLS_LIST_RESULT = RawJSON.dumps({"tools": MCP_TOOLS})
+
+# Respuestas de error JSON-RPC precodificadas
+PARSE_ERROR_RESPONSE = dumps_payload({
+    "jsonrpc": "2.0",
+    "id": None,
+    "error": {"code": -32700, "message": "Error de parseo: el cuerpo no es JSON válido"}
+})
+INVALID_REQUEST_ENTRY = RawJSON.dumps({
+    "jsonrpc": "2.0",
+    "id": None,
+    "error": {"code": -32600, "message": "Petición JSON-RPC no válida"}
+})
+INVALID_REQUEST_RESPONSE = INVALID_REQUEST_ENTRY.text.encode("utf-8")
+
+
+def invalid_request_error(request: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Comprueba la estructura de una petición JSON-RPC 2.0 antes de procesarla.
+    
+    Returns:
+        Respuesta de error -32600 (con el id de la petición si es válido), o None si es correcta
+    """
+    if request.get("jsonrpc") == "2.0" and isinstance(request.get("method"), str):
+        return None
+    request_id = request.get("id")
+    if not isinstance(request_id, (str, int, float)) or isinstance(request_id, bool):
+        request_id = None
+    return {
+        "jsonrpc": "2.0",
+        "id": request_id,
+        "error": {"code": -32600, "message": "Petición JSON-RPC no válida"}
+    }
+
+
 @app.post("/mcp")
-async def mcp_endpoint(request: Dict[str, Any]):
+async def mcp_endpoint(http_request: Request):
     """
     Endpoint MCP que maneja las herramientas y devuelve el widget.
     Compatible con el protocolo MCP (JSON-RPC 2.0).
     """
+    # El cuerpo se decodifica directamente (sin validación de pydantic)
+    try:
+        payload = loads_payload(await http_request.body())
+    except ValueError:
+        return PayloadJSONResponse(PARSE_ERROR_RESPONSE)
+    
+    if isinstance(payload, list):
+        # Batch JSON-RPC 2.0: las peticiones se ejecutan de forma concurrente
+        # (la concurrencia hacia Nominatim y Overpass la limitan sus clientes)
+        if not payload or len(payload) > MCP_BATCH_MAX_SIZE:
+            return PayloadJSONResponse(INVALID_REQUEST_RESPONSE)
+        responses = await asyncio.gather(*(handle_batch_entry(entry) for entry in payload))
+        responses = [response for response in responses if response is not None]
+        if not responses:
+            # Solo notificaciones: no hay nada que responder
+            return Response(status_code=202)
+        return PayloadJSONResponse(responses)
+    
+    if not isinstance(payload, dict):
+        return PayloadJSONResponse(INVALID_REQUEST_RESPONSE)
+    error = invalid_request_error(payload)
+    if error is not None:
+        return PayloadJSONResponse(error)
+    if "id" not in payload:
+        # Notificación: se procesa pero no lleva respuesta (igual que en un batch)
+        await handle_mcp_request(payload)
+        return Response(status_code=202)
+    
+    if payload.get("method") == "tools/call" and "text/event-stream" in http_request.headers.get("accept", ""):
+        # Streamable HTTP: notificaciones de progreso por SSE y, al final, la respuesta
+        meta = (payload.get("params") or {}).get("_meta") or {}
+        stream = SseProgressStream(meta.get("progressToken", payload.get("id")))
+        response = asyncio.ensure_future(handle_mcp_request(payload, stream))
+        return StreamingResponse(
+            stream.events(response),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+    
+    # Las respuestas pueden llevar resultados ya serializados (RawJSON)
+    return PayloadJSONResponse(await handle_mcp_request(payload))
+
+
+async def handle_batch_entry(entry: Any) -> Optional[Any]:
+    """Procesa una entrada de un batch; las notificaciones (sin id) no generan respuesta."""
+    if not isinstance(entry, dict):
+        return INVALID_REQUEST_ENTRY
+    # Una entrada mal formada se responde siempre, aunque no lleve id
+    error = invalid_request_error(entry)
+    if error is not None:
+        return error
+    response = await handle_mcp_request(entry)
+    if "id" not in entry:
+        return None
+    return response
+
+
+async def handle_mcp_request(request: Dict[str, Any], progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
+    """
+    Procesa una petición JSON-RPC y devuelve la respuesta.
+    
+    Args:
+        request: Petición JSON-RPC
+        progress: Callback de progreso (solo cuando la respuesta se envía por SSE)
+    """
     try:
         method = request.get("method")
         params = request.get("params", {})
@@ -151,7 +440,7 @@ async def mcp_endpoint(request: Dict[str, Any]):
             }
         
         # Método initialized - notificación después de initialize
-        if method == "initialized":
+        if method in ("initialized", "notifications/initialized"):
             # Es una notificación, no requiere respuesta
             return {
                 "jsonrpc": "2.0",
@@ -164,93 +453,22 @@ async def mcp_endpoint(request: Dict[str, Any]):
             return {
                 "jsonrpc": "2.0",
                 "id": request.get("id"),
-                "result": {
-                    "tools": [
-                        {
-                            "name": "search_places",
-                            "description": (
-                                "Busca lugares (cafeterías, parques, bibliotecas, etc.) cerca de una ubicación "
-                                "usando OpenStreetMap y Overpass API. "
-                                "Puedes proporcionar coordenadas (lat/lng) o un texto de ubicación (location_text). "
-                                "Si solo proporcionas location_text, se geocodificará automáticamente."
-                            ),
-                            "metadata": {
-                                "outputTemplate": "ui://widget/mysherlock.html",
-                                "invokingMessage": "Buscando lugares...",
-                                "invokedMessage": "Búsqueda completada"
-                            },
-                            "inputSchema": {
-                                "type": "object",
-                                "properties": {
-                                    "query": {
-                                        "type": "string",
-                                        "description": (
-                                            "Descripción del tipo de lugar a buscar. "
-                                            "Ejemplos: 'cafeterías', 'parques', 'bibliotecas', 'museos', 'restaurantes'. "
-                                            "Puedes usar términos en español o inglés."
-                                        )
-                                    },
-                                    "lat": {
-                                        "type": "number",
-                                        "description": "Latitud del centro de búsqueda (opcional si se proporciona location_text)"
-                                    },
-                                    "lng": {
-                                        "type": "number",
-                                        "description": "Longitud del centro de búsqueda (opcional si se proporciona location_text)"
-                                    },
-                                    "location_text": {
-                                        "type": "string",
-                                        "description": (
-                                            "Texto de la ubicación (dirección, nombre de lugar, ciudad). "
-                                            "Ejemplos: 'Plaza de España, Madrid', 'Sagrada Familia, Barcelona'. "
-                                            "Se usará para geocodificar si no se proporcionan lat/lng."
-                                        )
-                                    },
-                                    "radius_meters": {
-                                        "type": "integer",
-                                        "description": "Radio de búsqueda en metros. Por defecto: 1000 (1 km)",
-                                        "default": 1000
-                                    }
-                                },
-                                "required": ["query"],
-                                "anyOf": [
-                                    {"required": ["lat", "lng"]},
-                                    {"required": ["location_text"]}
-                                ]
-                            }
-                        },
-                        {
-                            "name": "reverse_geocode",
-                            "description": (
-                                "Convierte coordenadas (latitud, longitud) en una dirección legible "
-                                "usando geocodificación inversa de OpenStreetMap."
-                            ),
-                            "metadata": {
-                                "invokingMessage": "Obteniendo dirección...",
-                                "invokedMessage": "Dirección obtenida"
-                            },
-                            "inputSchema": {
-                                "type": "object",
-                                "properties": {
-                                    "lat": {"type": "number", "description": "Latitud"},
-                                    "lng": {"type": "number", "description": "Longitud"}
-                                },
-                                "required": ["lat", "lng"]
-                            }
-                        }
-                    ]
-                }
+                "result": TOOLS_LIST_RESULT
             }
         
         elif method == "tools/call":
             # Ejecutar herramienta
             tool_name = params.get("name")
             arguments = params.get("arguments", {})
+            # Plazo de la llamada: todas las etapas reparten el tiempo que queda
+            deadline = Deadline()
             
             if tool_name == "search_places":
-                result = await handle_search_places(arguments)
+                result = await handle_search_places(arguments, progress, deadline)
+            elif tool_name == "search_places_batch":
+                result = await handle_search_places_batch(arguments, progress, deadline)
             elif tool_name == "reverse_geocode":
-                result = await handle_reverse_geocode(arguments)
+                result = await handle_reverse_geocode(arguments, deadline)
             else:
                 raise ValueError(f"Herramienta desconocida: {tool_name}")
             
@@ -276,66 +494,126 @@ async def mcp_endpoint(request: Dict[str, Any]):
         }
 
 
-async def handle_search_places(arguments: Dict[str, Any]) -> Dict[str, Any]:
+async def handle_search_places(
+    arguments: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
     """Maneja la búsqueda de lugares y devuelve el widget con los resultados."""
     query = arguments.get("query", "")
     lat = arguments.get("lat")
     lng = arguments.get("lng")
     location_text = arguments.get("location_text")
     radius_meters = arguments.get("radius_meters", 1000)
+    limit = clamp_page_size(arguments.get("limit"))
+    cursor = arguments.get("cursor")
+    include_all_tags = bool(arguments.get("include_all_tags", False))
+    target_count = clamp_page_size(arguments["target_count"]) if arguments.get("target_count") else None
+    max_radius_meters = arguments.get("max_radius_meters", ADAPTIVE_MAX_RADIUS)
     
-    logger.info(f"Buscando lugares: query={query}, lat={lat}, lng={lng}, location_text={location_text}, radius={radius_meters}m")
+    logger.info(f"Buscando lugares: query={query}, lat={lat}, lng={lng}, location_text={location_text}, radius={radius_meters}m, limit={limit}, cursor={cursor}")
     
     try:
-        # Buscar lugares
-        places = overpass_client.search_places(
-            query=query,
-            lat=lat,
-            lng=lng,
-            location_text=location_text,
-            radius_meters=radius_meters
-        )
+        if cursor:
+            # Páginas siguientes: se sirven desde el conjunto de resultados guardado
+            page = result_pager.get_page(cursor, limit)
+        else:
+            # Buscar lugares (se piden a Overpass como máximo PAGINATION_MAX_PAGES páginas)
+            if target_count:
+                # Búsqueda adaptativa: el radio se amplía hasta encontrar target_count lugares
+                places, radius_meters = await overpass_client.search_places_adaptive(
+                    query=query,
+                    target_count=target_count,
+                    lat=lat,
+                    lng=lng,
+                    location_text=location_text,
+                    radius_meters=radius_meters,
+                    max_radius_meters=max_radius_meters,
+                    limit=limit * PAGINATION_MAX_PAGES,
+                    progress=progress,
+                    deadline=deadline
+                )
+            else:
+                places = await overpass_client.search_places(
+                    query=query,
+                    lat=lat,
+                    lng=lng,
+                    location_text=location_text,
+                    radius_meters=radius_meters,
+                    limit=limit * PAGINATION_MAX_PAGES,
+                    progress=progress,
+                    deadline=deadline
+                )
+            page = result_pager.first_page(places, limit, meta={
+                "query": query,
+                "radius_meters": radius_meters,
+                "partial": deadline is not None and deadline.partial,
+                "center": {
+                    "lat": lat or (places[0].lat if places else None),
+                    "lng": lng or (places[0].lng if places else None)
+                } if places else None
+            })
+        
+        places = page["places"]
+        query = page["meta"].get("query", query)
+        radius_meters = page["meta"].get("radius_meters", radius_meters)
+        partial = page["meta"].get("partial", False)
         
         # Preparar datos para el widget
         search_results = {
-            "places": places,
+            "places": [place.to_dict(include_all_tags) for place in places],
             "count": len(places),
+            "total": page["total"],
+            "offset": page["offset"],
+            "next_cursor": page["next_cursor"],
             "query": query,
             "radius_meters": radius_meters,
-            "center": {
-                "lat": lat or (places[0]["lat"] if places else None),
-                "lng": lng or (places[0]["lng"] if places else None)
-            } if places else None
+            "center": page["meta"].get("center"),
+            "partial": partial
         }
         
-        # Cargar widget HTML con los datos inyectados
-        widget_html = load_widget_html(search_results)
+        # Serializar los resultados una sola vez: el mismo JSON va al HTML y a structuredContent
+        results_json = RawJSON.dumps(search_results)
+        widget_html = load_widget_html(results_json.text if WIDGET_INLINE_RESULTS else None)
         
         # Crear resumen de texto
         if not places:
+            # Con búsqueda adaptativa el radio ya se amplió todo lo permitido
+            hint = (
+                "Intenta cambiar el tipo de lugar." if target_count
+                else "Intenta ampliar el radio o cambiar el tipo de lugar."
+            )
             summary = (
                 f"No se encontraron lugares de tipo '{query}' "
-                f"en un radio de {radius_meters}m. "
-                "Intenta ampliar el radio o cambiar el tipo de lugar."
+                f"en un radio de {radius_meters}m. {hint}"
             )
         else:
-            summary_lines = [f"Encontrados {len(places)} lugares de tipo '{query}':\n"]
-            for i, place in enumerate(places[:10], 1):
-                distance_km = place["distance_meters"] / 1000
+            summary_lines = [f"Encontrados {page['total']} lugares de tipo '{query}':\n"]
+            for i, place in enumerate(places[:10], page["offset"] + 1):
+                distance_km = place.distance_meters / 1000
                 summary_lines.append(
-                    f"{i}. {place['name']} ({place.get('type', 'lugar')}) - "
+                    f"{i}. {place.name} ({place.type or 'lugar'}) - "
                     f"{distance_km:.2f} km"
                 )
-                if place.get("address"):
-                    summary_lines.append(f"   Dirección: {place['address']}")
-            if len(places) > 10:
-                summary_lines.append(f"\n... y {len(places) - 10} lugares más")
+                if place.address:
+                    summary_lines.append(f"   Dirección: {place.address}")
+            remaining = page["total"] - page["offset"] - min(len(places), 10)
+            if remaining > 0:
+                summary_lines.append(f"\n... y {remaining} lugares más")
+            if page["next_cursor"]:
+                summary_lines.append(f"Usa cursor='{page['next_cursor']}' para ver la siguiente página")
             summary = "\n".join(summary_lines)
+        if partial:
+            summary += (
+                "\n\nAviso: OpenStreetMap no respondió a tiempo; los resultados pueden "
+                "estar incompletos o no ser los más recientes."
+            )
         
         # Devolver widget como recurso con datos
         # El formato debe coincidir con el proyecto de referencia
         # ChatGPT espera el recurso con la URI que coincide con outputTemplate en metadata
         # IMPORTANTE: El recurso debe tener exactamente la misma URI que el outputTemplate
+        # El resumen (con el cursor y el aviso de resultado parcial) es lo que lee el modelo
         return {
             "content": [
                 {
@@ -345,10 +623,14 @@ async def handle_search_places(arguments: Dict[str, Any]) -> Dict[str, Any]:
                         "mimeType": "text/html+skybridge",
                         "text": widget_html
                     }
+                },
+                {
+                    "type": "text",
+                    "text": summary
                 }
             ],
             "structuredContent": {
-                "searchResults": search_results
+                "searchResults": results_json
             }
         }
     
@@ -364,7 +646,69 @@ async def handle_search_places(arguments: Dict[str, Any]) -> Dict[str, Any]:
         }
 
 
-async def handle_reverse_geocode(arguments: Dict[str, Any]) -> Dict[str, Any]:
+async def handle_search_places_batch(
+    arguments: Dict[str, Any],
+    progress: Optional[ProgressCallback] = None,
+    deadline: Optional[Deadline] = None
+) -> Dict[str, Any]:
+    """Maneja la búsqueda multi-centro y devuelve un único widget con los resultados agrupados."""
+    query = arguments.get("query", "")
+    centers = arguments.get("centers") or []
+    radius_meters = arguments.get("radius_meters", 1000)
+    limit_per_center = clamp_page_size(arguments.get("limit_per_center") or SEARCH_BATCH_DEFAULT_LIMIT)
+    include_all_tags = bool(arguments.get("include_all_tags", False))
+    
+    logger.info(f"Buscando lugares en lote: query={query}, centros={len(centers)}, radius={radius_meters}m, limit={limit_per_center}")
+    
+    try:
+        if not centers or len(centers) > SEARCH_BATCH_MAX_CENTERS:
+            raise ValueError(f"Se requieren entre 1 y {SEARCH_BATCH_MAX_CENTERS} centros")
+        groups = await overpass_client.search_places_batch(
+            query=query,
+            centers=centers,
+            radius_meters=radius_meters,
+            limit_per_center=limit_per_center,
+            progress=progress,
+            deadline=deadline
+        )
+        search_results = batch_search_results(
+            query, radius_meters, centers, groups, include_all_tags,
+            partial=deadline is not None and deadline.partial
+        )
+        
+        # Un único render del widget para todos los centros
+        results_json = RawJSON.dumps(search_results)
+        widget_html = load_widget_html(results_json.text if WIDGET_INLINE_RESULTS else None)
+        
+        return {
+            "content": [
+                {
+                    "type": "resource",
+                    "resource": {
+                        "uri": "ui://widget/mysherlock.html",
+                        "mimeType": "text/html+skybridge",
+                        "text": widget_html
+                    }
+                }
+            ],
+            "structuredContent": {
+                "searchResults": results_json
+            }
+        }
+    
+    except Exception as e:
+        logger.error(f"Error en search_places_batch: {e}", exc_info=True)
+        return {
+            "content": [
+                {
+                    "type": "text",
+                    "text": f"Error al buscar lugares: {str(e)}"
+                }
+            ]
+        }
+
+
+async def handle_reverse_geocode(arguments: Dict[str, Any], deadline: Optional[Deadline] = None) -> Dict[str, Any]:
     """Maneja la geocodificación inversa."""
     lat = arguments.get("lat")
     lng = arguments.get("lng")
@@ -382,7 +726,7 @@ async def handle_reverse_geocode(arguments: Dict[str, Any]) -> Dict[str, Any]:
     logger.info(f"Reverse geocoding: lat={lat}, lng={lng}")
     
     try:
-        address = nominatim_client.reverse_geocode(lat, lng)
+        address = await nominatim_client.reverse_geocode(lat, lng, deadline=deadline)
         
         if not address:
             return {
@@ -0,0 +1,69 @@
+"""
+Plazo (deadline) de una llamada a herramienta.
+
+Cada tools/call crea un Deadline con el presupuesto total y lo pasa a todas
+las etapas (geocodificación, Overpass, preparación del widget). Cada etapa
+calcula su timeout a partir del tiempo restante en lugar de usar uno fijo,
+de modo que la suma nunca supera lo que el cliente está dispuesto a esperar.
+Si una etapa se queda sin tiempo, el resultado se marca como parcial.
+"""
+import os
+import time
+from typing import List, Optional
+
+# Presupuesto total de una llamada a herramienta (ChatGPT no espera mucho más)
+TOOL_CALL_DEADLINE = float(os.getenv("TOOL_CALL_DEADLINE", "25"))
+# Tiempo que se reserva al final para ordenar y preparar la respuesta
+DEADLINE_RENDER_RESERVE = float(os.getenv("DEADLINE_RENDER_RESERVE", "1.0"))
+
+
+class DeadlineExceeded(Exception):
+    """No queda tiempo para empezar la etapa."""
+
+
+class Deadline:
+    """Instante límite de una llamada y registro de las etapas que no terminaron a tiempo."""
+
+    def __init__(self, budget: float = TOOL_CALL_DEADLINE):
+        """
+        Args:
+            budget: Segundos disponibles desde ahora
+        """
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+        self.partial_reasons: List[str] = []
+
+    def remaining(self, reserve: float = 0.0) -> float:
+        """Segundos que quedan, descontando 'reserve' (nunca negativo)."""
+        return max(0.0, self.expires_at - time.monotonic() - reserve)
+
+    def expired(self, reserve: float = 0.0) -> bool:
+        return self.remaining(reserve) <= 0.0
+
+    def timeout(self, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """
+        Timeout para una etapa: el tiempo restante, como mucho 'cap'.
+
+        Raises:
+            DeadlineExceeded: Si ya no queda tiempo
+        """
+        remaining = self.remaining(reserve)
+        if remaining <= 0.0:
+            raise DeadlineExceeded(f"Plazo de {self.budget:.0f}s agotado")
+        return remaining if cap is None else min(cap, remaining)
+
+    def mark_partial(self, reason: str) -> None:
+        """Anota que el resultado está incompleto (o viene de caché) por falta de tiempo."""
+        if reason not in self.partial_reasons:
+            self.partial_reasons.append(reason)
+
+    @property
+    def partial(self) -> bool:
+        return bool(self.partial_reasons)
+
+
+def stage_timeout(deadline: Optional[Deadline], default: float, reserve: float = 0.0) -> float:
+    """Timeout de una etapa: 'default' sin deadline, o lo que quede (como mucho 'default')."""
+    if deadline is None:
+        return default
+    return deadline.timeout(default, reserve)
@@ -0,0 +1,280 @@
+"""
+Pool de endpoints Overpass con puntuación de salud y peticiones "hedged".
+
+Cada endpoint guarda una ventana de latencias recientes, una tasa de error
+suavizada y su propio circuit breaker. Las consultas van al endpoint más sano;
+si no ha respondido cuando se supera el percentil de latencia configurado, se
+lanza una copia contra el segundo mejor y se cancela la que pierda. Si un
+endpoint falla antes, se pasa directamente al siguiente. Los reintentos (copias,
+failover y reintentos con backoff) consumen de un presupuesto global.
+"""
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from .deadline import Deadline, DeadlineExceeded
+from .resilience import CircuitBreaker, CircuitOpenError, RetryBudget, UpstreamError, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Endpoints Overpass separados por comas (servidores públicos o instancia propia)
+OVERPASS_API_URLS = [
+    url.strip() for url in os.getenv(
+        "OVERPASS_API_URLS",
+        "https://overpass-api.de/api/interpreter,https://overpass.kumi.systems/api/interpreter"
+    ).split(",") if url.strip()
+]
+# Percentil de latencia del endpoint principal a partir del cual se lanza la copia
+OVERPASS_HEDGE_PERCENTILE = float(os.getenv("OVERPASS_HEDGE_PERCENTILE", "0.9"))
+# Espera antes de la copia mientras no hay suficientes muestras, y mínimo absoluto
+OVERPASS_HEDGE_DEFAULT_DELAY = float(os.getenv("OVERPASS_HEDGE_DEFAULT_DELAY", "3.0"))
+OVERPASS_HEDGE_MIN_DELAY = float(os.getenv("OVERPASS_HEDGE_MIN_DELAY", "0.5"))
+# Consultas simultáneas por endpoint (el servidor público da ~2 slots por IP)
+OVERPASS_MAX_CONCURRENCY = int(os.getenv("OVERPASS_MAX_CONCURRENCY", "2"))
+# Reintentos con backoff cuando fallan todos los endpoints, y espera máxima por reintento
+OVERPASS_MAX_RETRIES = int(os.getenv("OVERPASS_MAX_RETRIES", "2"))
+OVERPASS_MAX_RETRY_WAIT = float(os.getenv("OVERPASS_MAX_RETRY_WAIT", "10"))
+
+_LATENCY_WINDOW = 50  # latencias recientes por endpoint
+_MIN_SAMPLES = 5  # muestras necesarias para fiarse del percentil
+_ERROR_DECAY = 0.8  # peso del histórico en la tasa de error suavizada
+
+
+class Endpoint:
+    """Estado de salud de un endpoint."""
+
+    def __init__(self, url: str, max_concurrency: int = OVERPASS_MAX_CONCURRENCY):
+        self.url = url
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = CircuitBreaker(url)
+        # No enviar nada antes de este instante (time.monotonic), p. ej. tras un 429
+        self.not_before = 0.0
+        self.latencies: "deque[float]" = deque(maxlen=_LATENCY_WINDOW)
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.successes = 0
+        self.failures = 0
+
+    def record(self, latency: float, ok: bool) -> None:
+        if ok:
+            self.latencies.append(latency)
+            self.successes += 1
+        else:
+            self.failures += 1
+        self.error_rate = _ERROR_DECAY * self.error_rate + (1 - _ERROR_DECAY) * (0.0 if ok else 1.0)
+
+    def is_available(self, now: float) -> bool:
+        return now >= self.not_before and self.breaker.is_available()
+
+    def available_at(self) -> float:
+        """Instante a partir del cual el endpoint volverá a aceptar peticiones."""
+        return max(self.not_before, self.breaker.retry_at or 0.0)
+
+    def percentile(self, q: float, min_samples: int = _MIN_SAMPLES) -> Optional[float]:
+        """Percentil q de las latencias recientes, o None si hay pocas muestras."""
+        if not self.latencies or len(self.latencies) < min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    @property
+    def score(self) -> float:
+        """Menor es mejor: latencia mediana penalizada por errores y carga actual."""
+        median = self.percentile(0.5, min_samples=1)
+        if median is None:
+            median = OVERPASS_HEDGE_DEFAULT_DELAY / 2
+        return median * (1 + 4 * self.error_rate) * (1 + 0.5 * self.in_flight)
+
+    def stats(self) -> Dict:
+        return {
+            "url": self.url,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "error_rate": round(self.error_rate, 3),
+            "in_flight": self.in_flight,
+            "successes": self.successes,
+            "failures": self.failures,
+            "circuit": self.breaker.stats(),
+        }
+
+
+class EndpointPool:
+    """Reparte consultas entre varios endpoints equivalentes."""
+
+    def __init__(
+        self,
+        urls: Sequence[str] = OVERPASS_API_URLS,
+        hedge_percentile: float = OVERPASS_HEDGE_PERCENTILE,
+        max_concurrency: int = OVERPASS_MAX_CONCURRENCY,
+        retry_budget: Optional[RetryBudget] = None,
+        max_retries: int = OVERPASS_MAX_RETRIES,
+        max_retry_wait: float = OVERPASS_MAX_RETRY_WAIT
+    ):
+        """
+        Args:
+            urls: URLs de los endpoints
+            hedge_percentile: Percentil de latencia a partir del cual se lanza la copia
+            max_concurrency: Consultas simultáneas por endpoint
+            retry_budget: Presupuesto de reintentos compartido
+            max_retries: Reintentos con backoff cuando fallan todos los endpoints
+            max_retry_wait: Espera máxima antes de un reintento (si hay que esperar más, se falla)
+        """
+        if not urls:
+            raise ValueError("Se necesita al menos un endpoint")
+        self.endpoints = [Endpoint(url, max_concurrency) for url in urls]
+        self.hedge_percentile = hedge_percentile
+        self.retry_budget = retry_budget or RetryBudget()
+        self.max_retries = max_retries
+        self.max_retry_wait = max_retry_wait
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def ranked(self) -> List[Endpoint]:
+        """Endpoints ordenados del más sano al menos sano."""
+        return sorted(self.endpoints, key=lambda endpoint: endpoint.score)
+
+    def hedge_delay(self, endpoint: Endpoint) -> float:
+        """Tiempo que se espera al endpoint principal antes de lanzar la copia."""
+        delay = endpoint.percentile(self.hedge_percentile)
+        if delay is None:
+            delay = OVERPASS_HEDGE_DEFAULT_DELAY
+        return max(OVERPASS_HEDGE_MIN_DELAY, delay)
+
+    async def _attempt(self, endpoint: Endpoint, call: Callable[[str], Awaitable[T]]) -> T:
+        async with endpoint.semaphore:
+            if not endpoint.breaker.allow_request():
+                raise CircuitOpenError(f"Circuito abierto para {endpoint.url}")
+            endpoint.in_flight += 1
+            start = time.monotonic()
+            try:
+                result = await call(endpoint.url)
+            except asyncio.CancelledError:
+                # Petición perdedora: no es un error, pero tardó al menos esto
+                endpoint.latencies.append(time.monotonic() - start)
+                endpoint.breaker.release()
+                raise
+            except DeadlineExceeded:
+                # Se ha agotado nuestro plazo, no ha fallado el endpoint
+                endpoint.breaker.release()
+                raise
+            except UpstreamError as e:
+                if not e.retryable:
+                    # Error de la consulta, no del servidor: no cuenta para su salud
+                    endpoint.breaker.release()
+                    raise
+                endpoint.record(time.monotonic() - start, ok=False)
+                endpoint.breaker.record_failure()
+                if e.retry_after is not None:
+                    endpoint.not_before = time.monotonic() + e.retry_after
+                raise
+            except Exception:
+                endpoint.record(time.monotonic() - start, ok=False)
+                endpoint.breaker.record_failure()
+                raise
+            else:
+                endpoint.record(time.monotonic() - start, ok=True)
+                endpoint.breaker.record_success()
+                return result
+            finally:
+                endpoint.in_flight -= 1
+
+    async def run(self, call: Callable[[str], Awaitable[T]], deadline: Optional[Deadline] = None) -> T:
+        """
+        Ejecuta call(url) contra el mejor endpoint, con copia, failover y reintentos.
+
+        Args:
+            call: Función que lanza la petición contra una URL
+            deadline: Plazo de la llamada; no se reintenta si la espera no cabe en él
+
+        Returns:
+            El resultado de la primera petición que termine bien
+
+        Raises:
+            CircuitOpenError: Si todos los circuitos están abiertos (sin esperar)
+            La excepción del último intento si se agotan los reintentos o el presupuesto
+        """
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            try:
+                return await self._run_once(call)
+            except UpstreamError as e:
+                if not e.retryable or attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt + 1, e.retry_after)
+                if delay > self.max_retry_wait or (deadline is not None and delay >= deadline.remaining()):
+                    raise
+                if not self.retry_budget.try_withdraw():
+                    raise
+                attempt += 1
+                logger.info(f"Reintentando consulta en {delay:.1f}s (intento {attempt}): {e}")
+                await asyncio.sleep(delay)
+
+    async def _run_once(self, call: Callable[[str], Awaitable[T]]) -> T:
+        """Una ronda: endpoint principal, copia si va lento y failover si falla."""
+        now = time.monotonic()
+        candidates = [endpoint for endpoint in self.ranked() if endpoint.is_available(now)]
+        if not candidates:
+            if all(endpoint.breaker.state == CircuitBreaker.OPEN for endpoint in self.endpoints):
+                raise CircuitOpenError("Todos los endpoints tienen el circuito abierto")
+            wait = min(endpoint.available_at() for endpoint in self.endpoints) - now
+            raise UpstreamError("No hay endpoints con slots libres", retry_after=max(0.0, wait))
+
+        pending: Dict["asyncio.Task[T]", Endpoint] = {}
+        last_error: Optional[BaseException] = None
+
+        primary = candidates.pop(0)
+        hedged = False
+        pending[asyncio.ensure_future(self._attempt(primary, call))] = primary
+        timeout: Optional[float] = self.hedge_delay(primary) if candidates else None
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                timeout = None
+                if not done:
+                    # El principal va lento: lanzar la copia contra el siguiente endpoint
+                    if self.retry_budget.try_withdraw():
+                        backup = candidates.pop(0)
+                        logger.info(f"Overpass lento en {primary.url}, lanzando copia contra {backup.url}")
+                        self.hedged += 1
+                        hedged = True
+                        pending[asyncio.ensure_future(self._attempt(backup, call))] = backup
+                    continue
+                for task in done:
+                    endpoint = pending.pop(task)
+                    if task.exception() is None:
+                        if hedged and endpoint is not primary:
+                            self.hedge_wins += 1
+                        return task.result()
+                    last_error = task.exception()
+                    logger.warning(f"Error en el endpoint {endpoint.url}: {last_error}")
+                if isinstance(last_error, DeadlineExceeded):
+                    # Sin plazo no tiene sentido probar otro endpoint
+                    break
+                if (isinstance(last_error, UpstreamError) and not last_error.retryable
+                        and not isinstance(last_error, CircuitOpenError)):
+                    # Consulta inválida: fallaría igual en cualquier endpoint
+                    break
+                if not pending and candidates and self.retry_budget.try_withdraw():
+                    # Failover inmediato al siguiente endpoint
+                    backup = candidates.pop(0)
+                    pending[asyncio.ensure_future(self._attempt(backup, call))] = backup
+            raise last_error
+        finally:
+            # Cancelar la petición perdedora (o todas si nos cancelan a nosotros)
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> Dict:
+        """Métricas del pool."""
+        return {
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints],
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "retry_budget": self.retry_budget.stats(),
+        }
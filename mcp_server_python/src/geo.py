@@ -0,0 +1,215 @@
+"""
+Utilidades geográficas: distancias, geohash y tiles slippy-map.
+"""
+import math
+import heapq
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional: se usa la implementación en Python puro
+    np = None
+
+EARTH_RADIUS_METERS = 6371000  # Radio de la Tierra en metros
+# Por debajo de este tamaño el coste de crear arrays supera al del bucle en Python
+NUMPY_MIN_SIZE = 64
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_GEOHASH_DECODE = {c: i for i, c in enumerate(_GEOHASH_BASE32)}
+
+
+def haversine_meters(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """
+    Calcula la distancia en metros entre dos puntos usando la fórmula de Haversine.
+
+    Args:
+        lat1, lng1: Coordenadas del primer punto
+        lat2, lng2: Coordenadas del segundo punto
+
+    Returns:
+        Distancia en metros
+    """
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lng2 - lng1)
+
+    a = (
+        math.sin(delta_phi / 2) ** 2 +
+        math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    )
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+    return EARTH_RADIUS_METERS * c
+
+
+def haversine_many(lat: float, lng: float, lats: Sequence[float], lngs: Sequence[float]) -> Sequence[float]:
+    """
+    Calcula en lote la distancia en metros desde un punto a muchos puntos.
+
+    Usa NumPy si está disponible y el lote es grande; si no, Python puro.
+
+    Args:
+        lat, lng: Coordenadas del punto de referencia
+        lats, lngs: Coordenadas de los demás puntos
+
+    Returns:
+        Distancias en metros (array de NumPy o lista), en el mismo orden
+    """
+    if np is not None and len(lats) >= NUMPY_MIN_SIZE:
+        phi1 = math.radians(lat)
+        phi2 = np.radians(np.asarray(lats, dtype=np.float64))
+        lambda2 = np.radians(np.asarray(lngs, dtype=np.float64))
+        a = (
+            np.sin((phi2 - phi1) / 2) ** 2 +
+            math.cos(phi1) * np.cos(phi2) * np.sin((lambda2 - math.radians(lng)) / 2) ** 2
+        )
+        return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return [haversine_meters(lat, lng, lat2, lng2) for lat2, lng2 in zip(lats, lngs)]
+
+
+def nearest_indices(distances: Sequence[float], k: Optional[int] = None) -> List[int]:
+    """
+    Devuelve los índices de las k distancias menores, ordenados de menor a mayor.
+
+    Con NumPy usa argpartition (O(n)) y solo ordena los k seleccionados.
+
+    Args:
+        distances: Distancias (array de NumPy o lista)
+        k: Número de índices a devolver (None para todos)
+
+    Returns:
+        Lista de índices
+    """
+    n = len(distances)
+    if k is None or k >= n:
+        k = n
+    if k <= 0:
+        return []
+    if np is not None and isinstance(distances, np.ndarray):
+        if k < n:
+            candidates = np.argpartition(distances, k - 1)[:k]
+        else:
+            candidates = np.arange(n)
+        return candidates[np.argsort(distances[candidates], kind="stable")].tolist()
+    if k < n:
+        return heapq.nsmallest(k, range(n), key=distances.__getitem__)
+    return sorted(range(n), key=distances.__getitem__)
+
+
+def geohash_encode(lat: float, lng: float, precision: int = 7) -> str:
+    """
+    Codifica unas coordenadas como geohash.
+
+    Precisión aproximada de cada celda: 5 -> ~4.9 km, 6 -> ~1.2 km,
+    7 -> ~150 m, 8 -> ~38 m, 9 -> ~5 m.
+    """
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def geohash_bbox(geohash: str) -> Tuple[float, float, float, float]:
+    """Devuelve la caja (sur, oeste, norte, este) de una celda geohash."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_DECODE[char]
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def geohash_neighbors(geohash: str) -> List[str]:
+    """Devuelve la celda y sus 8 vecinas (misma precisión)."""
+    south, west, north, east = geohash_bbox(geohash)
+    lat_step = north - south
+    lng_step = east - west
+    center_lat = (south + north) / 2
+    center_lng = (west + east) / 2
+    cells = []
+    for dlat in (-1, 0, 1):
+        for dlng in (-1, 0, 1):
+            lat = center_lat + dlat * lat_step
+            if lat > 90 or lat < -90:
+                continue
+            lng = (center_lng + dlng * lng_step + 180) % 360 - 180
+            cell = geohash_encode(lat, lng, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def lnglat_to_tile(lat: float, lng: float, zoom: int) -> Tuple[int, int]:
+    """Devuelve las coordenadas (x, y) del tile slippy-map que contiene el punto."""
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    n = 2 ** zoom
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bbox(x: int, y: int, zoom: int) -> Tuple[float, float, float, float]:
+    """Devuelve la caja (sur, oeste, norte, este) de un tile slippy-map."""
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def circle_bbox(lat: float, lng: float, radius_meters: float) -> Tuple[float, float, float, float]:
+    """Devuelve la caja (sur, oeste, norte, este) que contiene un círculo."""
+    delta_lat = math.degrees(radius_meters / EARTH_RADIUS_METERS)
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    delta_lng = math.degrees(radius_meters / (EARTH_RADIUS_METERS * cos_lat))
+    return lat - delta_lat, lng - delta_lng, lat + delta_lat, lng + delta_lng
+
+
+def distance_to_bbox_meters(lat: float, lng: float, bbox: Tuple[float, float, float, float]) -> float:
+    """Distancia desde un punto hasta el punto más cercano de una caja (0 si está dentro)."""
+    south, west, north, east = bbox
+    nearest_lat = min(max(lat, south), north)
+    nearest_lng = min(max(lng, west), east)
+    return haversine_meters(lat, lng, nearest_lat, nearest_lng)
+
+
+def tiles_for_circle(lat: float, lng: float, radius_meters: float, zoom: int) -> List[Tuple[int, int]]:
+    """Devuelve los tiles (x, y) que intersecan un círculo."""
+    south, west, north, east = circle_bbox(lat, lng, radius_meters)
+    min_x, min_y = lnglat_to_tile(north, west, zoom)
+    max_x, max_y = lnglat_to_tile(south, east, zoom)
+    tiles = []
+    for x in range(min_x, max_x + 1):
+        for y in range(min_y, max_y + 1):
+            if distance_to_bbox_meters(lat, lng, tile_bbox(x, y, zoom)) <= radius_meters:
+                tiles.append((x, y))
+    return tiles
@@ -0,0 +1,213 @@
+"""
+Caché de geocodificación LRU + TTL en memoria con respaldo persistente en SQLite.
+
+Las claves se normalizan con fold_text, de modo que "Plaza de España, Madrid"
+y "plaza de espana  madrid" comparten entrada. Los resultados "no encontrado"
+se guardan aparte con un TTL más corto.
+
+Se usa con get_async/set_async: la memoria se consulta en el propio bucle de
+eventos y la E/S de SQLite se hace en un hilo aparte.
+"""
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .text_utils import fold_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache"
+GEOCODE_CACHE_PATH = os.getenv("GEOCODE_CACHE_PATH", str(DEFAULT_CACHE_DIR / "geocode.sqlite3"))
+GEOCODE_CACHE_MAX_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_ENTRIES", "5000"))  # en memoria
+GEOCODE_CACHE_MAX_DB_ENTRIES = int(os.getenv("GEOCODE_CACHE_MAX_DB_ENTRIES", "100000"))  # en disco
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))  # 30 días
+GEOCODE_CACHE_NEGATIVE_TTL = int(os.getenv("GEOCODE_CACHE_NEGATIVE_TTL", str(6 * 3600)))  # 6 horas
+PRUNE_EVERY_WRITES = 500
+
+
+class GeocodeCache:
+    """Caché de resultados de geocodificación (texto -> coordenadas)."""
+
+    def __init__(
+        self,
+        db_path: Optional[str] = GEOCODE_CACHE_PATH,
+        max_entries: int = GEOCODE_CACHE_MAX_ENTRIES,
+        max_db_entries: int = GEOCODE_CACHE_MAX_DB_ENTRIES,
+        ttl: int = GEOCODE_CACHE_TTL,
+        negative_ttl: int = GEOCODE_CACHE_NEGATIVE_TTL
+    ):
+        """
+        Args:
+            db_path: Ruta del fichero SQLite (None o "" para usar solo memoria)
+            max_entries: Máximo de entradas en memoria (LRU)
+            max_db_entries: Máximo de entradas en disco
+            ttl: Tiempo de vida de un resultado encontrado, en segundos
+            negative_ttl: Tiempo de vida de un resultado "no encontrado", en segundos
+        """
+        self.max_entries = max_entries
+        self.max_db_entries = max_db_entries
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # clave -> (expira_en, resultado o None si "no encontrado")
+        self._memory: "OrderedDict[str, Tuple[float, Optional[Dict]]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        # La conexión se usa desde varios hilos (asyncio.to_thread): un acceso a la vez
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+        if db_path:
+            self._open_db(db_path)
+
+    def _open_db(self, db_path: str) -> None:
+        """Abre (o crea) la base de datos SQLite; si falla, sigue solo en memoria."""
+        try:
+            Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS geocode_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    expires_at REAL NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_geocode_cache_created ON geocode_cache(created_at)"
+            )
+        except sqlite3.Error as e:
+            logger.warning(f"No se pudo abrir la caché de geocodificación en {db_path}: {e}")
+            self._db = None
+
+    @staticmethod
+    def make_key(location_text: str) -> str:
+        """Normaliza el texto de ubicación (acentos, mayúsculas, espacios)."""
+        return fold_text(location_text)
+
+    async def get_async(self, location_text: str) -> Tuple[bool, Optional[Dict]]:
+        """
+        Busca un resultado en caché; la lectura de SQLite (solo si falla la memoria) no bloquea el bucle.
+
+        Args:
+            location_text: Texto de la ubicación
+
+        Returns:
+            Tupla (encontrado, resultado). Si encontrado es True y resultado es
+            None, la ubicación está cacheada como "no encontrada".
+        """
+        key = self.make_key(location_text)
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is None and self._db is not None:
+            entry = await asyncio.to_thread(self._load_from_db, key, now)
+            if entry is not None:
+                self._store_in_memory(key, entry)
+
+        if entry is None or entry[0] <= now:
+            if entry is not None:
+                self._memory.pop(key, None)
+            self.misses += 1
+            return False, None
+
+        self._memory.move_to_end(key)
+        if entry[1] is None:
+            self.negative_hits += 1
+        else:
+            self.hits += 1
+        return True, entry[1]
+
+    async def set_async(self, location_text: str, result: Optional[Dict]) -> None:
+        """
+        Guarda un resultado (o None para "no encontrado") en memoria y, en un hilo aparte, en disco.
+
+        Args:
+            location_text: Texto de la ubicación
+            result: Resultado de geocodificación, o None si no se encontró
+        """
+        key = self.make_key(location_text)
+        now = time.time()
+        expires_at = now + (self.ttl if result is not None else self.negative_ttl)
+        self._store_in_memory(key, (expires_at, result))
+        if self._db is not None:
+            await asyncio.to_thread(self._write_to_db, key, result, expires_at, now)
+
+    def _write_to_db(self, key: str, result: Optional[Dict], expires_at: float, now: float) -> None:
+        if self._db is None:
+            return
+        try:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO geocode_cache (key, value, expires_at, created_at) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(result, ensure_ascii=False) if result is not None else None, expires_at, now)
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY_WRITES == 0:
+                    self._prune_db(now)
+        except sqlite3.Error as e:
+            logger.warning(f"Error guardando en caché de geocodificación: {e}")
+
+    def _store_in_memory(self, key: str, entry: Tuple[float, Optional[Dict]]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load_from_db(self, key: str, now: float) -> Optional[Tuple[float, Optional[Dict]]]:
+        if self._db is None:
+            return None
+        try:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM geocode_cache WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Error leyendo la caché de geocodificación: {e}")
+            return None
+        if row is None:
+            return None
+        value, expires_at = row
+        return expires_at, (json.loads(value) if value is not None else None)
+
+    def _prune_db(self, now: float) -> None:
+        """Elimina entradas caducadas y las más antiguas si se supera el tamaño máximo."""
+        self._db.execute("DELETE FROM geocode_cache WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            """
+            DELETE FROM geocode_cache WHERE key IN (
+                SELECT key FROM geocode_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_db_entries,)
+        )
+
+    def close(self) -> None:
+        """Cierra la conexión SQLite."""
+        if self._db is not None:
+            with self._db_lock:
+                self._db.close()
+                self._db = None
+
+    def stats(self) -> Dict:
+        """Métricas de la caché."""
+        return {
+            "entries": len(self._memory),
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "persistent": self._db is not None,
+        }
@@ -0,0 +1,63 @@
+"""
+Cliente HTTP asíncrono compartido por todos los clientes de APIs externas.
+
+Mantiene un único pool de conexiones (keep-alive + HTTP/2) para Overpass y
+Nominatim, de forma que las peticiones no bloquean el event loop de uvicorn.
+"""
+import os
+import logging
+from typing import Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # segundos
+HTTP_CONNECT_TIMEOUT = 5.0  # segundos
+HTTP_USER_AGENT = "OSM-Finder-App/1.0"  # Nominatim requiere User-Agent
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _http2_available() -> bool:
+    """HTTP/2 requiere el paquete opcional 'h2' (httpx[http2])."""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Devuelve el cliente HTTP compartido, creándolo la primera vez.
+
+    Returns:
+        Instancia de httpx.AsyncClient con pool de conexiones
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        http2 = _http2_available()
+        if not http2:
+            logger.warning("Paquete 'h2' no disponible, usando HTTP/1.1")
+        _client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(30.0, connect=HTTP_CONNECT_TIMEOUT),
+            headers={"User-Agent": HTTP_USER_AGENT},
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Cierra el cliente HTTP compartido y libera las conexiones del pool."""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -0,0 +1,133 @@
+"""
+Detección de categorías de lugar en consultas de texto libre.
+
+Las categorías (id -> tags OSM + palabras clave en varios idiomas) se cargan
+de un fichero JSON y se compilan una sola vez, al importar el módulo, en un
+trie de tokens sobre texto normalizado (sin acentos ni mayúsculas). Cada
+consulta se recorre una única vez, de modo que el coste no depende del
+número de categorías.
+"""
+import os
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from .text_utils import fold_text
+
+logger = logging.getLogger(__name__)
+
+PLACE_CATEGORIES_PATH = os.getenv(
+    "PLACE_CATEGORIES_PATH",
+    os.path.join(os.path.dirname(__file__), "place_categories.json")
+)
+
+# Marca de fin de palabra clave dentro de un nodo del trie
+_CATEGORY = object()
+
+
+def _singular_forms(token: str) -> Tuple[str, ...]:
+    """Variantes en singular de un token ('cafeterias' -> 'cafeteria', 'bares' -> 'bar')."""
+    forms = [token]
+    if len(token) > 4 and token.endswith("es"):
+        forms.append(token[:-2])
+    if len(token) > 3 and token.endswith("s"):
+        forms.append(token[:-1])
+    return tuple(forms)
+
+
+class IntentMatcher:
+    """Trie de tokens que reconoce palabras clave de categorías en una consulta."""
+
+    def __init__(self, categories: Dict[str, Dict]):
+        """
+        Args:
+            categories: id de categoría -> {"tags": ["clave=valor", ...], "keywords": [...]}
+        """
+        self._tags: Dict[str, List[Tuple[str, str]]] = {}
+        self._root: Dict = {}
+        for category, spec in categories.items():
+            self._tags[category] = [tuple(tag.split("=", 1)) for tag in spec.get("tags", ())]
+            # El propio id también es una palabra clave ("fast_food" -> "fast food")
+            for keyword in [category, *spec.get("keywords", ())]:
+                tokens = fold_text(keyword).split()
+                if tokens:
+                    self._add(tokens, category)
+
+    @classmethod
+    def from_file(cls, path: str = PLACE_CATEGORIES_PATH) -> "IntentMatcher":
+        """Carga las categorías de un fichero JSON."""
+        with open(path, "r", encoding="utf-8") as f:
+            categories = json.load(f)
+        logger.info(f"Cargadas {len(categories)} categorías de lugar desde {path}")
+        return cls(categories)
+
+    def _add(self, tokens: List[str], category: str) -> None:
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        # En caso de palabra clave repetida se queda la primera categoría declarada
+        node.setdefault(_CATEGORY, category)
+
+    def _longest_match(self, tokens: List[str], start: int) -> Tuple[Optional[str], int]:
+        """Coincidencia más larga que empieza en tokens[start]: (categoría, tokens consumidos)."""
+        node = self._root
+        best: Tuple[Optional[str], int] = (None, 0)
+        for index in range(start, len(tokens)):
+            for form in _singular_forms(tokens[index]):
+                if form in node:
+                    node = node[form]
+                    break
+            else:
+                break
+            if _CATEGORY in node:
+                best = (node[_CATEGORY], index - start + 1)
+        return best
+
+    def match(self, query: str) -> List[str]:
+        """
+        Devuelve las categorías mencionadas en la consulta, en orden de aparición.
+
+        Args:
+            query: Texto libre (ej: "cafeterías y parques cerca")
+
+        Returns:
+            Lista de ids de categoría sin repetir
+        """
+        tokens = fold_text(query).split()
+        found: List[str] = []
+        index = 0
+        while index < len(tokens):
+            category, consumed = self._longest_match(tokens, index)
+            if category is None:
+                index += 1
+                continue
+            if category not in found:
+                found.append(category)
+            index += consumed
+        return found
+
+    def tags_for(self, place_type: str) -> Optional[List[Tuple[str, str]]]:
+        """
+        Tags OSM de una categoría (por id o por palabra clave exacta).
+
+        Returns:
+            Lista de (clave, valor), o None si el texto no es una categoría conocida
+        """
+        tags = self._tags.get(place_type)
+        if tags is not None:
+            return tags
+        tokens = fold_text(place_type).split()
+        if not tokens:
+            return None
+        category, consumed = self._longest_match(tokens, 0)
+        if category is None or consumed != len(tokens):
+            return None
+        return self._tags[category]
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self._tags)
+
+
+# Compilado una sola vez al importar
+intent_matcher = IntentMatcher.from_file()
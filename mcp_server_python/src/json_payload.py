@@ -0,0 +1,107 @@
+"""
+Serialización rápida de peticiones y respuestas JSON del endpoint MCP.
+
+Usa orjson si está instalado (con la biblioteca estándar como alternativa).
+Los resultados de una búsqueda se serializan una sola vez (RawJSON) y ese
+mismo texto se reutiliza dentro del HTML del widget y en el payload JSON-RPC,
+sin volver a recorrer los datos.
+"""
+import json
+import secrets
+from typing import Any, Callable, Dict
+
+from starlette.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson es opcional
+    orjson = None
+
+# orjson >= 3.9.15 sabe insertar fragmentos ya serializados sin marcadores
+_OrjsonFragment = getattr(orjson, "Fragment", None)
+
+
+class RawJSON:
+    """Fragmento de JSON ya serializado que se inserta tal cual en la respuesta."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+    @classmethod
+    def dumps(cls, obj: Any) -> "RawJSON":
+        """Serializa un objeto una única vez."""
+        if orjson is not None:
+            return cls(orjson.dumps(obj).decode("utf-8"))
+        return cls(json.dumps(obj, ensure_ascii=False, separators=(",", ":")))
+
+
+def _stdlib_dumps(payload: Any, default: Callable[[Any], Any]) -> bytes:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=default).encode("utf-8")
+
+
+def _orjson_dumps(payload: Any, default: Callable[[Any], Any]) -> bytes:
+    return orjson.dumps(payload, default=default)
+
+
+_dumps = _orjson_dumps if orjson is not None else _stdlib_dumps
+
+
+def dumps_payload(payload: Any) -> bytes:
+    """
+    Serializa un payload que puede contener fragmentos RawJSON.
+
+    Sin soporte nativo de fragmentos, cada uno se sustituye por un marcador
+    único durante la serialización del resto del payload y después se inserta
+    su texto en lugar del marcador.
+    """
+    if _OrjsonFragment is not None:
+        def fragment(obj: Any) -> Any:
+            if isinstance(obj, RawJSON):
+                return _OrjsonFragment(obj.text)
+            raise TypeError(f"Objeto no serializable: {type(obj).__name__}")
+        return orjson.dumps(payload, default=fragment)
+
+    fragments: Dict[bytes, str] = {}
+    prefix = f"__raw_json_{secrets.token_hex(8)}_"
+
+    def marker(obj: Any) -> str:
+        if isinstance(obj, RawJSON):
+            key = f"{prefix}{len(fragments)}"
+            fragments[f'"{key}"'.encode()] = obj.text
+            return key
+        raise TypeError(f"Objeto no serializable: {type(obj).__name__}")
+
+    data = _dumps(payload, marker)
+    for key, text in fragments.items():
+        data = data.replace(key, text.encode("utf-8"), 1)
+    return data
+
+
+def loads_payload(body: bytes) -> Any:
+    """
+    Decodifica el cuerpo de una petición JSON.
+
+    Raises:
+        ValueError: Si el cuerpo no es JSON válido
+    """
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def script_safe(json_text: str) -> str:
+    """Escapa un JSON para incrustarlo en un <script> ('</script>' no puede cerrarlo)."""
+    return json_text.replace("</", "<\\/").replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+class PayloadJSONResponse(Response):
+    """Respuesta JSON serializada con orjson; admite fragmentos RawJSON y bytes ya codificados."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps_payload(content)
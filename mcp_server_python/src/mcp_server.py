@@ -2,6 +2,8 @@
 Servidor MCP para OSM Finder.
 Expone herramientas para buscar lugares usando OpenStreetMap y Overpass.
 """
+import os
+import json
 import asyncio
 import logging
 from typing import Any, Sequence
@@ -9,15 +11,37 @@ from mcp.server import Server
 from mcp.server.stdio import stdio_server
 from mcp.types import Tool, TextContent, ImageContent, EmbeddedResource
 
-from .overpass_client import OverpassClient
+from .offline_poi import create_poi_client
 from .nominatim_client import NominatimClient
+from .overpass_client import ADAPTIVE_MAX_RADIUS, BATCH_MAX_TEXT_CENTERS
+from .http_client import close_http_client
+from .geocode_cache import GeocodeCache
+from .reverse_geocode_cache import ReverseGeocodeCache
+from .result_cache import OverpassResultCache
+from .tile_cache import TilePoiCache
+from .deadline import Deadline
+from .search_results import batch_search_results
+from .pagination import ResultPager, clamp_page_size, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, PAGINATION_MAX_PAGES
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Inicializar clientes
-overpass_client = OverpassClient()
-nominatim_client = NominatimClient()
+geocode_cache = GeocodeCache()
+reverse_geocode_cache = ReverseGeocodeCache()
+nominatim_client = NominatimClient(cache=geocode_cache, reverse_cache=reverse_geocode_cache)
+overpass_result_cache = OverpassResultCache()
+tile_poi_cache = TilePoiCache()
+overpass_client = create_poi_client(
+    nominatim_client=nominatim_client,
+    result_cache=overpass_result_cache,
+    tile_cache=tile_poi_cache
+)
+result_pager = ResultPager()
+
+# Máximo de centros en search_places_batch y lugares por centro por defecto
+SEARCH_BATCH_MAX_CENTERS = int(os.getenv("SEARCH_BATCH_MAX_CENTERS", "50"))
+SEARCH_BATCH_DEFAULT_LIMIT = 10
 
 # Crear servidor MCP
 app = Server("osm-finder-mcp")
@@ -45,7 +69,7 @@ async def list_tools() -> list[Tool]:
                         "description": (
                             "Descripción del tipo de lugar a buscar. "
                             "Ejemplos: 'cafeterías', 'parques', 'bibliotecas', 'museos', 'restaurantes'. "
-                            "Puedes usar términos en español o inglés."
+                            "Puedes usar términos en español o inglés. No hace falta si se indica cursor."
                         )
                     },
                     "lat": {
@@ -68,15 +92,111 @@ async def list_tools() -> list[Tool]:
                         "type": "integer",
                         "description": "Radio de búsqueda en metros. Por defecto: 1000 (1 km)",
                         "default": 1000
+                    },
+                    "target_count": {
+                        "type": "integer",
+                        "description": (
+                            "Búsqueda adaptativa: número de lugares que se quiere encontrar. Si se indica, "
+                            "radius_meters es el radio inicial y se amplía por pasos (hasta max_radius_meters) "
+                            "hasta encontrarlos. Útil para peticiones como 'las 10 cafeterías más cercanas'."
+                        ),
+                        "minimum": 1,
+                        "maximum": MAX_PAGE_SIZE
+                    },
+                    "max_radius_meters": {
+                        "type": "integer",
+                        "description": f"Radio máximo de la búsqueda adaptativa en metros. Por defecto: {ADAPTIVE_MAX_RADIUS}",
+                        "default": ADAPTIVE_MAX_RADIUS
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": f"Número máximo de lugares por página (los más cercanos). Por defecto: {DEFAULT_PAGE_SIZE}",
+                        "default": DEFAULT_PAGE_SIZE,
+                        "minimum": 1,
+                        "maximum": MAX_PAGE_SIZE
+                    },
+                    "cursor": {
+                        "type": "string",
+                        "description": (
+                            "Cursor de paginación devuelto en 'next_cursor' por una búsqueda anterior. "
+                            "Si se indica, devuelve la siguiente página sin repetir la búsqueda."
+                        )
+                    },
+                    "include_all_tags": {
+                        "type": "boolean",
+                        "description": "Incluir todos los tags OSM de cada lugar (por defecto solo los más relevantes)",
+                        "default": False
                     }
                 },
-                "required": ["query"],
+                # query solo es obligatorio en la primera página (con cursor se ignora)
                 "anyOf": [
-                    {"required": ["lat", "lng"]},
-                    {"required": ["location_text"]}
+                    {"required": ["query", "lat", "lng"]},
+                    {"required": ["query", "location_text"]},
+                    {"required": ["cursor"]}
                 ]
             }
         ),
+        Tool(
+            name="search_places_batch",
+            description=(
+                "Busca el mismo tipo de lugar alrededor de varios puntos a la vez "
+                "(por ejemplo, farmacias cerca de cada uno de varios hoteles). "
+                "Devuelve los resultados agrupados por punto en una sola llamada; "
+                "úsala en lugar de llamar a search_places una vez por punto."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "query": {
+                        "type": "string",
+                        "description": "Descripción del tipo de lugar a buscar (igual que en search_places)"
+                    },
+                    "centers": {
+                        "type": "array",
+                        "description": (
+                            "Puntos alrededor de los que buscar: coordenadas o texto de ubicación. "
+                            "Los textos se geocodifican de uno en uno (Nominatim admite una petición por segundo): "
+                            f"en una llamada caben unos {BATCH_MAX_TEXT_CENTERS} puntos de texto nuevos; los que no "
+                            "dan tiempo vuelven con error y el resultado se marca como parcial. "
+                            "Usa lat/lng siempre que las conozcas."
+                        ),
+                        "minItems": 1,
+                        "maxItems": SEARCH_BATCH_MAX_CENTERS,
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "label": {"type": "string", "description": "Nombre del punto (opcional, p. ej. el hotel)"},
+                                "lat": {"type": "number", "description": "Latitud"},
+                                "lng": {"type": "number", "description": "Longitud"},
+                                "location_text": {"type": "string", "description": "Texto a geocodificar si no hay lat/lng"}
+                            },
+                            "anyOf": [
+                                {"required": ["lat", "lng"]},
+                                {"required": ["location_text"]}
+                            ]
+                        }
+                    },
+                    "radius_meters": {
+                        "type": "integer",
+                        "description": "Radio de búsqueda alrededor de cada punto, en metros. Por defecto: 1000",
+                        "default": 1000
+                    },
+                    "limit_per_center": {
+                        "type": "integer",
+                        "description": f"Máximo de lugares por punto (los más cercanos). Por defecto: {SEARCH_BATCH_DEFAULT_LIMIT}",
+                        "default": SEARCH_BATCH_DEFAULT_LIMIT,
+                        "minimum": 1,
+                        "maximum": MAX_PAGE_SIZE
+                    },
+                    "include_all_tags": {
+                        "type": "boolean",
+                        "description": "Incluir todos los tags OSM de cada lugar (por defecto solo los más relevantes)",
+                        "default": False
+                    }
+                },
+                "required": ["query", "centers"]
+            }
+        ),
         Tool(
             name="reverse_geocode",
             description=(
@@ -106,11 +226,15 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
     """
     Ejecuta una herramienta MCP.
     """
+    # Plazo de la llamada: todas las etapas reparten el tiempo que queda
+    deadline = Deadline()
     try:
         if name == "search_places":
-            return await handle_search_places(arguments)
+            return await handle_search_places(arguments, deadline)
+        elif name == "search_places_batch":
+            return await handle_search_places_batch(arguments, deadline)
         elif name == "reverse_geocode":
-            return await handle_reverse_geocode(arguments)
+            return await handle_reverse_geocode(arguments, deadline)
         else:
             raise ValueError(f"Herramienta desconocida: {name}")
     
@@ -124,7 +248,7 @@ async def call_tool(name: str, arguments: dict[str, Any]) -> Sequence[TextConten
         ]
 
 
-async def handle_search_places(arguments: dict[str, Any]) -> Sequence[TextContent]:
+async def handle_search_places(arguments: dict[str, Any], deadline: Deadline | None = None) -> Sequence[TextContent]:
     """
     Maneja la búsqueda de lugares.
     """
@@ -133,27 +257,75 @@ async def handle_search_places(arguments: dict[str, Any]) -> Sequence[TextConten
     lng = arguments.get("lng")
     location_text = arguments.get("location_text")
     radius_meters = arguments.get("radius_meters", 1000)
+    limit = clamp_page_size(arguments.get("limit"))
+    cursor = arguments.get("cursor")
+    include_all_tags = bool(arguments.get("include_all_tags", False))
+    target_count = clamp_page_size(arguments["target_count"]) if arguments.get("target_count") else None
+    max_radius_meters = arguments.get("max_radius_meters", ADAPTIVE_MAX_RADIUS)
     
-    logger.info(f"Buscando lugares: query={query}, lat={lat}, lng={lng}, location_text={location_text}, radius={radius_meters}m")
+    logger.info(f"Buscando lugares: query={query}, lat={lat}, lng={lng}, location_text={location_text}, radius={radius_meters}m, limit={limit}, cursor={cursor}")
     
     try:
-        # Buscar lugares
-        places = overpass_client.search_places(
-            query=query,
-            lat=lat,
-            lng=lng,
-            location_text=location_text,
-            radius_meters=radius_meters
-        )
+        if cursor:
+            # Páginas siguientes: se sirven desde el conjunto de resultados guardado
+            page = result_pager.get_page(cursor, limit)
+        else:
+            # Buscar lugares (se piden a Overpass como máximo PAGINATION_MAX_PAGES páginas)
+            if target_count:
+                # Búsqueda adaptativa: el radio se amplía hasta encontrar target_count lugares
+                places, radius_meters = await overpass_client.search_places_adaptive(
+                    query=query,
+                    target_count=target_count,
+                    lat=lat,
+                    lng=lng,
+                    location_text=location_text,
+                    radius_meters=radius_meters,
+                    max_radius_meters=max_radius_meters,
+                    limit=limit * PAGINATION_MAX_PAGES,
+                    deadline=deadline
+                )
+            else:
+                places = await overpass_client.search_places(
+                    query=query,
+                    lat=lat,
+                    lng=lng,
+                    location_text=location_text,
+                    radius_meters=radius_meters,
+                    limit=limit * PAGINATION_MAX_PAGES,
+                    deadline=deadline
+                )
+            page = result_pager.first_page(places, limit, meta={
+                "query": query,
+                "radius_meters": radius_meters,
+                "partial": deadline is not None and deadline.partial,
+                "center": {
+                    "lat": lat or places[0].lat,
+                    "lng": lng or places[0].lng
+                } if places else None
+            })
+        
+        places = page["places"]
+        query = page["meta"].get("query", query)
+        radius_meters = page["meta"].get("radius_meters", radius_meters)
+        partial = page["meta"].get("partial", False)
+        partial_notice = (
+            "\n\nAviso: OpenStreetMap no respondió a tiempo; los resultados pueden "
+            "estar incompletos o no ser los más recientes."
+        ) if partial else ""
         
         if not places:
+            # Con búsqueda adaptativa el radio ya se amplió todo lo permitido
+            hint = (
+                "Intenta cambiar el tipo de lugar." if target_count
+                else "Intenta ampliar el radio o cambiar el tipo de lugar."
+            )
             return [
                 TextContent(
                     type="text",
                     text=(
                         f"No se encontraron lugares de tipo '{query}' "
                         f"en un radio de {radius_meters}m. "
-                        "Intenta ampliar el radio o cambiar el tipo de lugar."
+                        f"{hint}{partial_notice}"
                     )
                 )
             ]
@@ -161,34 +333,38 @@ async def handle_search_places(arguments: dict[str, Any]) -> Sequence[TextConten
         # Formatear resultados como JSON para que el frontend los pueda parsear
         import json
         results_json = json.dumps({
-            "places": places,
+            "places": [place.to_dict(include_all_tags) for place in places],
             "count": len(places),
+            "total": page["total"],
+            "offset": page["offset"],
+            "next_cursor": page["next_cursor"],
             "query": query,
             "radius_meters": radius_meters,
-            "center": {
-                "lat": lat or places[0]["lat"],
-                "lng": lng or places[0]["lng"]
-            } if places else None
+            "center": page["meta"].get("center"),
+            "partial": partial
         }, indent=2, ensure_ascii=False)
         
         # También crear un resumen legible
         summary_lines = [
-            f"Encontrados {len(places)} lugares de tipo '{query}':\n"
+            f"Encontrados {page['total']} lugares de tipo '{query}':\n"
         ]
         
-        for i, place in enumerate(places[:10], 1):  # Mostrar solo los primeros 10
-            distance_km = place["distance_meters"] / 1000
+        for i, place in enumerate(places[:10], page["offset"] + 1):  # Mostrar solo los primeros 10
+            distance_km = place.distance_meters / 1000
             summary_lines.append(
-                f"{i}. {place['name']} ({place.get('type', 'lugar')}) - "
+                f"{i}. {place.name} ({place.type or 'lugar'}) - "
                 f"{distance_km:.2f} km"
             )
-            if place.get("address"):
-                summary_lines.append(f"   Dirección: {place['address']}")
+            if place.address:
+                summary_lines.append(f"   Dirección: {place.address}")
         
-        if len(places) > 10:
-            summary_lines.append(f"\n... y {len(places) - 10} lugares más")
+        remaining = page["total"] - page["offset"] - min(len(places), 10)
+        if remaining > 0:
+            summary_lines.append(f"\n... y {remaining} lugares más")
+        if page["next_cursor"]:
+            summary_lines.append(f"Usa cursor='{page['next_cursor']}' para ver la siguiente página")
         
-        summary = "\n".join(summary_lines)
+        summary = "\n".join(summary_lines) + partial_notice
         
         return [
             TextContent(
@@ -207,7 +383,69 @@ async def handle_search_places(arguments: dict[str, Any]) -> Sequence[TextConten
         ]
 
 
-async def handle_reverse_geocode(arguments: dict[str, Any]) -> Sequence[TextContent]:
+async def handle_search_places_batch(arguments: dict[str, Any], deadline: Deadline | None = None) -> Sequence[TextContent]:
+    """
+    Maneja la búsqueda multi-centro.
+    """
+    query = arguments.get("query", "")
+    centers = arguments.get("centers") or []
+    radius_meters = arguments.get("radius_meters", 1000)
+    limit_per_center = clamp_page_size(arguments.get("limit_per_center") or SEARCH_BATCH_DEFAULT_LIMIT)
+    include_all_tags = bool(arguments.get("include_all_tags", False))
+    
+    logger.info(f"Buscando lugares en lote: query={query}, centros={len(centers)}, radius={radius_meters}m, limit={limit_per_center}")
+    
+    try:
+        if not centers or len(centers) > SEARCH_BATCH_MAX_CENTERS:
+            raise ValueError(f"Se requieren entre 1 y {SEARCH_BATCH_MAX_CENTERS} centros")
+        groups = await overpass_client.search_places_batch(
+            query=query,
+            centers=centers,
+            radius_meters=radius_meters,
+            limit_per_center=limit_per_center,
+            deadline=deadline
+        )
+        
+        partial = deadline is not None and deadline.partial
+        summary_lines = [f"Lugares de tipo '{query}' en un radio de {radius_meters}m por punto:\n"]
+        for i, (center, group) in enumerate(zip(centers, groups), 1):
+            label = center.get("label") or center.get("location_text") or f"Punto {i}"
+            places = group.get("places") or []
+            if group.get("error"):
+                summary_lines.append(f"{i}. {label}: error ({group['error']})")
+            else:
+                summary_lines.append(f"{i}. {label}: {len(places)} lugares")
+            for place in places[:3]:  # Mostrar solo los 3 más cercanos de cada punto
+                summary_lines.append(f"   - {place.name} ({place.type or 'lugar'}) - {place.distance_meters / 1000:.2f} km")
+        if partial:
+            summary_lines.append(
+                "\nAviso: OpenStreetMap no respondió a tiempo; los resultados pueden "
+                "estar incompletos o no ser los más recientes."
+            )
+        
+        results_json = json.dumps(
+            batch_search_results(query, radius_meters, centers, groups, include_all_tags, partial),
+            indent=2, ensure_ascii=False
+        )
+        
+        return [
+            TextContent(
+                type="text",
+                text="\n".join(summary_lines) + f"\n\n--- DATOS JSON PARA EL WIDGET ---\n{results_json}"
+            )
+        ]
+    
+    except Exception as e:
+        logger.error(f"Error en search_places_batch: {e}", exc_info=True)
+        return [
+            TextContent(
+                type="text",
+                text=f"Error al buscar lugares: {str(e)}"
+            )
+        ]
+
+
+async def handle_reverse_geocode(arguments: dict[str, Any], deadline: Deadline | None = None) -> Sequence[TextContent]:
     """
     Maneja la geocodificación inversa.
     """
@@ -225,7 +463,7 @@ async def handle_reverse_geocode(arguments: dict[str, Any]) -> Sequence[TextCont
     logger.info(f"Reverse geocoding: lat={lat}, lng={lng}")
     
     try:
-        address = nominatim_client.reverse_geocode(lat, lng)
+        address = await nominatim_client.reverse_geocode(lat, lng, deadline=deadline)
         
         if not address:
             return [
@@ -256,12 +494,16 @@ async def main():
     """
     Punto de entrada principal del servidor MCP.
     """
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        await close_http_client()
+        geocode_cache.close()
 
 
 if __name__ == "__main__":
@@ -1,45 +1,108 @@
 """
 Cliente para interactuar con Nominatim (geocodificación de OpenStreetMap).
 """
-import requests
-import time
+import os
+import asyncio
 from typing import Optional, Dict
 import logging
 
+import httpx
+
+from .http_client import get_http_client
+from .rate_limiter import AsyncTokenBucket
+from .geocode_cache import GeocodeCache
+from .reverse_geocode_cache import ReverseGeocodeCache
+from .single_flight import SingleFlight
+from .deadline import Deadline, stage_timeout
+from .text_utils import fold_text
+
 logger = logging.getLogger(__name__)
 
 NOMINATIM_API_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
 NOMINATIM_TIMEOUT = 10
+NOMINATIM_RATE_LIMIT = 1.0  # Nominatim requiere como máximo 1 petición por segundo
+NOMINATIM_MAX_WAIT = float(os.getenv("NOMINATIM_MAX_WAIT", "5"))  # segundos en cola antes de rechazar
+# Peticiones simultáneas a Nominatim como máximo (p. ej. en un batch JSON-RPC)
+NOMINATIM_MAX_CONCURRENCY = int(os.getenv("NOMINATIM_MAX_CONCURRENCY", "2"))
+# Nivel de detalle de la dirección en reverse geocoding (3=país, 10=ciudad, 16=calle, 18=edificio)
+REVERSE_GEOCODE_ZOOM = int(os.getenv("REVERSE_GEOCODE_ZOOM", "18"))
+
+# Limitador compartido por todo el proceso: todas las instancias de
+# NominatimClient (geocode y reverse_geocode) consumen del mismo bucket
+nominatim_rate_limiter = AsyncTokenBucket(
+    rate=NOMINATIM_RATE_LIMIT,
+    capacity=1,
+    max_wait=NOMINATIM_MAX_WAIT,
+    name="Nominatim"
+)
+# Tope de concurrencia compartido por todo el proceso
+nominatim_semaphore = asyncio.Semaphore(NOMINATIM_MAX_CONCURRENCY)
+# Geocodificaciones idénticas en curso (compartido por todo el proceso)
+nominatim_single_flight = SingleFlight("Nominatim")
 
 
 class NominatimClient:
     """Cliente para geocodificación usando Nominatim."""
     
-    def __init__(self, api_url: str = NOMINATIM_API_URL, timeout: int = NOMINATIM_TIMEOUT):
+    def __init__(
+        self,
+        api_url: str = NOMINATIM_API_URL,
+        timeout: int = NOMINATIM_TIMEOUT,
+        rate_limiter: Optional[AsyncTokenBucket] = None,
+        cache: Optional[GeocodeCache] = None,
+        reverse_cache: Optional[ReverseGeocodeCache] = None,
+        reverse_zoom: int = REVERSE_GEOCODE_ZOOM,
+        concurrency: Optional[asyncio.Semaphore] = None,
+        single_flight: Optional[SingleFlight] = None
+    ):
         self.api_url = api_url
         self.timeout = timeout
-        self.last_request_time = 0
-        self.min_request_interval = 1.0  # Nominatim requiere 1 segundo entre requests
+        self.rate_limiter = rate_limiter or nominatim_rate_limiter
+        self.cache = cache
+        self.reverse_cache = reverse_cache
+        self.reverse_zoom = reverse_zoom
+        self.concurrency = concurrency or nominatim_semaphore
+        self.single_flight = single_flight or nominatim_single_flight
     
-    def _wait_for_rate_limit(self):
-        """Espera para respetar el rate limit de Nominatim."""
-        current_time = time.time()
-        time_since_last = current_time - self.last_request_time
-        if time_since_last < self.min_request_interval:
-            time.sleep(self.min_request_interval - time_since_last)
-        self.last_request_time = time.time()
+    async def _wait_for_rate_limit(self, deadline: Optional[Deadline] = None):
+        """
+        Espera turno en el limitador compartido para respetar el rate limit de Nominatim.
+        
+        Raises:
+            RateLimitExceeded: Si la cola es demasiado larga (o la espera no cabe en el plazo)
+        """
+        max_wait = None
+        if deadline is not None:
+            max_wait = min(self.rate_limiter.max_wait, deadline.remaining())
+        await self.rate_limiter.acquire(max_wait)
     
-    def geocode(self, location_text: str) -> Optional[Dict]:
+    async def geocode(self, location_text: str, deadline: Optional[Deadline] = None) -> Optional[Dict]:
         """
         Geocodifica una dirección o nombre de lugar.
         
         Args:
             location_text: Texto de la ubicación (ej: "Plaza de España, Madrid")
+            deadline: Plazo de la llamada; el timeout de la petición sale del tiempo restante
         
         Returns:
             Diccionario con 'lat' y 'lng', o None si no se encuentra
         """
-        self._wait_for_rate_limit()
+        if self.cache is not None:
+            cached, cached_result = await self.cache.get_async(location_text)
+            if cached:
+                logger.info(f"Geocodificación desde caché: {location_text}")
+                return cached_result
+        
+        # Las geocodificaciones simultáneas del mismo texto comparten una sola petición
+        return await self.single_flight.do(
+            fold_text(location_text),
+            lambda: self._geocode_upstream(location_text, deadline)
+        )
+    
+    async def _geocode_upstream(self, location_text: str, deadline: Optional[Deadline] = None) -> Optional[Dict]:
+        """Consulta a Nominatim (respetando el rate limit) y guarda el resultado en caché."""
+        await self._wait_for_rate_limit(deadline)
         
         try:
             params = {
@@ -53,52 +116,74 @@ class NominatimClient:
                 'User-Agent': 'OSM-Finder-App/1.0'  # Nominatim requiere User-Agent
             }
             
-            response = requests.get(
-                self.api_url,
-                params=params,
-                timeout=self.timeout,
-                headers=headers
-            )
+            client = get_http_client()
+            async with self.concurrency:
+                response = await client.get(
+                    self.api_url,
+                    params=params,
+                    timeout=stage_timeout(deadline, self.timeout),
+                    headers=headers
+                )
             response.raise_for_status()
             
             results = response.json()
             
             if not results:
                 logger.warning(f"No se encontró geocodificación para: {location_text}")
+                if self.cache is not None:
+                    await self.cache.set_async(location_text, None)
                 return None
             
             result = results[0]
             
-            return {
+            geocode_result = {
                 'lat': float(result['lat']),
                 'lng': float(result['lon']),
                 'display_name': result.get('display_name', location_text),
                 'address': result.get('address', {})
             }
+            if self.cache is not None:
+                await self.cache.set_async(location_text, geocode_result)
+            return geocode_result
         
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error al geocodificar: {e}")
             return None
     
-    def reverse_geocode(self, lat: float, lng: float) -> Optional[str]:
+    async def reverse_geocode(
+        self,
+        lat: float,
+        lng: float,
+        zoom: Optional[int] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[str]:
         """
         Realiza geocodificación inversa (coordenadas -> dirección).
         
         Args:
             lat: Latitud
             lng: Longitud
+            zoom: Nivel de detalle de la dirección (por defecto self.reverse_zoom)
+            deadline: Plazo de la llamada; el timeout de la petición sale del tiempo restante
         
         Returns:
             Dirección como string, o None si no se encuentra
         """
-        self._wait_for_rate_limit()
+        zoom = self.reverse_zoom if zoom is None else zoom
+        if self.reverse_cache is not None:
+            cached_address = self.reverse_cache.get(lat, lng, zoom)
+            if cached_address is not None:
+                logger.info(f"Geocodificación inversa desde caché: ({lat}, {lng})")
+                return cached_address
+        
+        await self._wait_for_rate_limit(deadline)
         
         try:
-            url = "https://nominatim.openstreetmap.org/reverse"
             params = {
                 'lat': lat,
                 'lon': lng,
                 'format': 'json',
+                'zoom': zoom,
                 'addressdetails': 1
             }
             
@@ -106,12 +191,14 @@ class NominatimClient:
                 'User-Agent': 'OSM-Finder-App/1.0'
             }
             
-            response = requests.get(
-                url,
-                params=params,
-                timeout=self.timeout,
-                headers=headers
-            )
+            client = get_http_client()
+            async with self.concurrency:
+                response = await client.get(
+                    NOMINATIM_REVERSE_URL,
+                    params=params,
+                    timeout=stage_timeout(deadline, self.timeout),
+                    headers=headers
+                )
             response.raise_for_status()
             
             result = response.json()
@@ -120,9 +207,11 @@ class NominatimClient:
                 return None
             
             address = result.get('display_name', '')
+            if self.reverse_cache is not None and address:
+                self.reverse_cache.set(lat, lng, zoom, address)
             return address
         
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             logger.error(f"Error en reverse geocode: {e}")
             return None
 
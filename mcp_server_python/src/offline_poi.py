@@ -0,0 +1,458 @@
+"""
+Motor de POIs offline construido a partir de un extracto de OpenStreetMap.
+
+La ingesta carga un extracto .osm.pbf (requiere pyosmium) o .osm XML (también
+.osm.bz2 / .osm.gz) en un índice espacial SQLite R*Tree, conservando solo los
+tags que usan parse_results y _determine_place_type. OfflinePoiClient responde
+search_places desde ese índice y recurre a Overpass fuera del área del extracto.
+
+Uso (desde mcp_server_python/):
+    python -m src.offline_poi ingest madrid-latest.osm.pbf --db data/pois.sqlite3
+
+Para activarlo en el servidor: POI_BACKEND=offline y OFFLINE_POI_DB=<ruta>.
+"""
+import os
+import sys
+import bz2
+import gzip
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+import argparse
+import xml.etree.ElementTree as ET
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .overpass_client import OverpassClient
+from .place import Place
+from .progress import ProgressCallback
+from .deadline import Deadline
+from .geo import circle_bbox, haversine_meters
+
+logger = logging.getLogger(__name__)
+
+POI_BACKEND = os.getenv("POI_BACKEND", "overpass")  # "overpass" u "offline"
+OFFLINE_POI_DB = os.getenv("OFFLINE_POI_DB", str(Path(__file__).parent.parent / "data" / "pois.sqlite3"))
+
+# Claves que convierten un elemento en POI (las que mira _determine_place_type)
+POI_KEYS = ('amenity', 'leisure', 'tourism', 'shop')
+# Tags que se conservan en el índice (los que usa parse_results)
+KEPT_TAG_KEYS = frozenset(POI_KEYS + (
+    'name', 'name:es', 'name:en', 'ref',
+    'addr:street', 'addr:housenumber', 'addr:city',
+))
+_BATCH_SIZE = 10000
+
+
+class OfflinePoiIndexWriter:
+    """Construye el índice SQLite R*Tree a partir de nodos, vías y relaciones."""
+
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Se escribe en un fichero temporal y se renombra al final (ingesta atómica)
+        self._tmp_path = self.db_path.with_suffix(self.db_path.suffix + ".tmp")
+        if self._tmp_path.exists():
+            self._tmp_path.unlink()
+        self.db = sqlite3.connect(str(self._tmp_path))
+        self.db.executescript(
+            """
+            PRAGMA journal_mode=OFF;
+            PRAGMA synchronous=OFF;
+            PRAGMA temp_store=FILE;
+            CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE poi (
+                id INTEGER PRIMARY KEY,
+                osm_type TEXT NOT NULL,
+                osm_id INTEGER NOT NULL,
+                lat REAL NOT NULL,
+                lng REAL NOT NULL,
+                amenity TEXT,
+                leisure TEXT,
+                tourism TEXT,
+                shop TEXT,
+                name TEXT,
+                tags TEXT NOT NULL
+            );
+            CREATE VIRTUAL TABLE poi_rtree USING rtree(id, min_lat, max_lat, min_lng, max_lng);
+            CREATE TEMP TABLE node_coords (id INTEGER PRIMARY KEY, lat REAL, lng REAL);
+            CREATE TEMP TABLE way_bbox (id INTEGER PRIMARY KEY, min_lat REAL, max_lat REAL, min_lng REAL, max_lng REAL);
+            """
+        )
+        self._node_batch: List[Tuple[int, float, float]] = []
+        self._pending_ways: List[Tuple[int, List[int], Dict[str, str]]] = []
+        self._bounds: Optional[Tuple[float, float, float, float]] = None
+        self._extent = [90.0, -90.0, 180.0, -180.0]  # min_lat, max_lat, min_lng, max_lng
+        self.poi_count = 0
+
+    def set_bounds(self, south: float, west: float, north: float, east: float) -> None:
+        """Fija el área del extracto (cabecera del fichero); si no, se usa la extensión de los nodos."""
+        self._bounds = (south, west, north, east)
+
+    def add_node(self, osm_id: int, lat: float, lng: float, tags: Dict[str, str]) -> None:
+        self._node_batch.append((osm_id, lat, lng))
+        extent = self._extent
+        if lat < extent[0]:
+            extent[0] = lat
+        if lat > extent[1]:
+            extent[1] = lat
+        if lng < extent[2]:
+            extent[2] = lng
+        if lng > extent[3]:
+            extent[3] = lng
+        if len(self._node_batch) >= _BATCH_SIZE:
+            self._flush_nodes()
+        if _is_poi(tags):
+            self._insert_poi('node', osm_id, lat, lng, tags)
+
+    def add_way(self, osm_id: int, node_refs: List[int], tags: Dict[str, str]) -> None:
+        self._pending_ways.append((osm_id, node_refs, tags))
+        if len(self._pending_ways) >= _BATCH_SIZE:
+            self._flush_ways()
+
+    def add_relation(self, osm_id: int, members: Iterable[Tuple[str, int]], tags: Dict[str, str]) -> None:
+        """Las relaciones POI usan como centro el de la caja de sus nodos y vías miembro."""
+        if not _is_poi(tags):
+            return
+        self._flush_ways()
+        boxes = []
+        for member_type, ref in members:
+            if member_type == 'n':
+                row = self.db.execute("SELECT lat, lat, lng, lng FROM node_coords WHERE id = ?", (ref,)).fetchone()
+            elif member_type == 'w':
+                row = self.db.execute(
+                    "SELECT min_lat, max_lat, min_lng, max_lng FROM way_bbox WHERE id = ?", (ref,)
+                ).fetchone()
+            else:
+                continue
+            if row is not None:
+                boxes.append(row)
+        if not boxes:
+            return
+        bbox = (
+            min(b[0] for b in boxes), max(b[1] for b in boxes),
+            min(b[2] for b in boxes), max(b[3] for b in boxes),
+        )
+        self._insert_poi('relation', osm_id, (bbox[0] + bbox[1]) / 2, (bbox[2] + bbox[3]) / 2, tags)
+
+    def _flush_nodes(self) -> None:
+        if self._node_batch:
+            self.db.executemany("INSERT OR REPLACE INTO node_coords VALUES (?, ?, ?)", self._node_batch)
+            self._node_batch = []
+
+    def _flush_ways(self) -> None:
+        """Calcula la caja de las vías pendientes (como el 'center' de Overpass)."""
+        self._flush_nodes()
+        for osm_id, node_refs, tags in self._pending_ways:
+            if not node_refs:
+                continue
+            bbox = None
+            for start in range(0, len(node_refs), 900):
+                chunk = node_refs[start:start + 900]
+                row = self.db.execute(
+                    "SELECT min(lat), max(lat), min(lng), max(lng) FROM node_coords "
+                    f"WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchone()
+                if row[0] is None:
+                    continue
+                bbox = row if bbox is None else (
+                    min(bbox[0], row[0]), max(bbox[1], row[1]), min(bbox[2], row[2]), max(bbox[3], row[3])
+                )
+            if bbox is None:
+                continue
+            self.db.execute("INSERT OR REPLACE INTO way_bbox VALUES (?, ?, ?, ?, ?)", (osm_id,) + tuple(bbox))
+            if _is_poi(tags):
+                self._insert_poi('way', osm_id, (bbox[0] + bbox[1]) / 2, (bbox[2] + bbox[3]) / 2, tags)
+        self._pending_ways = []
+
+    def _insert_poi(
+        self,
+        osm_type: str,
+        osm_id: int,
+        lat: float,
+        lng: float,
+        tags: Dict[str, str]
+    ) -> None:
+        kept = {k: v for k, v in tags.items() if k in KEPT_TAG_KEYS}
+        cursor = self.db.execute(
+            "INSERT INTO poi (osm_type, osm_id, lat, lng, amenity, leisure, tourism, shop, name, tags) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                osm_type, osm_id, lat, lng,
+                kept.get('amenity'), kept.get('leisure'), kept.get('tourism'), kept.get('shop'),
+                kept.get('name'), json.dumps(kept, ensure_ascii=False),
+            )
+        )
+        # El índice espacial guarda el centro (mismo punto que usa Overpass con 'out center')
+        self.db.execute("INSERT INTO poi_rtree VALUES (?, ?, ?, ?, ?)", (cursor.lastrowid, lat, lat, lng, lng))
+        self.poi_count += 1
+
+    def finish(self) -> int:
+        """Cierra la ingesta, guarda los metadatos y publica el índice. Devuelve el número de POIs."""
+        self._flush_ways()
+        if self._bounds is not None:
+            south, west, north, east = self._bounds
+        else:
+            south, north, west, east = self._extent
+        for key, value in (
+            ('bounds', json.dumps([south, west, north, east])),
+            ('created_at', str(time.time())),
+            ('poi_count', str(self.poi_count)),
+        ):
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+        for column in ('amenity', 'leisure', 'tourism', 'shop'):
+            self.db.execute(f"CREATE INDEX idx_poi_{column} ON poi({column})")
+        self.db.commit()
+        self.db.close()
+        os.replace(self._tmp_path, self.db_path)
+        return self.poi_count
+
+
+def _is_poi(tags: Dict[str, str]) -> bool:
+    return any(key in tags for key in POI_KEYS)
+
+
+def _open_xml(path: str):
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def _ingest_xml(path: str, writer: OfflinePoiIndexWriter) -> None:
+    """Lee un extracto .osm XML en streaming (memoria acotada)."""
+    with _open_xml(path) as f:
+        events = ET.iterparse(f, events=('start', 'end'))
+        # El primer evento es la apertura de <osm>: sus hijos se sueltan al procesarlos
+        _, root = next(events)
+        for event, elem in events:
+            if event != 'end':
+                continue
+            tag = elem.tag
+            if tag == 'bounds':
+                writer.set_bounds(
+                    float(elem.get('minlat')), float(elem.get('minlon')),
+                    float(elem.get('maxlat')), float(elem.get('maxlon'))
+                )
+                root.clear()
+            elif tag in ('node', 'way', 'relation'):
+                tags = {t.get('k'): t.get('v') for t in elem.iter('tag') if t.get('k') in KEPT_TAG_KEYS}
+                osm_id = int(elem.get('id'))
+                if tag == 'node':
+                    writer.add_node(osm_id, float(elem.get('lat')), float(elem.get('lon')), tags)
+                elif tag == 'way':
+                    writer.add_way(osm_id, [int(nd.get('ref')) for nd in elem.iter('nd')], tags)
+                else:
+                    writer.add_relation(
+                        osm_id,
+                        [(m.get('type', '')[:1], int(m.get('ref'))) for m in elem.iter('member')],
+                        tags
+                    )
+                # Vaciar el elemento no basta: seguiría colgando de la raíz
+                root.clear()
+
+
+def _ingest_pbf(path: str, writer: OfflinePoiIndexWriter) -> None:
+    """Lee un extracto .osm.pbf con pyosmium (dependencia opcional)."""
+    try:
+        import osmium
+    except ImportError:
+        raise RuntimeError("Para leer ficheros .osm.pbf instala pyosmium: pip install osmium")
+
+    header_box = osmium.io.Reader(path, osmium.osm.osm_entity_bits.NOTHING).header().box()
+    if header_box.valid():
+        writer.set_bounds(
+            header_box.bottom_left.lat, header_box.bottom_left.lon,
+            header_box.top_right.lat, header_box.top_right.lon
+        )
+
+    class _Handler(osmium.SimpleHandler):
+        def node(self, n):
+            writer.add_node(n.id, n.location.lat, n.location.lon, _kept_tags(n.tags))
+
+        def way(self, w):
+            writer.add_way(w.id, [nd.ref for nd in w.nodes], _kept_tags(w.tags))
+
+        def relation(self, r):
+            writer.add_relation(r.id, [(m.type, m.ref) for m in r.members], _kept_tags(r.tags))
+
+    _Handler().apply_file(path)
+
+
+def _kept_tags(tag_list) -> Dict[str, str]:
+    return {t.k: t.v for t in tag_list if t.k in KEPT_TAG_KEYS}
+
+
+def ingest(extract_path: str, db_path: str = OFFLINE_POI_DB) -> int:
+    """
+    Carga un extracto OSM en el índice offline.
+
+    Args:
+        extract_path: Ruta del extracto (.osm.pbf, .osm, .osm.bz2, .osm.gz)
+        db_path: Ruta del índice SQLite a generar
+
+    Returns:
+        Número de POIs indexados
+    """
+    writer = OfflinePoiIndexWriter(db_path)
+    if extract_path.endswith('.pbf'):
+        _ingest_pbf(extract_path, writer)
+    else:
+        _ingest_xml(extract_path, writer)
+    return writer.finish()
+
+
+class OfflinePoiClient(OverpassClient):
+    """
+    Cliente compatible con OverpassClient que responde desde el índice offline.
+
+    Las búsquedas cuyo círculo no queda dentro del área del extracto se
+    delegan en Overpass (con sus cachés).
+    """
+
+    def __init__(self, db_path: str = OFFLINE_POI_DB, **kwargs):
+        super().__init__(**kwargs)
+        self.db_path = db_path
+        with closing(self._connect()) as db:
+            row = db.execute("SELECT value FROM meta WHERE key = 'bounds'").fetchone()
+        self.bounds = tuple(json.loads(row[0])) if row else None
+        logger.info(f"Índice de POIs offline cargado desde {db_path} (área {self.bounds})")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Conexión de solo lectura; quien la abre debe cerrarla (contextlib.closing)."""
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+
+    def covers(self, lat: float, lng: float, radius_meters: float) -> bool:
+        """Indica si el círculo de búsqueda queda dentro del área del extracto."""
+        if self.bounds is None:
+            return False
+        south, west, north, east = circle_bbox(lat, lng, radius_meters)
+        b_south, b_west, b_north, b_east = self.bounds
+        return south >= b_south and north <= b_north and west >= b_west and east <= b_east
+
+    async def _fetch_places(
+        self,
+        place_types: List[str],
+        lat: float,
+        lng: float,
+        radius_meters: int,
+        limit: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[Place]:
+        if not self.covers(lat, lng, radius_meters):
+            logger.info("Búsqueda fuera del extracto offline, usando Overpass")
+            return await super()._fetch_places(place_types, lat, lng, radius_meters, limit, progress, deadline)
+        return await asyncio.to_thread(self._query_index, place_types, lat, lng, radius_meters)
+
+    async def _fetch_ring(
+        self,
+        place_types: List[str],
+        lat: float,
+        lng: float,
+        inner_radius: int,
+        outer_radius: int,
+        deadline: Optional[Deadline] = None
+    ) -> List[Place]:
+        if not self.covers(lat, lng, outer_radius):
+            return await super()._fetch_ring(place_types, lat, lng, inner_radius, outer_radius, deadline)
+        # Consultar el índice local es barato: se devuelve el círculo completo
+        return await asyncio.to_thread(self._query_index, place_types, lat, lng, outer_radius)
+
+    async def _fetch_batch_chunk(
+        self,
+        place_types: List[str],
+        centers: List[Tuple[float, float]],
+        radius_meters: int,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Place], bool]:
+        if not all(self.covers(lat, lng, radius_meters) for lat, lng in centers):
+            return await super()._fetch_batch_chunk(place_types, centers, radius_meters, deadline)
+        places: List[Place] = []
+        for lat, lng in centers:
+            places.extend(await asyncio.to_thread(self._query_index, place_types, lat, lng, radius_meters))
+        return places, True
+
+    def _query_index(self, place_types: List[str], lat: float, lng: float, radius_meters: int) -> List[Place]:
+        """Consulta el R*Tree y devuelve los lugares dentro del radio (sin distancias)."""
+        tags, names = self._resolve_place_types(place_types)
+        south, west, north, east = circle_bbox(lat, lng, radius_meters)
+
+        conditions = []
+        params: List = [south, north, west, east]
+        for key, value in tags:
+            if key in POI_KEYS:
+                conditions.append(f"p.{key} = ?")
+                params.append(value)
+            else:
+                conditions.append("json_extract(p.tags, ?) = ?")
+                params.extend([f'$."{key}"', value])
+        for name in names:
+            conditions.append("p.name LIKE ?")
+            params.append(f"%{name}%")
+        if not conditions:
+            conditions = ["p.amenity IS NOT NULL", "p.leisure IS NOT NULL", "p.tourism IS NOT NULL"]
+
+        sql = (
+            "SELECT p.osm_type, p.osm_id, p.lat, p.lng, p.tags "
+            "FROM poi_rtree r JOIN poi p ON p.id = r.id "
+            "WHERE r.min_lat >= ? AND r.max_lat <= ? AND r.min_lng >= ? AND r.max_lng <= ? "
+            f"AND ({' OR '.join(conditions)})"
+        )
+        with closing(self._connect()) as db:
+            rows = db.execute(sql, params).fetchall()
+
+        elements = []
+        for osm_type, osm_id, point_lat, point_lng, tags_json in rows:
+            if haversine_meters(lat, lng, point_lat, point_lng) > radius_meters:
+                continue
+            element = {'type': osm_type, 'id': osm_id, 'tags': json.loads(tags_json)}
+            if osm_type == 'node':
+                element['lat'] = point_lat
+                element['lon'] = point_lng
+            else:
+                element['center'] = {'lat': point_lat, 'lon': point_lng}
+            elements.append(element)
+        return self.parse_results({'elements': elements})
+
+
+def create_poi_client(**kwargs) -> OverpassClient:
+    """
+    Crea el cliente de POIs según la configuración (POI_BACKEND).
+
+    Args:
+        **kwargs: Argumentos para OverpassClient (nominatim_client, cachés...)
+
+    Returns:
+        OfflinePoiClient si POI_BACKEND=offline y existe el índice; si no, OverpassClient
+    """
+    if POI_BACKEND == "offline":
+        if Path(OFFLINE_POI_DB).exists():
+            return OfflinePoiClient(db_path=OFFLINE_POI_DB, **kwargs)
+        logger.warning(f"POI_BACKEND=offline pero no existe el índice {OFFLINE_POI_DB}, usando Overpass")
+    return OverpassClient(**kwargs)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Punto de entrada de la línea de comandos."""
+    parser = argparse.ArgumentParser(description="Índice de POIs offline para MySherlock 🔎")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    ingest_parser = subparsers.add_parser("ingest", help="Carga un extracto OSM en el índice")
+    ingest_parser.add_argument("extract", help="Extracto .osm.pbf, .osm, .osm.bz2 o .osm.gz")
+    ingest_parser.add_argument("--db", default=OFFLINE_POI_DB, help=f"Índice SQLite de salida (por defecto {OFFLINE_POI_DB})")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    start = time.time()
+    count = ingest(args.extract, args.db)
+    logger.info(f"{count} POIs indexados en {args.db} ({time.time() - start:.1f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
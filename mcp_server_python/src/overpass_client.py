@@ -1,24 +1,157 @@
 """
 Cliente para interactuar con la API de Overpass de OpenStreetMap.
 """
-import requests
-import time
-from typing import List, Dict, Optional, Tuple
+import os
+import re
+import asyncio
+from typing import List, Dict, Optional, Tuple, Union
 import logging
 
+import httpx
+
+from .http_client import get_http_client
+from .nominatim_client import NominatimClient, NOMINATIM_RATE_LIMIT
+from .result_cache import OverpassResultCache
+from .tile_cache import TilePoiCache
+from .geo import haversine_meters, haversine_many, nearest_indices, tile_bbox, tiles_for_circle
+from .overpass_stream import OverpassElementStream, OverpassStreamError, RunningTopK
+from .place import Place
+from .intent_matcher import intent_matcher
+from .overpass_ql import around_area, bbox_area, circle_area, compile_filters, compile_union
+from .progress import ProgressCallback, report_progress
+from .single_flight import SingleFlight
+from .endpoint_pool import EndpointPool
+from .resilience import CircuitOpenError, UpstreamError
+from .deadline import Deadline, DeadlineExceeded, DEADLINE_RENDER_RESERVE, TOOL_CALL_DEADLINE, stage_timeout
+from .rate_limiter import RateLimitExceeded
+
 logger = logging.getLogger(__name__)
 
-# URL del servidor Overpass público (puedes cambiarlo si prefieres otro)
-OVERPASS_API_URL = "https://overpass-api.de/api/interpreter"
 OVERPASS_TIMEOUT = 30  # segundos
+# Modo de salida: "tags" (solo tags, sin versión/usuario/changeset) o "meta" (completo)
+OVERPASS_OUTPUT_MODE = os.getenv("OVERPASS_OUTPUT_MODE", "tags")
+# Parseo en streaming: la memoria queda acotada por el número de resultados pedidos
+OVERPASS_STREAMING = os.getenv("OVERPASS_STREAMING", "1") == "1"
+# Tope de elementos que se piden a Overpass (protege la transferencia); nunca el límite
+# de resultados: Overpass corta la salida antes de ordenar por distancia
+OVERPASS_STREAM_MAX_ELEMENTS = int(os.getenv("OVERPASS_STREAM_MAX_ELEMENTS", "20000"))
+# Cada cuántos elementos recibidos se notifica el progreso en modo streaming
+OVERPASS_PROGRESS_INTERVAL = int(os.getenv("OVERPASS_PROGRESS_INTERVAL", "1000"))
+
+# Búsqueda adaptativa: factor de ampliación del radio en cada paso y radio máximo
+ADAPTIVE_RADIUS_GROWTH = float(os.getenv("ADAPTIVE_RADIUS_GROWTH", "2.0"))
+ADAPTIVE_MAX_RADIUS = int(os.getenv("ADAPTIVE_MAX_RADIUS", "10000"))
+# Centros por consulta en las búsquedas multi-centro (cada centro añade sentencias a la unión)
+OVERPASS_BATCH_CHUNK_SIZE = int(os.getenv("OVERPASS_BATCH_CHUNK_SIZE", "20"))
+# Segundos del plazo que no se gastan geocodificando centros (quedan para Overpass)
+BATCH_GEOCODE_RESERVE = float(os.getenv("BATCH_GEOCODE_RESERVE", "8"))
+# Centros de texto que se pueden geocodificar en una llamada (el resto vuelve con error)
+BATCH_MAX_TEXT_CENTERS = max(
+    1, int((TOOL_CALL_DEADLINE - DEADLINE_RENDER_RESERVE - BATCH_GEOCODE_RESERVE) * NOMINATIM_RATE_LIMIT)
+)
+# Memoria ([maxsize:]) que se pide a Overpass por cada segundo de [timeout:], con un mínimo
+OVERPASS_MAXSIZE_PER_SECOND = int(os.getenv("OVERPASS_MAXSIZE_PER_SECOND", str(4 * 1024 * 1024)))
+OVERPASS_MIN_MAXSIZE = int(os.getenv("OVERPASS_MIN_MAXSIZE", str(16 * 1024 * 1024)))
+
+# Timeout de la consulta a /api/status tras un 429
+OVERPASS_STATUS_TIMEOUT = 3
+
+_SLOTS_AVAILABLE_RE = re.compile(r'(\d+) slots? available now')
+_SLOT_AFTER_RE = re.compile(r'in (-?\d+) seconds')
+
+
+class OverpassError(UpstreamError):
+    """Error al consultar Overpass (reintentable salvo que se indique lo contrario)."""
+
+
+class OverpassRateLimitError(OverpassError):
+    """Overpass ha respondido 429 o no tiene slots libres."""
+
+
+class OverpassTimeoutError(OverpassError):
+    """Timeout de la petición o 504 de Overpass."""
+
+
+class OverpassQueryError(OverpassError):
+    """Overpass ha rechazado la consulta (4xx): reintentar no sirve de nada."""
+    
+    retryable = False
+
+
+class OverpassUnavailableError(OverpassError):
+    """Todos los endpoints tienen el circuito abierto: se falla sin esperar."""
+    
+    retryable = False
+
+
+def parse_slot_status(text: str) -> Optional[float]:
+    """
+    Interpreta la respuesta de /api/status de Overpass.
+    
+    Returns:
+        0 si hay slots libres, segundos hasta el próximo slot, o None si no se reconoce
+    """
+    match = _SLOTS_AVAILABLE_RE.search(text)
+    if match and int(match.group(1)) > 0:
+        return 0.0
+    waits = [max(0, int(seconds)) for seconds in _SLOT_AFTER_RE.findall(text)]
+    return float(min(waits)) if waits else None
+
+
+def is_truncating_remark(remark: Optional[str]) -> bool:
+    """
+    Indica si la observación ('remark') de una respuesta de Overpass significa
+    que la consulta no terminó (p. ej. 'runtime error: Query timed out' o
+    'runtime error: Query ran out of memory'): los elementos recibidos son parciales.
+    """
+    return bool(remark) and remark.lstrip().lower().startswith("runtime error")
+
+
+def is_truncated_response(data: Dict, max_elements: int = OVERPASS_STREAM_MAX_ELEMENTS) -> bool:
+    """Indica si una respuesta de Overpass está incompleta (tope de salida o error en el servidor)."""
+    return len(data.get('elements', [])) >= max_elements or is_truncating_remark(data.get('remark'))
+
+
+def _parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Cabecera Retry-After en segundos (la forma de fecha HTTP no se usa en Overpass)."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+
+# Endpoints con su salud y tope de concurrencia (compartido por todo el proceso)
+overpass_endpoints = EndpointPool()
+# Consultas idénticas en curso (compartido por todo el proceso)
+overpass_single_flight = SingleFlight("Overpass")
 
 
 class OverpassClient:
     """Cliente para realizar consultas a la API de Overpass."""
     
-    def __init__(self, api_url: str = OVERPASS_API_URL, timeout: int = OVERPASS_TIMEOUT):
-        self.api_url = api_url
+    def __init__(
+        self,
+        api_url: Optional[str] = None,
+        timeout: int = OVERPASS_TIMEOUT,
+        output_mode: str = OVERPASS_OUTPUT_MODE,
+        streaming: bool = OVERPASS_STREAMING,
+        nominatim_client: Optional[NominatimClient] = None,
+        result_cache: Optional[OverpassResultCache] = None,
+        tile_cache: Optional[TilePoiCache] = None,
+        endpoints: Optional[EndpointPool] = None,
+        single_flight: Optional[SingleFlight] = None
+    ):
+        # Un api_url explícito usa solo ese endpoint; si no, el pool compartido (OVERPASS_API_URLS)
+        if endpoints is None:
+            endpoints = EndpointPool([api_url]) if api_url else overpass_endpoints
+        self.endpoints = endpoints
         self.timeout = timeout
+        self.output_mode = output_mode
+        self.streaming = streaming
+        self.nominatim_client = nominatim_client or NominatimClient()
+        self.result_cache = result_cache
+        self.tile_cache = tile_cache
+        self.single_flight = single_flight or overpass_single_flight
     
     def build_query(
         self,
@@ -26,120 +159,424 @@ class OverpassClient:
         lat: float,
         lng: float,
         radius_meters: int = 1000,
-        limit: int = 50
+        limit: Optional[int] = 50,
+        deadline: Optional[Deadline] = None
     ) -> str:
         """
         Construye una consulta Overpass QL para buscar lugares.
         
+        Con radios a partir de OVERPASS_BBOX_RADIUS se busca en la caja que
+        contiene el círculo; quien la ejecute debe filtrar por distancia.
+        
         Args:
             place_types: Lista de tipos de lugares (ej: ['cafe', 'restaurant'])
             lat: Latitud del centro de búsqueda
             lng: Longitud del centro de búsqueda
             radius_meters: Radio de búsqueda en metros
-            limit: Límite de resultados
+            limit: Límite de elementos que devuelve Overpass (None para todos)
+            deadline: Plazo de la llamada ([timeout:] y [maxsize:] salen del tiempo restante)
         
         Returns:
             Consulta Overpass QL como string
         """
-        # Construir filtros para diferentes tipos de lugares
-        filters = []
-        
-        # Mapeo de tipos comunes a tags OSM
-        type_mapping = {
-            'cafe': 'amenity=cafe',
-            'cafeteria': 'amenity=cafe',
-            'restaurant': 'amenity=restaurant',
-            'bar': 'amenity=bar',
-            'pub': 'amenity=pub',
-            'library': 'amenity=library',
-            'biblioteca': 'amenity=library',
-            'park': 'leisure=park',
-            'parque': 'leisure=park',
-            'museum': 'tourism=museum',
-            'museo': 'tourism=museum',
-            'pharmacy': 'amenity=pharmacy',
-            'farmacia': 'amenity=pharmacy',
-            'hospital': 'amenity=hospital',
-            'hospital': 'amenity=hospital',
-            'school': 'amenity=school',
-            'colegio': 'amenity=school',
-            'university': 'amenity=university',
-            'universidad': 'amenity=university',
-            'cinema': 'amenity=cinema',
-            'cine': 'amenity=cinema',
-            'theatre': 'amenity=theatre',
-            'teatro': 'amenity=theatre',
-            'gym': 'leisure=fitness_centre',
-            'gimnasio': 'leisure=fitness_centre',
-            'supermarket': 'shop=supermarket',
-            'supermercado': 'shop=supermarket',
-        }
+        tags, names = self._resolve_place_types(place_types)
+        area, _ = circle_area(lat, lng, radius_meters)
+        timeout, maxsize = self._query_settings(deadline)
+        return compile_union(compile_filters(tags, names), [area], timeout, self.output_mode, limit, maxsize)
+    
+    def build_tiles_query(
+        self,
+        place_types: List[str],
+        bboxes: List[Tuple[float, float, float, float]],
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Construye una única consulta Overpass QL que cubre varios tiles.
         
-        # Construir filtros basados en los tipos solicitados
-        for place_type in place_types:
-            place_type_lower = place_type.lower()
-            if place_type_lower in type_mapping:
-                filters.append(f'({type_mapping[place_type_lower]})')
-            else:
-                # Si no está en el mapeo, intentar buscar por nombre o tag genérico
-                filters.append(f'(name~"{place_type}",i)')
+        Args:
+            place_types: Lista de tipos de lugares
+            bboxes: Cajas (sur, oeste, norte, este) de los tiles a descargar
+            deadline: Plazo de la llamada ([timeout:] y [maxsize:] salen del tiempo restante)
+        
+        Returns:
+            Consulta Overpass QL como string
+        """
+        tags, names = self._resolve_place_types(place_types)
+        areas = [bbox_area(bbox) for bbox in bboxes]
+        timeout, maxsize = self._query_settings(deadline)
+        return compile_union(compile_filters(tags, names), areas, timeout, self.output_mode, maxsize=maxsize)
+    
+    def build_ring_query(
+        self,
+        place_types: List[str],
+        lat: float,
+        lng: float,
+        inner_radius: int,
+        outer_radius: int,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Construye una consulta Overpass QL para el anillo entre dos radios.
         
-        # Si no hay filtros específicos, buscar cualquier amenity o leisure
-        if not filters:
-            filters = ['(amenity~".*")', '(leisure~".*")', '(tourism~".*")']
+        El círculo interior se resta con 'around' (no con su caja) para no
+        perder los lugares de las esquinas que la búsqueda anterior descartó.
+        
+        Args:
+            place_types: Lista de tipos de lugares
+            lat: Latitud del centro
+            lng: Longitud del centro
+            inner_radius: Radio ya cubierto (se excluye)
+            outer_radius: Radio nuevo
+            deadline: Plazo de la llamada
+        
+        Returns:
+            Consulta Overpass QL como string
+        """
+        tags, names = self._resolve_place_types(place_types)
+        outer_area, _ = circle_area(lat, lng, outer_radius)
+        timeout, maxsize = self._query_settings(deadline)
+        return compile_union(
+            compile_filters(tags, names), [outer_area], timeout, self.output_mode,
+            maxsize=maxsize, exclude_areas=[around_area(lat, lng, inner_radius)]
+        )
+    
+    def build_batch_query(
+        self,
+        place_types: List[str],
+        centers: List[Tuple[float, float]],
+        radius_meters: int,
+        limit: Optional[int] = None,
+        deadline: Optional[Deadline] = None
+    ) -> str:
+        """
+        Construye una única consulta Overpass QL para el mismo radio alrededor de varios centros.
         
-        filter_str = '|'.join(filters)
+        Args:
+            place_types: Lista de tipos de lugares
+            centers: Centros (lat, lng)
+            radius_meters: Radio alrededor de cada centro
+            limit: Límite de elementos que devuelve Overpass (None para todos)
+            deadline: Plazo de la llamada
         
-        # Consulta Overpass QL
-        query = f"""
-        [out:json][timeout:{self.timeout}];
-        (
-          node[{filter_str}](around:{radius_meters},{lat},{lng});
-          way[{filter_str}](around:{radius_meters},{lat},{lng});
-          relation[{filter_str}](around:{radius_meters},{lat},{lng});
-        );
-        out center meta;
+        Returns:
+            Consulta Overpass QL como string
         """
+        tags, names = self._resolve_place_types(place_types)
+        areas = [circle_area(lat, lng, radius_meters)[0] for lat, lng in centers]
+        timeout, maxsize = self._query_settings(deadline)
+        return compile_union(compile_filters(tags, names), areas, timeout, self.output_mode, limit, maxsize)
+    
+    def _query_settings(self, deadline: Optional[Deadline] = None) -> Tuple[int, int]:
+        """
+        Calcula [timeout:] y [maxsize:] de la consulta a partir del tiempo restante.
+        
+        Overpass asigna slots según lo que la consulta declara necesitar, así que
+        pedir solo lo que cabe en el plazo hace que se acepte antes. Los valores
+        se redondean (múltiplos de 5 s y potencias de 2) para que búsquedas
+        equivalentes generen la misma consulta y compartan petición y caché.
         
-        return query
+        Raises:
+            DeadlineExceeded: Si no queda tiempo para consultar Overpass
+        """
+        seconds = stage_timeout(deadline, self.timeout, DEADLINE_RENDER_RESERVE)
+        timeout = max(1, int(seconds)) if seconds < 10 else int(seconds) // 5 * 5
+        maxsize = max(OVERPASS_MIN_MAXSIZE, timeout * OVERPASS_MAXSIZE_PER_SECOND)
+        return timeout, 1 << (maxsize.bit_length() - 1)
     
-    def execute_query(self, query: str) -> Dict:
+    def _resolve_place_types(self, place_types: List[str]) -> Tuple[List[Tuple[str, str]], List[str]]:
+        """
+        Separa los tipos de lugar en tags OSM conocidos y nombres libres.
+        
+        Returns:
+            Tupla (lista de (clave, valor) de tags OSM, lista de nombres a buscar)
+        """
+        tags = []
+        names = []
+        for place_type in place_types:
+            category_tags = intent_matcher.tags_for(place_type)
+            if category_tags is None:
+                names.append(place_type)
+                continue
+            for tag in category_tags:
+                if tag not in tags:
+                    tags.append(tag)
+        return tags, names
+    
+    async def execute_query(self, query: str, deadline: Optional[Deadline] = None) -> Dict:
         """
         Ejecuta una consulta Overpass y devuelve los resultados.
         
         Args:
             query: Consulta Overpass QL
+            deadline: Plazo de la llamada (acota el timeout HTTP y los reintentos)
         
         Returns:
             Diccionario con los resultados de Overpass
         """
+        # Las consultas idénticas en curso comparten una sola petición
+        return await self.single_flight.do(('query', query), lambda: self._execute_query(query, deadline))
+    
+    async def _execute_query(self, query: str, deadline: Optional[Deadline] = None) -> Dict:
+        """Envía la consulta al pool de endpoints y decodifica la respuesta."""
+        logger.info("Ejecutando consulta Overpass...")
+        data = await self._run_on_endpoints(lambda url: self._post_query(url, query, deadline), deadline)
+        
+        if data.get('remark'):
+            # Con 'runtime error' los elementos son parciales: quien llama lo comprueba (is_truncated_response)
+            logger.warning(f"Overpass: {data['remark']}")
+        if 'elements' not in data:
+            logger.warning("Respuesta de Overpass sin elementos")
+            return {'elements': []}
+        
+        return data
+    
+    async def _run_on_endpoints(self, call, deadline: Optional[Deadline] = None):
+        """Ejecuta una petición en el pool traduciendo sus errores a errores de Overpass."""
+        try:
+            return await self.endpoints.run(call, deadline)
+        except CircuitOpenError:
+            logger.error("Overpass no disponible: circuito abierto")
+            raise OverpassUnavailableError("Overpass no está disponible temporalmente; inténtalo en unos segundos")
+        except OverpassError as e:
+            logger.error(f"Error al consultar Overpass: {e}")
+            raise
+        except UpstreamError as e:
+            logger.error(f"Error al consultar Overpass: {e}")
+            raise OverpassRateLimitError(f"Overpass está saturado: {e}", retry_after=e.retry_after)
+    
+    async def _post_query(self, api_url: str, query: str, deadline: Optional[Deadline] = None) -> Dict:
+        """Envía la consulta a un endpoint concreto."""
+        client = get_http_client()
         try:
-            logger.info(f"Ejecutando consulta Overpass...")
-            response = requests.post(
-                self.api_url,
+            response = await client.post(
+                api_url,
                 data={'data': query},
-                timeout=self.timeout,
+                timeout=stage_timeout(deadline, self.timeout, DEADLINE_RENDER_RESERVE),
                 headers={'Content-Type': 'application/x-www-form-urlencoded'}
             )
+            await self._check_status(api_url, response)
+            return response.json()
+        except httpx.TimeoutException:
+            raise OverpassTimeoutError("La consulta a Overpass ha excedido el tiempo límite")
+        except httpx.HTTPError as e:
+            raise OverpassError(f"Error al consultar Overpass: {str(e)}")
+        except ValueError as e:
+            raise OverpassError(f"Respuesta de Overpass no válida: {str(e)}")
+    
+    async def _check_status(self, api_url: str, response: httpx.Response) -> None:
+        """
+        Traduce el código HTTP de Overpass a un error tipado.
+        
+        Raises:
+            OverpassRateLimitError: 429 (con la espera anunciada por Retry-After o /api/status)
+            OverpassTimeoutError: 504 (servidor saturado o consulta demasiado larga)
+            OverpassError: Otros 5xx
+            OverpassQueryError: 4xx (consulta rechazada; no se reintenta)
+        """
+        status = response.status_code
+        if status < 400:
+            return
+        if status == 429:
+            retry_after = _parse_retry_after(response.headers.get('Retry-After'))
+            if retry_after is None:
+                retry_after = await self.slot_wait(api_url)
+            raise OverpassRateLimitError("Overpass: demasiadas peticiones (429)", retry_after=retry_after)
+        if status == 504:
+            raise OverpassTimeoutError("Overpass ha excedido el tiempo límite (504)")
+        if status >= 500:
+            raise OverpassError(f"Error del servidor Overpass ({status})")
+        raise OverpassQueryError(f"Overpass ha rechazado la consulta ({status})")
+    
+    async def slot_wait(self, api_url: str) -> Optional[float]:
+        """
+        Consulta /api/status del endpoint y devuelve cuántos segundos faltan para tener slot.
+        
+        Returns:
+            0 si hay slots libres, los segundos hasta el próximo slot, o None si no se sabe
+        """
+        status_url = api_url.rsplit('/', 1)[0] + '/status'
+        try:
+            client = get_http_client()
+            response = await client.get(status_url, timeout=OVERPASS_STATUS_TIMEOUT)
             response.raise_for_status()
-            
-            data = response.json()
-            
-            if 'elements' not in data:
-                logger.warning("Respuesta de Overpass sin elementos")
-                return {'elements': []}
-            
-            return data
+        except httpx.HTTPError as e:
+            logger.warning(f"No se pudo consultar el estado de Overpass en {status_url}: {e}")
+            return None
+        return parse_slot_status(response.text)
+    
+    async def stream_nearest(
+        self,
+        query: str,
+        lat: float,
+        lng: float,
+        radius_meters: float,
+        k: int,
+        max_elements: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Place], Optional[float], Optional[str]]:
+        """
+        Ejecuta una consulta Overpass parseando la respuesta en streaming.
         
-        except requests.exceptions.Timeout:
-            logger.error("Timeout al consultar Overpass")
-            raise Exception("La consulta a Overpass ha excedido el tiempo límite")
+        Los elementos se filtran por distancia según llegan y solo se conservan
+        los K más cercanos, de modo que la memoria no depende del tamaño de la respuesta.
+        Si el plazo se agota durante la descarga, se devuelve lo recibido hasta entonces.
         
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Error al consultar Overpass: {e}")
-            raise Exception(f"Error al consultar Overpass: {str(e)}")
+        Args:
+            query: Consulta Overpass QL
+            lat: Latitud del centro
+            lng: Longitud del centro
+            radius_meters: Radio de la búsqueda
+            k: Número de elementos más cercanos a conservar
+            max_elements: Límite de salida puesto en la consulta (para detectar truncado)
+            progress: Callback de progreso (cada OVERPASS_PROGRESS_INTERVAL elementos, con los más cercanos hasta el momento)
+            deadline: Plazo de la llamada
+        
+        Returns:
+            Tupla (lugares parseados de los K más cercanos, radio en el que el
+            resultado es completo o None si la salida está truncada, motivo si
+            el resultado es parcial: "overpass" si la descarga se cortó por el
+            plazo, "overpass truncado" si Overpass no completó la consulta)
+        """
+        # Las búsquedas idénticas en curso comparten una sola petición (y su progreso)
+        key = ('stream', query, lat, lng, radius_meters, k, max_elements)
+        return await self.single_flight.do(
+            key,
+            lambda: self._stream_nearest(
+                query, lat, lng, radius_meters, k, max_elements, self.single_flight.progress_for(key), deadline
+            ),
+            progress
+        )
+    
+    async def _stream_nearest(
+        self,
+        query: str,
+        lat: float,
+        lng: float,
+        radius_meters: float,
+        k: int,
+        max_elements: Optional[int],
+        progress: Optional[ProgressCallback],
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Place], Optional[float], Optional[str]]:
+        """Descarga y parsea la respuesta en streaming conservando los K más cercanos."""
+        logger.info("Ejecutando consulta Overpass (streaming)...")
+        parser, top_k, cut_short = await self._run_on_endpoints(
+            lambda url: self._stream_from(url, query, lat, lng, radius_meters, k, progress, deadline),
+            deadline
+        )
+        
+        if parser.remark:
+            logger.warning(f"Overpass: {parser.remark}")
+        
+        partial = None
+        if cut_short:
+            logger.warning(f"Plazo agotado tras {parser.element_count} elementos de Overpass; resultado parcial")
+            partial = "overpass"
+        elif is_truncating_remark(parser.remark) or (
+            max_elements is not None and parser.element_count >= max_elements
+        ):
+            # Faltan elementos que podrían estar más cerca que los recibidos
+            partial = "overpass truncado"
+        
+        if partial is not None:
+            complete_radius = None
+        elif top_k.is_full:
+            complete_radius = top_k.max_distance
+        else:
+            complete_radius = radius_meters
+        places = self.parse_results({'elements': [element for _, element in top_k.items()]})
+        return places, complete_radius, partial
     
-    def parse_results(self, overpass_data: Dict) -> List[Dict]:
+    def _running_results(self, top_k: RunningTopK, lat: float, lng: float, radius_meters: float) -> Dict:
+        """Resultados anticipados (datos de progreso) con los K más cercanos recibidos hasta ahora."""
+        places = self.parse_results({'elements': [element for _, element in top_k.items()]})
+        places = self._nearest(places, lat, lng, None)
+        return {
+            'searchResults': {
+                'places': [place.to_dict() for place in places],
+                'count': len(places),
+                'radius_meters': radius_meters,
+                'center': {'lat': lat, 'lng': lng},
+                'partial': True
+            }
+        }
+    
+    async def _stream_from(
+        self,
+        api_url: str,
+        query: str,
+        lat: float,
+        lng: float,
+        radius_meters: float,
+        k: int,
+        progress: Optional[ProgressCallback],
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[OverpassElementStream, RunningTopK, bool]:
+        """
+        Descarga la respuesta de un endpoint concreto filtrando los elementos según llegan.
+        
+        Returns:
+            Tupla (parser, K más cercanos, True si se dejó de leer por el plazo)
+        """
+        parser = OverpassElementStream()
+        top_k = RunningTopK(k)
+        notified = 0
+        cut_short = False
+        client = get_http_client()
+        try:
+            async with client.stream(
+                'POST',
+                api_url,
+                data={'data': query},
+                timeout=stage_timeout(deadline, self.timeout, DEADLINE_RENDER_RESERVE),
+                headers={'Content-Type': 'application/x-www-form-urlencoded'}
+            ) as response:
+                await self._check_status(api_url, response)
+                async for chunk in response.aiter_bytes():
+                    for element in parser.feed(chunk):
+                        point = self._element_point(element)
+                        if point is None:
+                            continue
+                        distance = haversine_meters(lat, lng, point[0], point[1])
+                        if distance <= radius_meters:
+                            top_k.push(distance, element)
+                    if progress is not None and parser.element_count // OVERPASS_PROGRESS_INTERVAL > notified:
+                        notified = parser.element_count // OVERPASS_PROGRESS_INTERVAL
+                        # Los más cercanos hasta ahora se envían mientras sigue la descarga
+                        await report_progress(
+                            progress,
+                            f"{parser.element_count} elementos recibidos de Overpass",
+                            self._running_results(top_k, lat, lng, radius_meters)
+                        )
+                    if deadline is not None and deadline.expired(DEADLINE_RENDER_RESERVE):
+                        # Sin tiempo: quedarse con lo recibido (el resto de la respuesta se descarta)
+                        cut_short = True
+                        break
+            if not cut_short:
+                parser.close()
+        except httpx.TimeoutException:
+            raise OverpassTimeoutError("La consulta a Overpass ha excedido el tiempo límite")
+        except (httpx.HTTPError, OverpassStreamError) as e:
+            raise OverpassError(f"Error al consultar Overpass: {str(e)}")
+        return parser, top_k, cut_short
+    
+    @staticmethod
+    def _element_point(element: Dict) -> Optional[Tuple[float, float]]:
+        """Devuelve (lat, lng) de un elemento de Overpass (nodo o centro de vía/relación)."""
+        if element.get('type') == 'node':
+            lat = element.get('lat')
+            lng = element.get('lon')
+        elif 'center' in element:
+            lat = element['center'].get('lat')
+            lng = element['center'].get('lon')
+        else:
+            return None
+        if not lat or not lng:
+            return None
+        return lat, lng
+    
+    def parse_results(self, overpass_data: Dict) -> List[Place]:
         """
         Parsea los resultados de Overpass a un formato más limpio.
         
@@ -158,17 +595,10 @@ class OverpassClient:
             tags = element.get('tags', {})
             
             # Obtener coordenadas
-            if element.get('type') == 'node':
-                lat = element.get('lat')
-                lng = element.get('lon')
-            elif 'center' in element:
-                lat = element['center'].get('lat')
-                lng = element['center'].get('lon')
-            else:
-                continue
-            
-            if not lat or not lng:
+            point = self._element_point(element)
+            if point is None:
                 continue
+            lat, lng = point
             
             # Obtener nombre
             name = (
@@ -193,23 +623,16 @@ class OverpassClient:
             
             address = ', '.join(address_parts) if address_parts else None
             
-            # URL de OpenStreetMap
-            osm_id = element.get('id')
-            osm_type = element.get('type')
-            osm_url = f"https://www.openstreetmap.org/{osm_type}/{osm_id}"
-            
-            place = {
-                'name': name,
-                'lat': lat,
-                'lng': lng,
-                'type': place_type,
-                'tags': tags,
-                'address': address,
-                'osm_id': osm_id,
-                'osm_type': osm_type,
-                'osm_url': osm_url,
-                'display_name': self._build_display_name(name, place_type, address)
-            }
+            place = Place(
+                name=name,
+                lat=lat,
+                lng=lng,
+                place_type=place_type,
+                tags=tags,
+                address=address,
+                osm_id=element.get('id'),
+                osm_type=element.get('type')
+            )
             
             places.append(place)
         
@@ -228,15 +651,6 @@ class OverpassClient:
         else:
             return 'place'
     
-    def _build_display_name(self, name: str, place_type: str, address: Optional[str]) -> str:
-        """Construye un nombre para mostrar."""
-        parts = [name]
-        if place_type:
-            parts.append(f"({place_type})")
-        if address:
-            parts.append(f"- {address}")
-        return ' '.join(parts)
-    
     def calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """
         Calcula la distancia en metros entre dos puntos usando la fórmula de Haversine.
@@ -248,103 +662,599 @@ class OverpassClient:
         Returns:
             Distancia en metros
         """
-        import math
+        return haversine_meters(lat1, lng1, lat2, lng2)
+    
+    async def search_places(
+        self,
+        query: str,
+        lat: Optional[float] = None,
+        lng: Optional[float] = None,
+        location_text: Optional[str] = None,
+        radius_meters: int = 1000,
+        limit: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[Place]:
+        """
+        Busca lugares usando Overpass.
         
-        R = 6371000  # Radio de la Tierra en metros
+        Args:
+            query: Descripción del tipo de lugar (ej: "cafeterías", "parques")
+            lat: Latitud del centro de búsqueda
+            lng: Longitud del centro de búsqueda
+            location_text: Texto de ubicación (si no hay lat/lng)
+            radius_meters: Radio de búsqueda en metros
+            limit: Número máximo de lugares a devolver (los más cercanos); None para todos
+            progress: Callback opcional que se avisa al terminar cada etapa
+            deadline: Plazo de la llamada; si se agota, el resultado puede ser
+                parcial o venir de caché (deadline.partial lo indica)
+        
+        Returns:
+            Lista de lugares encontrados, ordenados por distancia
+        """
+        lat, lng = await self._resolve_center(lat, lng, location_text, progress, deadline)
         
-        phi1 = math.radians(lat1)
-        phi2 = math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lng2 - lng1)
+        # Extraer tipos de lugares de la query
+        place_types = self._extract_place_types(query)
         
-        a = (
-            math.sin(delta_phi / 2) ** 2 +
-            math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
-        )
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        # Intentar responder desde caché (una búsqueda previa con radio mayor)
+        places = await self._fetch_places(place_types, lat, lng, radius_meters, limit, progress, deadline)
+        await report_progress(progress, f"{len(places)} lugares obtenidos")
         
-        return R * c
+        return self._nearest(places, lat, lng, limit)
     
-    def search_places(
+    async def search_places_adaptive(
         self,
         query: str,
+        target_count: int,
         lat: Optional[float] = None,
         lng: Optional[float] = None,
         location_text: Optional[str] = None,
-        radius_meters: int = 1000
-    ) -> List[Dict]:
+        radius_meters: int = 1000,
+        max_radius_meters: int = ADAPTIVE_MAX_RADIUS,
+        limit: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Place], int]:
         """
-        Busca lugares usando Overpass.
+        Busca lugares ampliando el radio hasta encontrar al menos target_count.
+        
+        Empieza con radius_meters y, mientras falten resultados, multiplica el
+        radio por ADAPTIVE_RADIUS_GROWTH descargando solo el anillo nuevo (los
+        lugares del círculo interior ya están). En zonas densas basta el
+        primer paso.
         
         Args:
-            query: Descripción del tipo de lugar (ej: "cafeterías", "parques")
+            query: Descripción del tipo de lugar
+            target_count: Número de lugares que se quiere encontrar
             lat: Latitud del centro de búsqueda
             lng: Longitud del centro de búsqueda
             location_text: Texto de ubicación (si no hay lat/lng)
-            radius_meters: Radio de búsqueda en metros
+            radius_meters: Radio inicial en metros
+            max_radius_meters: Radio máximo al que se puede ampliar
+            limit: Número máximo de lugares a devolver (los más cercanos); None para todos
+            progress: Callback opcional que se avisa al terminar cada etapa
+            deadline: Plazo de la llamada; si se agota, no se amplía más
+        
+        Returns:
+            Tupla (lugares ordenados por distancia, radio finalmente cubierto)
+        """
+        lat, lng = await self._resolve_center(lat, lng, location_text, progress, deadline)
+        place_types = self._extract_place_types(query)
+        max_radius_meters = max(radius_meters, max_radius_meters)
+        # Pedir al menos target_count: si el primer paso se trunca ya hay suficientes
+        fetch_limit = None if limit is None else max(limit, target_count)
+        
+        radius = radius_meters
+        places = await self._fetch_places(place_types, lat, lng, radius, fetch_limit, progress, deadline)
+        expanded = False
+        while len(places) < target_count and radius < max_radius_meters:
+            if deadline is not None and (deadline.partial or deadline.expired(DEADLINE_RENDER_RESERVE)):
+                break
+            outer = min(max_radius_meters, int(radius * ADAPTIVE_RADIUS_GROWTH))
+            await report_progress(progress, f"{len(places)} lugares en {radius}m, ampliando a {outer}m")
+            try:
+                ring = await self._fetch_ring_with_deadline(place_types, lat, lng, radius, outer, deadline)
+            except OverpassError as e:
+                # Lo ya encontrado es completo para el radio actual: se devuelve tal cual
+                logger.warning(f"No se pudo ampliar el radio a {outer}m: {e}")
+                break
+            if ring is None:
+                break
+            places = self._unique_within_radius(places + ring, lat, lng, outer)
+            radius = outer
+            expanded = True
+        
+        if expanded and self.result_cache is not None and not (deadline is not None and deadline.partial):
+            self.result_cache.store(place_types, lat, lng, radius, places)
+        await report_progress(progress, f"{len(places)} lugares obtenidos en {radius}m")
+        return self._nearest(places, lat, lng, limit), radius
+    
+    async def search_places_batch(
+        self,
+        query: str,
+        centers: List[Dict],
+        radius_meters: int = 1000,
+        limit_per_center: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[Dict]:
+        """
+        Busca el mismo tipo de lugar alrededor de varios centros.
+        
+        Los centros dados como texto se geocodifican de uno en uno (Nominatim
+        admite 1 petición/s) mientras quede plazo; los que no caben se
+        devuelven con 'error' y el resultado se marca como parcial.
+        
+        Los centros sin resultados en caché se agrupan en bloques de
+        OVERPASS_BATCH_CHUNK_SIZE y cada bloque se resuelve con una sola
+        consulta (unión de un área por centro). Después cada lugar se asigna
+        localmente a los centros en cuyo radio cae.
+        
+        Args:
+            query: Descripción del tipo de lugar
+            centers: Centros como diccionarios con 'lat'/'lng' o 'location_text'
+            radius_meters: Radio de búsqueda alrededor de cada centro
+            limit_per_center: Máximo de lugares por centro (los más cercanos); None para todos
+            progress: Callback opcional que se avisa al terminar cada etapa
+            deadline: Plazo de la llamada
         
         Returns:
-            Lista de lugares encontrados
+            Un diccionario por centro, en el mismo orden, con 'lat', 'lng' y
+            'places' (ordenados por distancia) o con 'error' si no se pudo buscar
+        """
+        place_types = self._extract_place_types(query)
+        resolved = await self._resolve_batch_centers(centers, progress, deadline)
+        
+        groups: List[Dict] = []
+        pending: List[int] = []  # centros que hay que pedir a Overpass
+        for index, center in enumerate(resolved):
+            if isinstance(center, BaseException):
+                groups.append({'error': str(center)})
+                continue
+            lat, lng = center
+            places = None
+            if self.result_cache is not None:
+                places = self.result_cache.lookup(place_types, lat, lng, radius_meters)
+            groups.append({'lat': lat, 'lng': lng, 'places': places})
+            if places is None:
+                pending.append(index)
+        await report_progress(
+            progress,
+            f"{len(centers) - len(pending)} de {len(centers)} centros resueltos sin consultar Overpass"
+        )
+        
+        if pending:
+            chunks = [
+                pending[start:start + OVERPASS_BATCH_CHUNK_SIZE]
+                for start in range(0, len(pending), OVERPASS_BATCH_CHUNK_SIZE)
+            ]
+            results = await self._fetch_batch_chunks(
+                place_types,
+                [[(groups[index]['lat'], groups[index]['lng']) for index in chunk] for chunk in chunks],
+                radius_meters,
+                deadline
+            )
+            for chunk, result in zip(chunks, results):
+                self._assign_batch_chunk(place_types, groups, chunk, result, radius_meters, deadline)
+            await report_progress(progress, f"{len(chunks)} consultas a Overpass para {len(pending)} centros")
+        
+        for group in groups:
+            if group.get('places') is not None:
+                group['places'] = self._nearest(group['places'], group['lat'], group['lng'], limit_per_center)
+        return groups
+    
+    async def _resolve_batch_centers(
+        self,
+        centers: List[Dict],
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[Union[Tuple[float, float], BaseException]]:
         """
-        # Si no hay coordenadas, intentar geocodificar
+        Resuelve los centros de una búsqueda multi-centro; devuelve (lat, lng) o la excepción.
+        
+        Los textos se geocodifican en serie: en paralelo se acumularían en la cola
+        del limitador de Nominatim y los últimos superarían su espera máxima. Cuando
+        el plazo (menos BATCH_GEOCODE_RESERVE) se agota o el limitador rechaza la
+        petición, el resto de centros de texto se dan por no resueltos.
+        """
+        resolved: List[Union[Tuple[float, float], BaseException]] = []
+        geocoded: Dict[str, Union[Tuple[float, float], BaseException]] = {}
+        out_of_time: Optional[BaseException] = None
+        for center in centers:
+            lat, lng, location_text = center.get('lat'), center.get('lng'), center.get('location_text')
+            if lat is not None and lng is not None:
+                resolved.append((lat, lng))
+                continue
+            if not location_text:
+                resolved.append(Exception("Se requiere lat/lng o location_text para buscar lugares"))
+                continue
+            if location_text in geocoded:
+                resolved.append(geocoded[location_text])
+                continue
+            if out_of_time is None and deadline is not None and deadline.expired(
+                DEADLINE_RENDER_RESERVE + BATCH_GEOCODE_RESERVE
+            ):
+                out_of_time = DeadlineExceeded(f"Sin tiempo para geocodificar: {location_text}")
+            if out_of_time is not None:
+                resolved.append(DeadlineExceeded(f"Sin tiempo para geocodificar: {location_text}"))
+                continue
+            try:
+                result: Union[Tuple[float, float], BaseException] = await self._resolve_center(
+                    None, None, location_text, None, deadline
+                )
+            except (RateLimitExceeded, DeadlineExceeded) as e:
+                out_of_time = e
+                result = e
+            except Exception as e:
+                result = e
+            geocoded[location_text] = result
+            resolved.append(result)
+        
+        if out_of_time is not None:
+            skipped = sum(isinstance(center, (RateLimitExceeded, DeadlineExceeded)) for center in resolved)
+            logger.warning(f"{skipped} centros sin geocodificar: {out_of_time}")
+            if deadline is not None:
+                deadline.mark_partial("geocodificación de centros incompleta")
+            await report_progress(progress, f"{skipped} centros sin geocodificar por falta de tiempo")
+        return resolved
+    
+    async def _fetch_batch_chunks(
+        self,
+        place_types: List[str],
+        chunks: List[List[Tuple[float, float]]],
+        radius_meters: int,
+        deadline: Optional[Deadline] = None
+    ) -> List[Union[Tuple[List[Place], bool], BaseException]]:
+        """Lanza la consulta de cada bloque de centros; devuelve (lugares, completo) o la excepción."""
+        try:
+            timeout = None if deadline is None else deadline.timeout(reserve=DEADLINE_RENDER_RESERVE / 2)
+        except DeadlineExceeded as e:
+            return [e] * len(chunks)
+        return await asyncio.gather(
+            *(
+                asyncio.wait_for(self._fetch_batch_chunk(place_types, chunk, radius_meters, deadline), timeout)
+                for chunk in chunks
+            ),
+            return_exceptions=True
+        )
+    
+    async def _fetch_batch_chunk(
+        self,
+        place_types: List[str],
+        centers: List[Tuple[float, float]],
+        radius_meters: int,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[List[Place], bool]:
+        """
+        Descarga los lugares alrededor de un bloque de centros con una sola consulta.
+        
+        Returns:
+            Tupla (lugares, True si la salida no está truncada)
+        """
+        overpass_query = self.build_batch_query(
+            place_types, centers, radius_meters, OVERPASS_STREAM_MAX_ELEMENTS, deadline
+        )
+        overpass_data = await self.execute_query(overpass_query, deadline)
+        return self.parse_results(overpass_data), not is_truncated_response(overpass_data)
+    
+    def _assign_batch_chunk(
+        self,
+        place_types: List[str],
+        groups: List[Dict],
+        chunk: List[int],
+        result: Union[Tuple[List[Place], bool], BaseException],
+        radius_meters: int,
+        deadline: Optional[Deadline] = None
+    ) -> None:
+        """Reparte los lugares de un bloque entre sus centros (o aplica el fallback si falló)."""
+        if isinstance(result, BaseException):
+            if isinstance(result, (asyncio.TimeoutError, DeadlineExceeded)):
+                logger.warning("Plazo agotado en la búsqueda multi-centro")
+                reason = "overpass"
+            elif isinstance(result, OverpassError) and not isinstance(result, OverpassQueryError):
+                logger.warning(f"Overpass no disponible en la búsqueda multi-centro ({result})")
+                reason = "stale_cache"
+            else:
+                for index in chunk:
+                    groups[index]['error'] = str(result)
+                return
+            for index in chunk:
+                group = groups[index]
+                stale = self._stale_places(place_types, group['lat'], group['lng'], radius_meters)
+                if stale is None:
+                    group['error'] = "Overpass no respondió a tiempo" if reason == "overpass" else str(result)
+                else:
+                    group['places'] = stale
+                if deadline is not None:
+                    deadline.mark_partial(reason)
+            return
+        
+        places, complete = result
+        if not complete:
+            logger.warning(f"Salida de Overpass truncada para un bloque de {len(chunk)} centros; resultado parcial")
+            if deadline is not None:
+                deadline.mark_partial("overpass truncado")
+        unique = {}
+        for place in places:
+            unique.setdefault((place.osm_type, place.osm_id), place)
+        places = list(unique.values())
+        lats = [place.lat for place in places]
+        lngs = [place.lng for place in places]
+        for index in chunk:
+            group = groups[index]
+            distances = haversine_many(group['lat'], group['lng'], lats, lngs)
+            group['places'] = [place for place, distance in zip(places, distances) if distance <= radius_meters]
+            if complete and self.result_cache is not None:
+                self.result_cache.store(place_types, group['lat'], group['lng'], radius_meters, group['places'])
+    
+    async def _resolve_center(
+        self,
+        lat: Optional[float],
+        lng: Optional[float],
+        location_text: Optional[str],
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> Tuple[float, float]:
+        """Devuelve el centro de la búsqueda, geocodificando location_text si no hay coordenadas."""
         if (lat is None or lng is None) and location_text:
-            from .nominatim_client import NominatimClient
-            nominatim = NominatimClient()
-            geocode_result = nominatim.geocode(location_text)
+            geocode_result = await self.nominatim_client.geocode(location_text, deadline)
             if geocode_result:
                 lat = geocode_result['lat']
                 lng = geocode_result['lng']
+                await report_progress(progress, f"Ubicación geocodificada: {geocode_result['display_name']}")
             else:
                 raise Exception(f"No se pudo geocodificar la ubicación: {location_text}")
         
         if lat is None or lng is None:
             raise Exception("Se requiere lat/lng o location_text para buscar lugares")
+        return lat, lng
+    
+    @staticmethod
+    def _nearest(places: List[Place], lat: float, lng: float, limit: Optional[int]) -> List[Place]:
+        """Calcula distancias en lote y devuelve los 'limit' lugares más cercanos, ordenados."""
+        distances = haversine_many(
+            lat, lng,
+            [place.lat for place in places],
+            [place.lng for place in places]
+        )
+        return [
+            places[index].with_distance(float(distances[index]))
+            for index in nearest_indices(distances, limit)
+        ]
+    
+    async def _fetch_ring_with_deadline(
+        self,
+        place_types: List[str],
+        lat: float,
+        lng: float,
+        inner_radius: int,
+        outer_radius: int,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[List[Place]]:
+        """_fetch_ring acotado por el plazo; None (y resultado parcial) si no da tiempo."""
+        if deadline is None:
+            return await self._fetch_ring(place_types, lat, lng, inner_radius, outer_radius)
+        try:
+            timeout = deadline.timeout(reserve=DEADLINE_RENDER_RESERVE / 2)
+            return await asyncio.wait_for(
+                self._fetch_ring(place_types, lat, lng, inner_radius, outer_radius, deadline),
+                timeout
+            )
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            logger.warning(f"Plazo agotado ampliando el radio a {outer_radius}m")
+            deadline.mark_partial("overpass")
+            return None
+    
+    async def _fetch_ring(
+        self,
+        place_types: List[str],
+        lat: float,
+        lng: float,
+        inner_radius: int,
+        outer_radius: int,
+        deadline: Optional[Deadline] = None
+    ) -> List[Place]:
+        """
+        Obtiene los lugares del anillo entre inner_radius y outer_radius.
         
-        # Extraer tipos de lugares de la query
-        place_types = self._extract_place_types(query)
+        Puede devolver también lugares del círculo interior (desde caché o
+        tiles, sin coste extra); quien llama elimina duplicados.
         
-        # Construir y ejecutar consulta
-        overpass_query = self.build_query(place_types, lat, lng, radius_meters)
-        overpass_data = self.execute_query(overpass_query)
+        Returns:
+            Lugares dentro de outer_radius, sin distancias
+        """
+        if self.result_cache is not None:
+            places = self.result_cache.lookup(place_types, lat, lng, outer_radius)
+            if places is not None:
+                logger.info("Anillo de la búsqueda adaptativa desde caché")
+                return places
+        if self.tile_cache is not None:
+            # Los tiles del círculo interior ya están en caché: solo se descargan los del anillo
+            places = await self._search_tiles(place_types, lat, lng, outer_radius, deadline)
+            if places is not None:
+                return places
+        overpass_query = self.build_ring_query(place_types, lat, lng, inner_radius, outer_radius, deadline)
+        overpass_data = await self.execute_query(overpass_query, deadline)
+        if is_truncated_response(overpass_data) and deadline is not None:
+            # El anillo está incompleto: el resultado ampliado no se guarda en caché
+            deadline.mark_partial("overpass truncado")
+        return self._unique_within_radius(self.parse_results(overpass_data), lat, lng, outer_radius)
+    
+    async def _fetch_places(
+        self,
+        place_types: List[str],
+        lat: float,
+        lng: float,
+        radius_meters: int,
+        limit: Optional[int] = None,
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[Deadline] = None
+    ) -> List[Place]:
+        """
+        Obtiene los lugares de la búsqueda (caché, tiles o consulta circular).
         
-        # Parsear resultados
-        places = self.parse_results(overpass_data)
+        Args:
+            limit: Máximo de elementos a pedir a Overpass en la consulta circular
+            progress: Callback de progreso de la descarga en streaming
+            deadline: Plazo de la llamada
         
-        # Calcular distancias y ordenar
-        for place in places:
-            place['distance_meters'] = self.calculate_distance(
-                lat, lng, place['lat'], place['lng']
+        Returns:
+            Lista de lugares parseados, sin distancias
+        """
+        places = None
+        if self.result_cache is not None:
+            places = self.result_cache.lookup(place_types, lat, lng, radius_meters)
+            if places is not None:
+                logger.info("Resultados de Overpass desde caché")
+        
+        if places is not None:
+            return places
+        
+        try:
+            if deadline is None:
+                return await self._fetch_from_overpass(place_types, lat, lng, radius_meters, limit, progress)
+            # Corte duro por si el streaming no llega a parar a tiempo (p. ej. esperando slot)
+            timeout = deadline.timeout(reserve=DEADLINE_RENDER_RESERVE / 2)
+            return await asyncio.wait_for(
+                self._fetch_from_overpass(place_types, lat, lng, radius_meters, limit, progress, deadline),
+                timeout
+            )
+        except (asyncio.TimeoutError, DeadlineExceeded):
+            if deadline is None:
+                raise
+            # Sin tiempo: mejor lo que haya en caché (aunque esté caducado) que nada
+            logger.warning("Plazo agotado esperando a Overpass; respondiendo con lo que haya en caché")
+            deadline.mark_partial("overpass")
+            stale = self._stale_places(place_types, lat, lng, radius_meters)
+            return stale if stale is not None else []
+        except OverpassError as e:
+            # Con Overpass caído (o el circuito abierto) es mejor un resultado algo antiguo que ninguno
+            stale = None if isinstance(e, OverpassQueryError) else self._stale_places(place_types, lat, lng, radius_meters)
+            if stale is None:
+                raise
+            logger.warning(f"Overpass no disponible ({e}); usando resultados caducados de la caché")
+            if deadline is not None:
+                deadline.mark_partial("stale_cache")
+            return stale
+    
+    async def _fetch_from_overpass(
+        self,
+        place_types: List[str],
+        lat: float,
+        lng: float,
+        radius_meters: int,
+        limit: Optional[int],
+        progress: Optional[ProgressCallback],
+        deadline: Optional[Deadline] = None
+    ) -> List[Place]:
+        """Descarga los lugares de Overpass (por tiles, en streaming o con una consulta circular)."""
+        places = None
+        if self.tile_cache is not None:
+            places = await self._search_tiles(place_types, lat, lng, radius_meters, deadline)
+        
+        if places is None and self.streaming and limit is not None:
+            # Streaming: se recorre toda la respuesta pero solo se guardan los K más cercanos
+            overpass_query = self.build_query(place_types, lat, lng, radius_meters, OVERPASS_STREAM_MAX_ELEMENTS, deadline)
+            places, complete_radius, partial = await self.stream_nearest(
+                overpass_query, lat, lng, radius_meters, limit, OVERPASS_STREAM_MAX_ELEMENTS, progress, deadline
             )
+            if partial is not None and deadline is not None:
+                deadline.mark_partial(partial)
+            if self.result_cache is not None and complete_radius:
+                self.result_cache.store(place_types, lat, lng, complete_radius, places)
         
-        # Ordenar por distancia
-        places.sort(key=lambda x: x['distance_meters'])
+        if places is None:
+            # Construir y ejecutar consulta (el límite se aplica después, al ordenar por distancia)
+            overpass_query = self.build_query(
+                place_types, lat, lng, radius_meters, OVERPASS_STREAM_MAX_ELEMENTS, deadline
+            )
+            _, is_bbox = circle_area(lat, lng, radius_meters)
+            overpass_data = await self.execute_query(overpass_query, deadline)
+            
+            # Parsear resultados (con radios grandes se pide una caja: filtrar por distancia)
+            places = self.parse_results(overpass_data)
+            if is_bbox:
+                places = self._unique_within_radius(places, lat, lng, radius_meters)
+            # Si Overpass ha truncado la salida, el resultado no es completo para el radio
+            if is_truncated_response(overpass_data):
+                logger.warning("Salida de Overpass truncada; resultado parcial")
+                if deadline is not None:
+                    deadline.mark_partial("overpass truncado")
+            elif self.result_cache is not None:
+                self.result_cache.store(place_types, lat, lng, radius_meters, places)
         
         return places
     
+    async def _search_tiles(
+        self,
+        place_types: List[str],
+        lat: float,
+        lng: float,
+        radius_meters: int,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[List[Place]]:
+        """
+        Busca lugares componiendo tiles cacheados y descargando solo los que faltan.
+        
+        Returns:
+            Lugares dentro del radio (sin distancias), o None si la búsqueda
+            necesita demasiados tiles y debe hacerse con una consulta circular
+        """
+        tiles = tiles_for_circle(lat, lng, radius_meters, self.tile_cache.zoom)
+        if len(tiles) > self.tile_cache.max_tiles_per_search:
+            return None
+        
+        places, missing = self.tile_cache.get_many(place_types, tiles)
+        if missing:
+            logger.info(f"Descargando {len(missing)} de {len(tiles)} tiles de Overpass")
+            bboxes = [tile_bbox(x, y, self.tile_cache.zoom) for x, y in missing]
+            overpass_query = self.build_tiles_query(place_types, bboxes, deadline)
+            overpass_data = await self.execute_query(overpass_query, deadline)
+            if is_truncating_remark(overpass_data.get('remark')):
+                # Tiles incompletos: se usan para esta respuesta pero no se guardan
+                places.extend(self.parse_results(overpass_data))
+                if deadline is not None:
+                    deadline.mark_partial("overpass truncado")
+            else:
+                places.extend(self.tile_cache.put_many(place_types, missing, self.parse_results(overpass_data)))
+        else:
+            logger.info(f"Resultados de Overpass desde {len(tiles)} tiles cacheados")
+        
+        # Los tiles cubren más que el círculo: eliminar duplicados y filtrar por distancia
+        return self._unique_within_radius(places, lat, lng, radius_meters)
+    
+    def _stale_places(self, place_types: List[str], lat: float, lng: float, radius_meters: int) -> Optional[List[Place]]:
+        """Lugares de entradas de caché caducadas (dentro del margen de stale), o None si no hay."""
+        if self.result_cache is not None:
+            places = self.result_cache.lookup(place_types, lat, lng, radius_meters, allow_stale=True)
+            if places is not None:
+                return places
+        if self.tile_cache is not None:
+            tiles = tiles_for_circle(lat, lng, radius_meters, self.tile_cache.zoom)
+            if len(tiles) <= self.tile_cache.max_tiles_per_search:
+                places, missing = self.tile_cache.get_many(place_types, tiles, allow_stale=True)
+                if not missing:
+                    return self._unique_within_radius(places, lat, lng, radius_meters)
+        return None
+    
+    @staticmethod
+    def _unique_within_radius(places: List[Place], lat: float, lng: float, radius_meters: float) -> List[Place]:
+        """Elimina duplicados (mismo objeto OSM) y descarta los lugares fuera del radio."""
+        unique = {}
+        for place in places:
+            unique.setdefault((place.osm_type, place.osm_id), place)
+        places = list(unique.values())
+        distances = haversine_many(
+            lat, lng,
+            [place.lat for place in places],
+            [place.lng for place in places]
+        )
+        return [place for place, distance in zip(places, distances) if distance <= radius_meters]
+    
     def _extract_place_types(self, query: str) -> List[str]:
         """Extrae tipos de lugares de una query de texto."""
-        query_lower = query.lower()
-        
-        # Palabras clave comunes
-        keywords = {
-            'cafe': ['café', 'cafe', 'cafetería', 'cafeteria', 'coffee'],
-            'restaurant': ['restaurante', 'restaurant', 'comida'],
-            'library': ['biblioteca', 'library', 'libro'],
-            'park': ['parque', 'park', 'verde', 'zona verde'],
-            'museum': ['museo', 'museum'],
-            'pharmacy': ['farmacia', 'pharmacy'],
-            'hospital': ['hospital'],
-            'school': ['colegio', 'school', 'escuela'],
-            'cinema': ['cine', 'cinema', 'película'],
-            'theatre': ['teatro', 'theatre'],
-            'gym': ['gimnasio', 'gym', 'fitness'],
-            'supermarket': ['supermercado', 'supermarket', 'tienda']
-        }
-        
-        found_types = []
-        for place_type, keywords_list in keywords.items():
-            if any(keyword in query_lower for keyword in keywords_list):
-                found_types.append(place_type)
+        found_types = intent_matcher.match(query)
         
         # Si no se encontró nada específico, devolver la query como está
         if not found_types:
@@ -352,4 +1262,3 @@ class OverpassClient:
         
         return found_types
 
-
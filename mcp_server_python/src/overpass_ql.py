@@ -0,0 +1,144 @@
+"""
+Compilador de consultas Overpass QL.
+
+Genera una sentencia 'nwr' por filtro dentro de una unión (Overpass elimina
+los duplicados), con todo el texto del usuario escapado. Los filtros por
+nombre van siempre precedidos de un filtro exacto de clave (["name"]), que
+Overpass resuelve con su índice antes de evaluar la expresión regular.
+"""
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from .geo import circle_bbox
+
+# A partir de este radio se usa una caja en lugar de 'around' (más barato para
+# Overpass; los resultados se filtran después por distancia)
+OVERPASS_BBOX_RADIUS = int(os.getenv("OVERPASS_BBOX_RADIUS", "3000"))
+
+# Claves que se buscan cuando la consulta no corresponde a ningún tipo conocido
+FALLBACK_KEYS = ("amenity", "leisure", "tourism")
+
+_COORD_DECIMALS = 7  # ~1 cm, suficiente y evita notación científica
+_REGEX_SPECIAL_RE = re.compile(r'([\\.^$|?*+()\[\]{}])')
+
+
+def escape_string(value: str) -> str:
+    """Escapa un valor para usarlo entre comillas dobles en Overpass QL."""
+    return (
+        value.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\t", "\\t")
+    )
+
+
+def escape_regex(value: str) -> str:
+    """Escapa el texto del usuario para buscarlo literalmente dentro de una expresión regular."""
+    return escape_string(_REGEX_SPECIAL_RE.sub(r"\\\1", value))
+
+
+def _coord(value: float) -> str:
+    return f"{value:.{_COORD_DECIMALS}f}".rstrip("0").rstrip(".")
+
+
+def tag_filter(key: str, value: Optional[str] = None) -> str:
+    """Filtro de tag exacto: ["clave"="valor"] o, sin valor, ["clave"]."""
+    if value is None:
+        return f'["{escape_string(key)}"]'
+    return f'["{escape_string(key)}"="{escape_string(value)}"]'
+
+
+def name_filter(name: str) -> str:
+    """Filtro por nombre (subcadena, sin distinguir mayúsculas) con prefiltro exacto de clave."""
+    return f'["name"]["name"~"{escape_regex(name)}",i]'
+
+
+def compile_filters(tags: Sequence[Tuple[str, str]], names: Sequence[str]) -> List[str]:
+    """
+    Traduce tags OSM y nombres libres a filtros Overpass (uno por sentencia).
+
+    Args:
+        tags: Pares (clave, valor) de tags OSM
+        names: Textos a buscar en el nombre
+
+    Returns:
+        Lista de filtros; si no hay ninguno, los de FALLBACK_KEYS
+    """
+    filters = [tag_filter(key, value) for key, value in tags]
+    filters.extend(name_filter(name) for name in names if name.strip())
+    if not filters:
+        filters = [tag_filter(key) for key in FALLBACK_KEYS]
+    return filters
+
+
+def around_area(lat: float, lng: float, radius_meters: float) -> str:
+    """Área circular (around) alrededor de un punto."""
+    return f"(around:{int(round(radius_meters))},{_coord(lat)},{_coord(lng)})"
+
+
+def bbox_area(bbox: Tuple[float, float, float, float]) -> str:
+    """Área rectangular a partir de (sur, oeste, norte, este)."""
+    return "(" + ",".join(_coord(value) for value in bbox) + ")"
+
+
+def circle_area(
+    lat: float,
+    lng: float,
+    radius_meters: float,
+    bbox_radius: int = OVERPASS_BBOX_RADIUS
+) -> Tuple[str, bool]:
+    """
+    Área de búsqueda para un círculo: 'around' para radios pequeños y caja para grandes.
+
+    Returns:
+        Tupla (área, True si es una caja y hay que filtrar por distancia después)
+    """
+    if radius_meters >= bbox_radius:
+        return bbox_area(circle_bbox(lat, lng, radius_meters)), True
+    return around_area(lat, lng, radius_meters), False
+
+
+def compile_union(
+    filters: Sequence[str],
+    areas: Sequence[str],
+    timeout: int,
+    output_mode: str = "tags",
+    limit: Optional[int] = None,
+    maxsize: Optional[int] = None,
+    exclude_areas: Sequence[str] = ()
+) -> str:
+    """
+    Construye la consulta completa: unión de 'nwr' filtro×área y salida con centro.
+
+    Con exclude_areas se devuelve la diferencia entre ambas uniones (p. ej. el
+    anillo entre dos radios, restando el círculo ya descargado).
+
+    Args:
+        filters: Filtros generados por compile_filters
+        areas: Áreas (around_area, bbox_area)
+        timeout: Timeout de la consulta en el servidor (segundos)
+        output_mode: Modo de salida ("tags" o "meta")
+        limit: Máximo de elementos a devolver (None para todos)
+        maxsize: Memoria máxima en bytes que puede usar la consulta en el servidor
+        exclude_areas: Áreas cuyos elementos se restan del resultado
+
+    Returns:
+        Consulta Overpass QL como string
+    """
+    count = f" {limit}" if limit else ""
+    settings = f"[out:json][timeout:{timeout}]"
+    if maxsize:
+        settings += f"[maxsize:{maxsize}]"
+    body = f"(\n{_statements(filters, areas)}\n);\n"
+    if exclude_areas:
+        body = (
+            f"(\n{_statements(filters, areas)}\n)->.included;\n"
+            f"(\n{_statements(filters, exclude_areas)}\n)->.excluded;\n"
+            "(.included; - .excluded;);\n"
+        )
+    return f"{settings};\n{body}out center {output_mode}{count};\n"
+
+
+def _statements(filters: Sequence[str], areas: Sequence[str]) -> str:
+    return "\n".join(f"  nwr{filter_str}{area};" for area in areas for filter_str in filters)
@@ -0,0 +1,132 @@
+"""
+Parser incremental de respuestas JSON de Overpass.
+
+Extrae los objetos del array "elements" a medida que llegan los bytes del
+socket, sin cargar la respuesta completa en memoria. Junto con RunningTopK
+permite quedarse solo con los K elementos más cercanos mientras se descarga.
+"""
+import re
+import json
+import codecs
+import heapq
+import logging
+from typing import Any, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_ELEMENTS_KEY_RE = re.compile(r'"elements"\s*:\s*\[')
+_REMARK_RE = re.compile(r'"remark"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_WHITESPACE_AND_COMMAS = " \t\r\n,"
+
+
+class OverpassStreamError(Exception):
+    """La respuesta de Overpass está truncada o mal formada."""
+
+
+class OverpassElementStream:
+    """Parser incremental del array 'elements' de una respuesta JSON de Overpass."""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._in_elements = False
+        self._done = False
+        self._tail = ""
+        self.element_count = 0
+
+    @property
+    def remark(self) -> Optional[str]:
+        """Observación de Overpass tras los elementos (p. ej. 'runtime error: Query timed out')."""
+        match = _REMARK_RE.search(self._tail)
+        return json.loads(f'"{match.group(1)}"') if match else None
+
+    def feed(self, chunk: bytes) -> Iterator[dict]:
+        """
+        Añade un fragmento de la respuesta y devuelve los elementos completos.
+
+        Args:
+            chunk: Bytes recibidos del socket
+
+        Yields:
+            Elementos de Overpass (dicts) completos
+        """
+        text = self._utf8.decode(chunk)
+        if self._done:
+            self._tail += text
+            return
+        self._buffer += text
+
+        if not self._in_elements:
+            match = _ELEMENTS_KEY_RE.search(self._buffer)
+            if match is None:
+                # Conservar solo el final por si la clave llega partida entre fragmentos
+                self._buffer = self._buffer[-64:]
+                return
+            self._buffer = self._buffer[match.end():]
+            self._in_elements = True
+
+        buffer = self._buffer
+        pos = 0
+        length = len(buffer)
+        while True:
+            while pos < length and buffer[pos] in _WHITESPACE_AND_COMMAS:
+                pos += 1
+            if pos >= length:
+                break
+            if buffer[pos] == "]":
+                self._done = True
+                self._tail = buffer[pos + 1:]
+                pos = length
+                break
+            try:
+                element, end = self._decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Elemento incompleto: esperar al siguiente fragmento
+                break
+            pos = end
+            self.element_count += 1
+            yield element
+        self._buffer = buffer[pos:]
+
+    def close(self) -> None:
+        """
+        Comprueba que la respuesta ha terminado correctamente.
+
+        Raises:
+            OverpassStreamError: Si el array de elementos no llegó a cerrarse
+        """
+        self._tail += self._utf8.decode(b"", final=True)
+        if not self._done:
+            raise OverpassStreamError("Respuesta de Overpass incompleta o mal formada")
+
+
+class RunningTopK:
+    """Mantiene los K elementos de menor distancia vistos hasta el momento."""
+
+    def __init__(self, k: int):
+        self.k = k
+        self._heap: List[Tuple[float, int, Any]] = []  # (-distancia, orden, elemento)
+        self._counter = 0
+
+    def push(self, distance: float, item: Any) -> None:
+        """Ofrece un elemento; solo se conserva si está entre los K más cercanos."""
+        self._counter += 1
+        entry = (-distance, self._counter, item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif distance < -self._heap[0][0]:
+            heapq.heapreplace(self._heap, entry)
+
+    @property
+    def is_full(self) -> bool:
+        return len(self._heap) >= self.k
+
+    @property
+    def max_distance(self) -> Optional[float]:
+        """Distancia del elemento más lejano conservado."""
+        return -self._heap[0][0] if self._heap else None
+
+    def items(self) -> List[Tuple[float, Any]]:
+        """Devuelve (distancia, elemento) ordenados de menor a mayor distancia."""
+        return [(-neg_distance, item) for neg_distance, _, item in sorted(self._heap, key=lambda e: (-e[0], e[1]))]
@@ -0,0 +1,110 @@
+"""
+Paginación por cursor de resultados de búsqueda.
+
+La primera página de una búsqueda guarda el conjunto completo de resultados
+(ya ordenado por distancia) en memoria; las páginas siguientes se sirven desde
+ahí con un cursor opaco, sin volver a consultar Overpass.
+"""
+import os
+import time
+import base64
+import secrets
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+PAGINATION_MAX_PAGES = int(os.getenv("PAGINATION_MAX_PAGES", "10"))  # páginas que se piden a Overpass
+PAGINATION_TTL = int(os.getenv("PAGINATION_TTL", "1800"))  # 30 minutos
+PAGINATION_MAX_RESULT_SETS = int(os.getenv("PAGINATION_MAX_RESULT_SETS", "500"))
+
+
+class InvalidCursorError(ValueError):
+    """El cursor no es válido o su conjunto de resultados ha caducado."""
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    """Normaliza el tamaño de página pedido a [1, MAX_PAGE_SIZE]."""
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
+
+
+def encode_cursor(result_set_id: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{result_set_id}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        result_set_id, offset = base64.urlsafe_b64decode(padded.encode()).decode().rsplit(":", 1)
+        return result_set_id, int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursorError(f"Cursor no válido: {cursor}") from None
+
+
+class ResultPager:
+    """Almacén de conjuntos de resultados ordenados para paginación estable."""
+
+    def __init__(self, ttl: int = PAGINATION_TTL, max_result_sets: int = PAGINATION_MAX_RESULT_SETS):
+        """
+        Args:
+            ttl: Tiempo de vida de cada conjunto de resultados, en segundos
+            max_result_sets: Máximo de conjuntos en memoria (LRU)
+        """
+        self.ttl = ttl
+        self.max_result_sets = max_result_sets
+        # id -> (expira_en, lugares ordenados, metadatos de la búsqueda)
+        self._result_sets: "OrderedDict[str, Tuple[float, List[Any], Dict]]" = OrderedDict()
+
+    def first_page(self, places: List[Any], limit: int, meta: Optional[Dict] = None) -> Dict:
+        """
+        Guarda el conjunto de resultados y devuelve su primera página.
+
+        Args:
+            places: Lugares ordenados por distancia
+            limit: Tamaño de página
+            meta: Metadatos de la búsqueda (query, centro, radio) para páginas siguientes
+
+        Returns:
+            Diccionario con 'places', 'next_cursor', 'total', 'offset' y 'meta'
+        """
+        meta = meta or {}
+        if len(places) <= limit:
+            return self._page(None, places, 0, limit, meta)
+        result_set_id = secrets.token_urlsafe(9)
+        self._result_sets[result_set_id] = (time.time() + self.ttl, places, meta)
+        while len(self._result_sets) > self.max_result_sets:
+            self._result_sets.popitem(last=False)
+        return self._page(result_set_id, places, 0, limit, meta)
+
+    def get_page(self, cursor: str, limit: int) -> Dict:
+        """
+        Devuelve la página indicada por el cursor sin consultar Overpass.
+
+        Raises:
+            InvalidCursorError: Si el cursor no es válido o ha caducado
+        """
+        result_set_id, offset = decode_cursor(cursor)
+        entry = self._result_sets.get(result_set_id)
+        if entry is None or entry[0] <= time.time():
+            self._result_sets.pop(result_set_id, None)
+            raise InvalidCursorError("El cursor ha caducado; repite la búsqueda")
+        self._result_sets.move_to_end(result_set_id)
+        _, places, meta = entry
+        return self._page(result_set_id, places, offset, limit, meta)
+
+    @staticmethod
+    def _page(result_set_id: Optional[str], places: List[Any], offset: int, limit: int, meta: Dict) -> Dict:
+        end = offset + limit
+        next_cursor = encode_cursor(result_set_id, end) if result_set_id and end < len(places) else None
+        return {
+            "places": places[offset:end],
+            "next_cursor": next_cursor,
+            "total": len(places),
+            "offset": offset,
+            "meta": meta,
+        }
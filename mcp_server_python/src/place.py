@@ -0,0 +1,103 @@
+"""
+Modelo compacto de lugar.
+
+Place usa __slots__ (sin __dict__ por instancia), interna los strings de tipo
+y calcula osm_url y display_name solo cuando se piden. La conversión al
+formato de la respuesta (dict) se hace únicamente al serializar, de modo que
+los conjuntos de resultados cacheados ocupan mucha menos memoria.
+"""
+import os
+import sys
+from typing import Any, Dict, Iterable, Optional
+
+# Tags que se envían al widget por defecto (el resto solo con include_all_tags)
+PLACE_TAG_WHITELIST = frozenset(
+    tag.strip() for tag in os.getenv(
+        "PLACE_TAG_WHITELIST",
+        "name,amenity,leisure,tourism,shop,building,brand,cuisine,denomination,religion,"
+        "opening_hours,phone,website,wheelchair,addr:street,addr:housenumber,addr:city,addr:postcode"
+    ).split(",") if tag.strip()
+)
+
+
+class Place:
+    """Lugar de OpenStreetMap. Las instancias se comparten entre cachés: no modificarlas."""
+
+    __slots__ = ('name', 'lat', 'lng', 'type', 'tags', 'address', 'osm_id', 'osm_type', 'distance_meters')
+
+    def __init__(
+        self,
+        name: str,
+        lat: float,
+        lng: float,
+        place_type: str,
+        tags: Dict[str, str],
+        address: Optional[str],
+        osm_id: int,
+        osm_type: str,
+        distance_meters: Optional[float] = None
+    ):
+        self.name = name
+        self.lat = lat
+        self.lng = lng
+        self.type = sys.intern(place_type)
+        self.tags = tags
+        self.address = address
+        self.osm_id = osm_id
+        self.osm_type = sys.intern(osm_type)
+        self.distance_meters = distance_meters
+
+    @property
+    def osm_url(self) -> str:
+        """URL de OpenStreetMap."""
+        return f"https://www.openstreetmap.org/{self.osm_type}/{self.osm_id}"
+
+    @property
+    def display_name(self) -> str:
+        """Nombre para mostrar: 'Nombre (tipo) - dirección'."""
+        parts = [self.name]
+        if self.type:
+            parts.append(f"({self.type})")
+        if self.address:
+            parts.append(f"- {self.address}")
+        return ' '.join(parts)
+
+    def with_distance(self, distance_meters: float) -> "Place":
+        """Devuelve una copia con la distancia al centro de una búsqueda concreta."""
+        return Place(
+            self.name, self.lat, self.lng, self.type, self.tags, self.address,
+            self.osm_id, self.osm_type, distance_meters
+        )
+
+    def to_dict(self, include_all_tags: bool = False, tag_whitelist: Iterable[str] = PLACE_TAG_WHITELIST) -> Dict[str, Any]:
+        """
+        Convierte el lugar al formato de la respuesta (el que espera el widget).
+
+        Args:
+            include_all_tags: Si es True se incluyen todos los tags; si no, solo la lista blanca
+            tag_whitelist: Tags que se conservan cuando include_all_tags es False
+
+        Returns:
+            Diccionario serializable a JSON
+        """
+        tags = self.tags if include_all_tags else {
+            key: value for key, value in self.tags.items() if key in tag_whitelist
+        }
+        place = {
+            'name': self.name,
+            'lat': self.lat,
+            'lng': self.lng,
+            'type': self.type,
+            'tags': tags,
+            'address': self.address,
+            'osm_id': self.osm_id,
+            'osm_type': self.osm_type,
+            'osm_url': self.osm_url,
+            'display_name': self.display_name,
+        }
+        if self.distance_meters is not None:
+            place['distance_meters'] = self.distance_meters
+        return place
+
+    def __repr__(self) -> str:
+        return f"Place({self.name!r}, {self.osm_type}/{self.osm_id})"
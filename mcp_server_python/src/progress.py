@@ -0,0 +1,97 @@
+"""
+Notificaciones de progreso de las herramientas MCP.
+
+Las búsquedas reciben un callback opcional (ProgressCallback) al que avisan al
+terminar cada etapa (geocodificación, descarga, ordenación). SseProgressStream
+lo implementa para el transporte Streamable HTTP: convierte cada aviso en una
+notificación JSON-RPC 'notifications/progress' y la envía como evento SSE
+antes de la respuesta final.
+"""
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Union
+
+from .json_payload import dumps_payload
+
+logger = logging.getLogger(__name__)
+
+# callback(mensaje, datos opcionales); los datos con 'searchResults' son resultados anticipados
+ProgressCallback = Callable[[str, Optional[Dict[str, Any]]], Awaitable[None]]
+
+# Método de la notificación con resultados anticipados (los clientes ignoran los que no conocen)
+PARTIAL_RESULTS_METHOD = "notifications/search_places/partial"
+
+
+async def report_progress(
+    progress: Optional[ProgressCallback],
+    message: str,
+    data: Optional[Dict[str, Any]] = None
+) -> None:
+    """Avisa al callback si lo hay; un fallo al notificar no interrumpe la búsqueda."""
+    if progress is None:
+        return
+    try:
+        await progress(message, data)
+    except Exception as e:
+        logger.warning(f"No se pudo enviar el progreso: {e}")
+
+
+def sse_event(message: Any) -> bytes:
+    """Codifica un mensaje JSON-RPC como evento SSE."""
+    return b"event: message\ndata: " + dumps_payload(message) + b"\n\n"
+
+
+class SseProgressStream:
+    """Cola de notificaciones de progreso de una petición servida por SSE."""
+
+    def __init__(self, progress_token: Union[str, int]):
+        """
+        Args:
+            progress_token: progressToken del cliente (params._meta) o, si no lo envía, el id de la petición
+        """
+        self.progress_token = progress_token
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._step = 0
+
+    async def __call__(self, message: str, data: Optional[Dict[str, Any]] = None) -> None:
+        self._step += 1
+        self._queue.put_nowait({
+            "jsonrpc": "2.0",
+            "method": "notifications/progress",
+            "params": {
+                "progressToken": self.progress_token,
+                "progress": self._step,
+                "message": message
+            }
+        })
+        if data:
+            self._queue.put_nowait({
+                "jsonrpc": "2.0",
+                "method": PARTIAL_RESULTS_METHOD,
+                "params": {"progressToken": self.progress_token, **data}
+            })
+
+    async def events(self, response: "asyncio.Future[Any]") -> AsyncIterator[bytes]:
+        """
+        Emite las notificaciones según llegan y, al final, la respuesta JSON-RPC.
+
+        Args:
+            response: Tarea que produce la respuesta final de la petición
+        """
+        try:
+            while True:
+                get_message = asyncio.ensure_future(self._queue.get())
+                await asyncio.wait({get_message, response}, return_when=asyncio.FIRST_COMPLETED)
+                if get_message.done():
+                    yield sse_event(get_message.result())
+                    continue
+                get_message.cancel()
+                break
+            # Vaciar las notificaciones pendientes antes de la respuesta
+            while not self._queue.empty():
+                yield sse_event(self._queue.get_nowait())
+            yield sse_event(response.result())
+        finally:
+            # Si el cliente se desconecta, no seguir trabajando para nadie
+            if not response.done():
+                response.cancel()
@@ -0,0 +1,103 @@
+"""
+Rate limiter asíncrono (token bucket) compartido por todo el proceso.
+
+Implementa el token bucket como GCRA (Generic Cell Rate Algorithm): cada
+petición reserva su turno de forma síncrona al llegar, por lo que la cola es
+FIFO estricta y no hace falta un bucle de reintentos. Si el turno reservado
+queda más lejos que el tiempo máximo de espera, se rechaza inmediatamente.
+"""
+import asyncio
+import time
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitExceeded(Exception):
+    """Se lanza cuando la espera en cola superaría el máximo permitido."""
+
+
+class AsyncTokenBucket:
+    """Token bucket asíncrono con cola FIFO y rechazo rápido."""
+
+    def __init__(self, rate: float, capacity: int = 1, max_wait: float = 5.0, name: str = "rate_limiter"):
+        """
+        Args:
+            rate: Peticiones por segundo permitidas
+            capacity: Tamaño de ráfaga (tokens acumulables)
+            max_wait: Espera máxima en cola, en segundos, antes de rechazar
+            name: Nombre para logs y métricas
+        """
+        if rate <= 0:
+            raise ValueError("rate debe ser mayor que 0")
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.max_wait = max_wait
+        self.name = name
+        self._interval = 1.0 / rate
+        self._burst_tolerance = (self.capacity - 1) * self._interval
+        # Theoretical arrival time: instante en el que el bucket vuelve a estar vacío
+        self._tat = 0.0
+        self._queue_depth = 0
+        self._max_queue_depth = 0
+        self._acquired = 0
+        self._rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Número de peticiones esperando turno en este momento."""
+        return self._queue_depth
+
+    def _reserve(self, max_wait: float) -> float:
+        """Reserva el siguiente turno y devuelve cuántos segundos hay que esperar."""
+        now = time.monotonic()
+        tat = max(self._tat, now)
+        wait = max(0.0, tat - self._burst_tolerance - now)
+        if wait > max_wait:
+            self._rejected += 1
+            raise RateLimitExceeded(
+                f"Límite de peticiones de {self.name} alcanzado "
+                f"(espera estimada {wait:.1f}s, {self._queue_depth} en cola)"
+            )
+        self._tat = tat + self._interval
+        return wait
+
+    async def acquire(self, max_wait: Optional[float] = None) -> None:
+        """
+        Espera (sin bloquear el event loop) hasta que haya un token disponible.
+
+        Args:
+            max_wait: Espera máxima para esta petición (por defecto self.max_wait)
+
+        Raises:
+            RateLimitExceeded: Si la espera estimada supera max_wait
+        """
+        wait = self._reserve(self.max_wait if max_wait is None else max_wait)
+        self._acquired += 1
+        if wait <= 0:
+            return
+
+        self._queue_depth += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            self._queue_depth -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def stats(self) -> Dict:
+        """Métricas del limitador."""
+        return {
+            "rate": self.rate,
+            "queue_depth": self._queue_depth,
+            "max_queue_depth": self._max_queue_depth,
+            "acquired": self._acquired,
+            "rejected": self._rejected,
+        }
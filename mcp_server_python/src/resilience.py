@@ -0,0 +1,190 @@
+"""
+Primitivas de resiliencia frente a servidores externos.
+
+- UpstreamError: error tipado que indica si merece la pena reintentar y cuándo.
+- CircuitBreaker: deja de enviar peticiones a un endpoint tras varios fallos
+  seguidos y, pasado un tiempo, deja pasar una sola petición de prueba.
+- RetryBudget: presupuesto global de reintentos proporcional al tráfico, para
+  que durante una caída los reintentos no multipliquen la carga.
+- backoff_delay: espera exponencial con jitter completo.
+"""
+import os
+import time
+import random
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))  # segundos abierto
+RETRY_BUDGET_RATIO = float(os.getenv("RETRY_BUDGET_RATIO", "0.2"))  # reintentos por petición
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "0.2"))
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "1.0"))
+RETRY_BACKOFF_CAP = float(os.getenv("RETRY_BACKOFF_CAP", "20.0"))
+
+
+class UpstreamError(Exception):
+    """Error de un servidor externo, con la información necesaria para reintentar."""
+
+    retryable = True
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(UpstreamError):
+    """El circuito está abierto: no se envía la petición."""
+
+    retryable = False
+
+
+class CircuitBreaker:
+    """Circuito cerrado -> abierto tras N fallos seguidos -> semiabierto pasado el timeout."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_RESET_TIMEOUT
+    ):
+        """
+        Args:
+            name: Nombre para logs y métricas
+            failure_threshold: Fallos seguidos que abren el circuito
+            reset_timeout: Segundos que permanece abierto antes de probar de nuevo
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probe_in_flight = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    @property
+    def retry_at(self) -> Optional[float]:
+        """Instante (time.monotonic) en el que el circuito dejará pasar una prueba."""
+        if self._opened_at is None:
+            return None
+        return self._opened_at + self.reset_timeout
+
+    def is_available(self) -> bool:
+        """Indica, sin consumir nada, si ahora se aceptaría una petición."""
+        state = self.state
+        return state == self.CLOSED or (state == self.HALF_OPEN and not self._probe_in_flight)
+
+    def allow_request(self) -> bool:
+        """Reserva el paso de una petición (en semiabierto solo pasa una prueba a la vez)."""
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        if self._opened_at is not None:
+            logger.info(f"Circuito de {self.name} cerrado de nuevo")
+        self._failures = 0
+        self._opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        # Se abre al llegar al umbral, o se reabre si falla la petición de prueba
+        if self._probe_in_flight or (self._opened_at is None and self._failures >= self.failure_threshold):
+            self.times_opened += 1
+            logger.warning(f"Circuito de {self.name} abierto tras {self._failures} fallos seguidos")
+            self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Libera la prueba reservada sin resultado (petición cancelada o error del cliente)."""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+        }
+
+
+class RetryBudget:
+    """Presupuesto de reintentos: cada petición aporta 'ratio' fichas y cada reintento gasta una."""
+
+    def __init__(
+        self,
+        ratio: float = RETRY_BUDGET_RATIO,
+        min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+        max_tokens: float = 10.0
+    ):
+        """
+        Args:
+            ratio: Reintentos permitidos por cada petición original
+            min_per_second: Reintentos por segundo permitidos aunque no haya tráfico
+            max_tokens: Máximo de fichas acumulables
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self.retries = 0
+        self.denied = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_request(self) -> None:
+        """Anota una petición original."""
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        """Gasta una ficha para reintentar; False si el presupuesto está agotado."""
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.retries += 1
+            return True
+        self.denied += 1
+        return False
+
+    def stats(self) -> Dict:
+        self._refill()
+        return {
+            "tokens": round(self._tokens, 2),
+            "retries": self.retries,
+            "denied": self.denied,
+        }
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Espera antes del reintento número 'attempt' (empezando en 1).
+
+    Con 'retry_after' (cabecera Retry-After o slot anunciado por el servidor)
+    se espera eso más un jitter pequeño; si no, backoff exponencial con jitter
+    completo para que los clientes no reintenten todos a la vez.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, RETRY_BACKOFF_BASE)
+    return random.uniform(0, min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * (2 ** attempt)))
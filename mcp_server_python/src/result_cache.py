@@ -0,0 +1,168 @@
+"""
+Caché de resultados de Overpass consciente del radio.
+
+Cada entrada guarda los lugares de una búsqueda (tipos, centro, radio). Una
+búsqueda posterior de los mismos tipos cuyo círculo quede contenido en el de
+una entrada cacheada se responde filtrando por distancia en local, sin
+volver a consultar Overpass.
+"""
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .geo import geohash_encode, geohash_neighbors, haversine_meters
+from .text_utils import fold_text
+from .place import Place
+
+logger = logging.getLogger(__name__)
+
+# Precisión 6 -> celdas de ~1.2 km para agrupar centros de búsqueda
+RESULT_CACHE_GEOHASH_PRECISION = 6
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", "900"))  # 15 minutos
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESULT_CACHE_MAX_ENTRIES_PER_CELL = 4
+# Margen tras caducar durante el que una entrada aún puede servirse si Overpass no responde
+RESULT_CACHE_STALE_TTL = int(os.getenv("RESULT_CACHE_STALE_TTL", "86400"))
+_PLACE_BASE_BYTES = 200  # coste aproximado de un Place (slots) sin tags
+
+
+class _CacheEntry:
+    __slots__ = ("lat", "lng", "radius_meters", "places", "expires_at", "size")
+
+    def __init__(self, lat: float, lng: float, radius_meters: float, places: List[Place], expires_at: float, size: int):
+        self.lat = lat
+        self.lng = lng
+        self.radius_meters = radius_meters
+        self.places = places
+        self.expires_at = expires_at
+        self.size = size
+
+    def contains(self, lat: float, lng: float, radius_meters: float) -> bool:
+        """Indica si el círculo pedido queda dentro del círculo cacheado."""
+        return haversine_meters(self.lat, self.lng, lat, lng) + radius_meters <= self.radius_meters
+
+
+def _estimate_size(places: Sequence[Place]) -> int:
+    """Estimación barata de la memoria ocupada por una lista de lugares."""
+    size = 0
+    for place in places:
+        size += _PLACE_BASE_BYTES
+        for key, value in place.tags.items():
+            size += len(key) + len(str(value)) + 100
+    return size
+
+
+class OverpassResultCache:
+    """Caché (tipos de lugar, celda del centro) -> lugares del mayor radio consultado."""
+
+    def __init__(
+        self,
+        ttl: int = RESULT_CACHE_TTL,
+        max_bytes: int = RESULT_CACHE_MAX_BYTES,
+        precision: int = RESULT_CACHE_GEOHASH_PRECISION,
+        stale_ttl: int = RESULT_CACHE_STALE_TTL
+    ):
+        """
+        Args:
+            ttl: Tiempo de vida de cada entrada, en segundos
+            max_bytes: Presupuesto de memoria aproximado
+            precision: Precisión del geohash usado para agrupar centros
+            stale_ttl: Margen tras caducar en el que una entrada puede servirse con allow_stale
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_bytes = max_bytes
+        self.precision = precision
+        self._entries: "OrderedDict[Tuple[Tuple[str, ...], str], List[_CacheEntry]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _types_key(place_types: Sequence[str]) -> Tuple[str, ...]:
+        return tuple(sorted({fold_text(t) for t in place_types}))
+
+    def lookup(
+        self,
+        place_types: Sequence[str],
+        lat: float,
+        lng: float,
+        radius_meters: float,
+        allow_stale: bool = False
+    ) -> Optional[List[Place]]:
+        """
+        Busca una entrada cuyo círculo contenga el círculo pedido.
+
+        Args:
+            place_types: Tipos de lugar de la búsqueda
+            lat: Latitud del centro
+            lng: Longitud del centro
+            radius_meters: Radio de la búsqueda
+            allow_stale: Aceptar entradas caducadas dentro de stale_ttl (Overpass no disponible)
+
+        Returns:
+            Lugares dentro del radio (sin ordenar), o None si no hay entrada útil
+        """
+        types_key = self._types_key(place_types)
+        now = time.time()
+        min_expires_at = now - self.stale_ttl if allow_stale else now
+        for cell in geohash_neighbors(geohash_encode(lat, lng, self.precision)):
+            key = (types_key, cell)
+            for entry in self._entries.get(key, ()):
+                if entry.expires_at > min_expires_at and entry.contains(lat, lng, radius_meters):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return [
+                        place for place in entry.places
+                        if haversine_meters(lat, lng, place.lat, place.lng) <= radius_meters
+                    ]
+        self.misses += 1
+        return None
+
+    def store(self, place_types: Sequence[str], lat: float, lng: float, radius_meters: float, places: List[Place]) -> None:
+        """
+        Guarda el resultado de una búsqueda.
+
+        Las entradas de la misma celda contenidas en la nueva se descartan, de
+        forma que para cada zona se conserva el mayor radio consultado.
+        """
+        key = (self._types_key(place_types), geohash_encode(lat, lng, self.precision))
+        now = time.time()
+        size = _estimate_size(places)
+        if size > self.max_bytes:
+            return
+        new_entry = _CacheEntry(lat, lng, radius_meters, list(places), now + self.ttl, size)
+
+        kept = []
+        for entry in self._entries.get(key, ()):
+            if entry.expires_at <= now - self.stale_ttl or new_entry.contains(entry.lat, entry.lng, entry.radius_meters):
+                self._bytes -= entry.size
+            else:
+                kept.append(entry)
+        kept.append(new_entry)
+        while len(kept) > RESULT_CACHE_MAX_ENTRIES_PER_CELL:
+            self._bytes -= kept.pop(0).size
+        self._entries[key] = kept
+        self._entries.move_to_end(key)
+        self._bytes += size
+        self._evict()
+
+    def _evict(self) -> None:
+        """Expulsa las celdas menos usadas hasta respetar el presupuesto de memoria."""
+        while self._bytes > self.max_bytes and self._entries:
+            _, entries = self._entries.popitem(last=False)
+            self._bytes -= sum(entry.size for entry in entries)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        """Métricas de la caché."""
+        return {
+            "cells": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
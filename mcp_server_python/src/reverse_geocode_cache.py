@@ -0,0 +1,107 @@
+"""
+Caché de geocodificación inversa cuantizada espacialmente.
+
+Las coordenadas se agrupan por celda geohash; una consulta reutiliza la
+dirección del punto cacheado más cercano (en su celda o en las 8 vecinas)
+siempre que esté dentro de la tolerancia, de modo que clics a pocos metros
+comparten una única llamada a Nominatim.
+"""
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .geo import geohash_encode, geohash_neighbors, haversine_meters
+
+logger = logging.getLogger(__name__)
+
+# Precisión 7 -> celdas de ~150 m; la tolerancia debe ser menor que la celda
+REVERSE_CACHE_GEOHASH_PRECISION = int(os.getenv("REVERSE_CACHE_GEOHASH_PRECISION", "7"))
+REVERSE_CACHE_TOLERANCE_METERS = float(os.getenv("REVERSE_CACHE_TOLERANCE_METERS", "30"))
+REVERSE_CACHE_TTL = int(os.getenv("REVERSE_CACHE_TTL", str(7 * 24 * 3600)))  # 7 días
+REVERSE_CACHE_MAX_CELLS = int(os.getenv("REVERSE_CACHE_MAX_CELLS", "10000"))
+REVERSE_CACHE_MAX_POINTS_PER_CELL = 16
+
+
+class ReverseGeocodeCache:
+    """Caché (lat, lng) -> dirección con reutilización por vecino más cercano."""
+
+    def __init__(
+        self,
+        precision: int = REVERSE_CACHE_GEOHASH_PRECISION,
+        tolerance_meters: float = REVERSE_CACHE_TOLERANCE_METERS,
+        ttl: int = REVERSE_CACHE_TTL,
+        max_cells: int = REVERSE_CACHE_MAX_CELLS
+    ):
+        """
+        Args:
+            precision: Longitud del geohash usado como celda
+            tolerance_meters: Distancia máxima para reutilizar una dirección
+            ttl: Tiempo de vida de cada entrada, en segundos
+            max_cells: Máximo de celdas en memoria (LRU)
+        """
+        self.precision = precision
+        self.tolerance_meters = tolerance_meters
+        self.ttl = ttl
+        self.max_cells = max_cells
+        # (zoom, geohash) -> lista de (lat, lng, dirección, expira_en)
+        self._cells: "OrderedDict[Tuple[int, str], List[Tuple[float, float, str, float]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, lat: float, lng: float, zoom: int) -> Optional[str]:
+        """
+        Busca la dirección cacheada más cercana dentro de la tolerancia.
+
+        Args:
+            lat: Latitud
+            lng: Longitud
+            zoom: Nivel de detalle de la dirección (parámetro zoom de Nominatim)
+
+        Returns:
+            Dirección cacheada, o None si no hay ninguna cerca
+        """
+        now = time.time()
+        best_address = None
+        best_cell = None
+        best_distance = self.tolerance_meters
+        for cell in geohash_neighbors(geohash_encode(lat, lng, self.precision)):
+            points = self._cells.get((zoom, cell))
+            if not points:
+                continue
+            for point_lat, point_lng, address, expires_at in points:
+                if expires_at <= now:
+                    continue
+                distance = haversine_meters(lat, lng, point_lat, point_lng)
+                if distance <= best_distance:
+                    best_distance = distance
+                    best_address = address
+                    best_cell = (zoom, cell)
+
+        if best_address is None:
+            self.misses += 1
+            return None
+        # Marcar la celda como usada recientemente (LRU)
+        self._cells.move_to_end(best_cell)
+        self.hits += 1
+        return best_address
+
+    def set(self, lat: float, lng: float, zoom: int, address: str) -> None:
+        """Guarda la dirección obtenida para unas coordenadas."""
+        key = (zoom, geohash_encode(lat, lng, self.precision))
+        now = time.time()
+        points = [p for p in self._cells.get(key, []) if p[3] > now]
+        points.append((lat, lng, address, now + self.ttl))
+        self._cells[key] = points[-REVERSE_CACHE_MAX_POINTS_PER_CELL:]
+        self._cells.move_to_end(key)
+        while len(self._cells) > self.max_cells:
+            self._cells.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Métricas de la caché."""
+        return {
+            "cells": len(self._cells),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,69 @@
+"""
+Datos del widget para la búsqueda multi-centro (search_places_batch).
+"""
+from typing import Any, Dict, List
+
+
+def batch_search_results(
+    query: str,
+    radius_meters: int,
+    centers: List[Dict[str, Any]],
+    groups: List[Dict[str, Any]],
+    include_all_tags: bool = False,
+    partial: bool = False
+) -> Dict[str, Any]:
+    """
+    Construye los datos del widget para una búsqueda multi-centro.
+    
+    Cada lugar aparece una sola vez en 'places' (con la distancia a su centro
+    más cercano); cada grupo lo referencia por índice con su propia distancia.
+    
+    Args:
+        query: Tipo de lugar buscado
+        radius_meters: Radio alrededor de cada centro
+        centers: Centros tal y como se recibieron (con 'label' opcional)
+        groups: Resultado de OverpassClient.search_places_batch, en el mismo orden
+        include_all_tags: Incluir todos los tags OSM de cada lugar
+        partial: Si algún centro se quedó sin resultados frescos por falta de tiempo
+    
+    Returns:
+        Datos compatibles con los de search_places más 'groups'
+    """
+    places: List[Dict[str, Any]] = []
+    indices: Dict[Any, int] = {}
+    result_groups = []
+    for center, group in zip(centers, groups):
+        result_group: Dict[str, Any] = {
+            "label": center.get("label") or center.get("location_text"),
+            "center": {"lat": group["lat"], "lng": group["lng"]} if "lat" in group else None,
+            "results": []
+        }
+        if group.get("error"):
+            result_group["error"] = group["error"]
+        for place in group.get("places") or []:
+            key = (place.osm_type, place.osm_id)
+            index = indices.get(key)
+            if index is None:
+                index = indices[key] = len(places)
+                places.append(place.to_dict(include_all_tags))
+            elif place.distance_meters < places[index]["distance_meters"]:
+                places[index]["distance_meters"] = place.distance_meters
+            result_group["results"].append({"index": index, "distance_meters": place.distance_meters})
+        result_groups.append(result_group)
+    
+    located = [group["center"] for group in result_groups if group["center"] is not None]
+    return {
+        "places": places,
+        "count": len(places),
+        "total": len(places),
+        "offset": 0,
+        "next_cursor": None,
+        "query": query,
+        "radius_meters": radius_meters,
+        "center": {
+            "lat": sum(center["lat"] for center in located) / len(located),
+            "lng": sum(center["lng"] for center in located) / len(located)
+        } if located else None,
+        "groups": result_groups,
+        "partial": partial
+    }
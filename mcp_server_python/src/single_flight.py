@@ -0,0 +1,108 @@
+"""
+Coalescencia de peticiones idénticas en vuelo ("single flight").
+
+Si llegan varias llamadas con la misma clave mientras la primera sigue en
+curso, solo la primera llega al servidor externo; las demás esperan y
+comparten su resultado (o su excepción). Los callbacks de progreso de todos
+los solicitantes reciben los avisos de la llamada compartida.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+from .progress import ProgressCallback, report_progress
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Agrupa las llamadas concurrentes con la misma clave en una sola."""
+
+    def __init__(self, name: str = "single_flight"):
+        """
+        Args:
+            name: Nombre para logs y métricas
+        """
+        self.name = name
+        self._in_flight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self._listeners: Dict[Hashable, List[ProgressCallback]] = {}
+        self._calls = 0
+        self._coalesced = 0
+
+    async def do(
+        self,
+        key: Hashable,
+        call: Callable[[], Awaitable[T]],
+        progress: Optional[ProgressCallback] = None
+    ) -> T:
+        """
+        Ejecuta call() salvo que ya haya una llamada en curso con la misma clave.
+
+        La llamada se ejecuta en su propia tarea: si el primer solicitante se
+        cancela (p. ej. el cliente se desconecta), los demás siguen esperándola.
+
+        Args:
+            key: Clave que identifica peticiones equivalentes
+            call: Función que lanza la petición real; para repartir su progreso
+                debe usar el callback de progress_for(key)
+            progress: Callback de progreso de este solicitante
+
+        Returns:
+            El resultado de la llamada compartida
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            self._calls += 1
+            self._listeners[key] = []
+            task = asyncio.ensure_future(call())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        else:
+            self._coalesced += 1
+            logger.info(f"{self.name}: petición idéntica en curso, esperando su resultado")
+        listeners = self._listeners[key]
+        if progress is not None:
+            listeners.append(progress)
+        try:
+            return await asyncio.shield(task)
+        finally:
+            if progress is not None:
+                listeners.remove(progress)
+
+    def progress_for(self, key: Hashable) -> ProgressCallback:
+        """
+        Callback que reenvía cada aviso a todos los solicitantes de la llamada en curso.
+
+        Se llama desde call(), cuando la llamada ya está registrada: los
+        solicitantes que se unen después reciben los avisos desde ese momento.
+        """
+        listeners = self._listeners.get(key, [])
+
+        async def fan_out(message: str, data: Optional[Dict[str, Any]] = None) -> None:
+            for listener in list(listeners):
+                await report_progress(listener, message, data)
+
+        return fan_out
+
+    def _finish(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+            del self._listeners[key]
+        # Marcar la excepción como recuperada aunque todos los solicitantes se hayan cancelado
+        if not task.cancelled():
+            task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        """Número de llamadas distintas en curso."""
+        return len(self._in_flight)
+
+    def stats(self) -> Dict:
+        """Métricas de coalescencia."""
+        return {
+            "calls": self._calls,
+            "coalesced": self._coalesced,
+            "in_flight": len(self._in_flight),
+        }
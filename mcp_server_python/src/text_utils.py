@@ -0,0 +1,24 @@
+"""
+Utilidades de normalización de texto (acentos, mayúsculas y espacios).
+"""
+import re
+import unicodedata
+
+_NON_ALNUM_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def strip_accents(text: str) -> str:
+    """Elimina tildes y diacríticos ('cafetería' -> 'cafeteria', 'España' -> 'Espana')."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+
+
+def fold_text(text: str) -> str:
+    """
+    Normaliza un texto para compararlo o usarlo como clave de caché.
+
+    Quita acentos, pasa a minúsculas, sustituye la puntuación por espacios y
+    colapsa los espacios repetidos: "  Plaza de España,  MADRID " -> "plaza de espana madrid".
+    """
+    folded = strip_accents(text).casefold().replace("_", " ")
+    return " ".join(_NON_ALNUM_RE.sub(" ", folded).split())
@@ -0,0 +1,132 @@
+"""
+Caché de POIs por tile slippy-map.
+
+Cada búsqueda se descompone en tiles fijos de zoom TILE_ZOOM; cada tile guarda
+los lugares (de unos tipos concretos) cuyo centro cae dentro de él. Búsquedas
+cercanas de distintos usuarios reutilizan así los mismos tiles aunque sus
+centros no coincidan nunca exactamente.
+"""
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .geo import lnglat_to_tile
+from .text_utils import fold_text
+from .place import Place
+
+logger = logging.getLogger(__name__)
+
+TILE_ZOOM = int(os.getenv("TILE_ZOOM", "15"))  # ~1.2 km en el ecuador, ~0.9 km en Madrid
+TILE_MAX_TILES = int(os.getenv("TILE_MAX_TILES", "16"))  # máximo de tiles por búsqueda
+TILE_CACHE_TTL = int(os.getenv("TILE_CACHE_TTL", "3600"))  # 1 hora
+TILE_CACHE_MAX_TILES = int(os.getenv("TILE_CACHE_MAX_TILES", "20000"))
+# Margen tras caducar durante el que un tile aún puede servirse si Overpass no responde
+TILE_CACHE_STALE_TTL = int(os.getenv("TILE_CACHE_STALE_TTL", "86400"))
+
+TileKey = Tuple[Tuple[str, ...], int, int, int]
+
+
+class TilePoiCache:
+    """Caché (tipos de lugar, z, x, y) -> lugares cuyo centro está en el tile."""
+
+    def __init__(
+        self,
+        zoom: int = TILE_ZOOM,
+        max_tiles_per_search: int = TILE_MAX_TILES,
+        ttl: int = TILE_CACHE_TTL,
+        max_tiles: int = TILE_CACHE_MAX_TILES,
+        stale_ttl: int = TILE_CACHE_STALE_TTL
+    ):
+        """
+        Args:
+            zoom: Nivel de zoom de los tiles
+            max_tiles_per_search: Búsquedas que necesiten más tiles van por consulta circular
+            ttl: Tiempo de vida de cada tile, en segundos
+            max_tiles: Máximo de tiles en memoria (LRU)
+            stale_ttl: Margen tras caducar en el que un tile puede servirse con allow_stale
+        """
+        self.zoom = zoom
+        self.max_tiles_per_search = max_tiles_per_search
+        self.ttl = ttl
+        self.max_tiles = max_tiles
+        self.stale_ttl = stale_ttl
+        self._tiles: "OrderedDict[TileKey, Tuple[float, List[Place]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def types_key(place_types: Sequence[str]) -> Tuple[str, ...]:
+        return tuple(sorted({fold_text(t) for t in place_types}))
+
+    def get_many(
+        self,
+        place_types: Sequence[str],
+        tiles: Iterable[Tuple[int, int]],
+        allow_stale: bool = False
+    ) -> Tuple[List[Place], List[Tuple[int, int]]]:
+        """
+        Recupera los lugares de los tiles cacheados.
+
+        Args:
+            place_types: Tipos de lugar de la búsqueda
+            tiles: Tiles (x, y) necesarios
+            allow_stale: Aceptar tiles caducados dentro de stale_ttl (Overpass no disponible)
+
+        Returns:
+            Tupla (lugares de los tiles cacheados, tiles que faltan)
+        """
+        types_key = self.types_key(place_types)
+        now = time.time()
+        min_expires_at = now - self.stale_ttl if allow_stale else now
+        places: List[Place] = []
+        missing: List[Tuple[int, int]] = []
+        for x, y in tiles:
+            key = (types_key, self.zoom, x, y)
+            entry = self._tiles.get(key)
+            if entry is None or entry[0] <= min_expires_at:
+                self.misses += 1
+                missing.append((x, y))
+                continue
+            self.hits += 1
+            self._tiles.move_to_end(key)
+            places.extend(entry[1])
+        return places, missing
+
+    def put_many(self, place_types: Sequence[str], tiles: Iterable[Tuple[int, int]], places: Iterable[Place]) -> List[Place]:
+        """
+        Reparte los lugares descargados entre los tiles pedidos y los guarda.
+
+        Los lugares cuyo centro cae fuera de los tiles pedidos se descartan: pertenecen
+        a otro tile, que los tendrá (o los descargará) por su cuenta.
+
+        Returns:
+            Lugares asignados a alguno de los tiles pedidos
+        """
+        types_key = self.types_key(place_types)
+        buckets: Dict[Tuple[int, int], List[Place]] = {tile: [] for tile in tiles}
+        for place in places:
+            tile = lnglat_to_tile(place.lat, place.lng, self.zoom)
+            if tile in buckets:
+                buckets[tile].append(place)
+
+        expires_at = time.time() + self.ttl
+        kept: List[Place] = []
+        for (x, y), tile_places in buckets.items():
+            key = (types_key, self.zoom, x, y)
+            self._tiles[key] = (expires_at, tile_places)
+            self._tiles.move_to_end(key)
+            kept.extend(tile_places)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return kept
+
+    def stats(self) -> Dict:
+        """Métricas de la caché."""
+        return {
+            "tiles": len(self._tiles),
+            "zoom": self.zoom,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,111 @@
+"""
+Plantilla del widget HTML compilado.
+
+El index.html de app-ui/dist se lee una sola vez: las rutas de los assets se
+reescriben al cargarlo y el documento se parte alrededor del punto donde se
+inyectan los datos, de forma que cada render es una única concatenación. El
+fichero solo se vuelve a leer cuando cambia su fecha de modificación (por
+ejemplo tras un 'npm run build').
+"""
+import os
+import logging
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+from .json_payload import script_safe
+
+logger = logging.getLogger(__name__)
+
+# Incrustar los resultados en el HTML del widget. Con "0" el widget los lee solo
+# de structuredContent (toolOutput) y el recurso HTML es idéntico en cada llamada.
+WIDGET_INLINE_RESULTS = os.getenv("WIDGET_INLINE_RESULTS", "1") == "1"
+# URL base del servidor (para producción); los assets se sirven desde ella
+WIDGET_SERVER_URL = os.getenv("RENDER_EXTERNAL_URL", "https://mysherlock-mcp.onrender.com")
+
+# Rutas absolutas del build de Vite que se reescriben con la URL base,
+# para que funcionen cuando el HTML se inyecta como recurso
+_ASSET_PREFIXES = ('href="/assets/', 'src="/assets/', 'href="/vite.svg')
+
+
+class WidgetTemplate:
+    """HTML del widget precargado y partido en el punto de inyección de datos."""
+
+    def __init__(self, path: Path, server_url: str = WIDGET_SERVER_URL):
+        """
+        Args:
+            path: Ruta al index.html compilado
+            server_url: URL base con la que se reescriben las rutas de los assets
+        """
+        self.path = Path(path)
+        self.server_url = server_url
+        self._lock = threading.Lock()
+        self._mtime_ns: Optional[int] = None
+        self._parts: Tuple[str, str] = ("", "")
+        self.loads = 0
+
+    def _load(self) -> None:
+        """Lee la plantilla, reescribe los assets y la parte por el punto de inyección."""
+        with open(self.path, "r", encoding="utf-8") as f:
+            html = f.read()
+
+        for prefix in _ASSET_PREFIXES:
+            attribute, path = prefix.split('"', 1)
+            html = html.replace(prefix, f'{attribute}"{self.server_url}{path}')
+
+        # Insertar los datos antes del cierre de </head> o al inicio de <body>
+        if '</head>' in html:
+            index = html.index('</head>')
+        elif '<body>' in html:
+            index = html.index('<body>') + len('<body>')
+        else:
+            # Si no hay head ni body, añadir al inicio
+            index = 0
+        self._parts = (html[:index], html[index:])
+        self.loads += 1
+
+    def _current_parts(self) -> Tuple[str, str]:
+        """Devuelve la plantilla partida, recargándola si el fichero ha cambiado."""
+        mtime_ns = os.stat(self.path).st_mtime_ns
+        if mtime_ns != self._mtime_ns:
+            with self._lock:
+                if mtime_ns != self._mtime_ns:
+                    self._load()
+                    self._mtime_ns = mtime_ns
+                    logger.info(f"Plantilla del widget cargada desde {self.path}")
+        return self._parts
+
+    def render(self, results_json: Optional[str] = None) -> str:
+        """
+        Devuelve el HTML del widget con los datos de búsqueda inyectados.
+
+        Args:
+            results_json: Resultados ya serializados a JSON (None para servir la plantilla sin datos)
+
+        Returns:
+            HTML listo para servir
+
+        Raises:
+            FileNotFoundError: Si el widget no está compilado
+        """
+        head, tail = self._current_parts()
+        if not results_json:
+            return head + tail
+        return "".join((head, _data_script(script_safe(results_json)), tail))
+
+
+def _data_script(results_json: str) -> str:
+    """Script que expone los resultados al widget (el JSON aparece una sola vez)."""
+    return f"""
+<script>
+  // Inyectar datos de búsqueda en el widget
+  window.__MYSHERLOCK_SEARCH_RESULTS__ = {results_json};
+
+  // Configurar toolOutput para el SDK de OpenAI Apps
+  if (typeof window !== 'undefined') {{
+    window.openai = window.openai || {{}};
+    window.openai.toolOutput = window.openai.toolOutput || {{}};
+    window.openai.toolOutput.searchResults = window.__MYSHERLOCK_SEARCH_RESULTS__;
+  }}
+</script>
+"""
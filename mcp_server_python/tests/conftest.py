@@ -0,0 +1,29 @@
+"""
+Configuración común de los tests.
+
+Los tests se ejecutan desde mcp_server_python/ (python -m pytest) e importan
+los módulos igual que main.py: como paquete 'src'.
+"""
+import os
+import sys
+
+import httpx
+import pytest
+
+mcp_server_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if mcp_server_dir not in sys.path:
+    sys.path.insert(0, mcp_server_dir)
+
+from src import http_client  # noqa: E402
+
+
+@pytest.fixture
+def mock_http(monkeypatch):
+    """
+    Sustituye el cliente HTTP compartido por uno que responde con handler(request).
+
+    Uso: mock_http(handler), con handler síncrono o asíncrono que devuelve httpx.Response.
+    """
+    def install(handler):
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    return install
@@ -0,0 +1,95 @@
+"""Tests de la búsqueda adaptativa: ampliación del radio por anillos y condiciones de parada."""
+import asyncio
+import re
+import urllib.parse
+
+import httpx
+
+from src.deadline import Deadline
+from src.endpoint_pool import EndpointPool
+from src.geo import haversine_meters
+from src.overpass_client import OverpassClient
+from src.result_cache import OverpassResultCache
+from src.single_flight import SingleFlight
+
+CENTER = (40.4, -3.7)
+# Una farmacia cada ~100 m hacia el norte
+PHARMACIES = [
+    {"type": "node", "id": i, "lat": CENTER[0] + i * 100 / 111195.0, "lon": CENTER[1],
+     "tags": {"name": f"F{i}", "amenity": "pharmacy"}}
+    for i in range(1, 31)
+]
+_AROUND_RE = re.compile(r"\(around:(\d+),")
+
+
+def _install(mock_http, fail_after=None):
+    queries = []
+
+    def handler(request):
+        query = urllib.parse.unquote_plus(request.content.decode())[len("data="):]
+        queries.append(query)
+        if fail_after is not None and len(queries) > fail_after:
+            return httpx.Response(400, text="error: consulta no válida")
+        radius = max(int(value) for value in _AROUND_RE.findall(query))
+        elements = [
+            element for element in PHARMACIES
+            if haversine_meters(CENTER[0], CENTER[1], element["lat"], element["lon"]) <= radius
+        ]
+        return httpx.Response(200, json={"elements": elements})
+
+    mock_http(handler)
+    return queries
+
+
+def _search(target_count, max_radius_meters=2000, deadline=None):
+    client = OverpassClient(
+        endpoints=EndpointPool(["http://overpass.test/api/interpreter"]),
+        streaming=False,
+        result_cache=OverpassResultCache(),
+        single_flight=SingleFlight("test")
+    )
+    return asyncio.run(client.search_places_adaptive(
+        "farmacias", target_count, *CENTER, radius_meters=250,
+        max_radius_meters=max_radius_meters, deadline=deadline
+    ))
+
+
+def test_expands_until_target_count(mock_http):
+    queries = _install(mock_http)
+    places, radius = _search(target_count=4)
+    assert radius == 500
+    assert [place.name for place in places] == ["F1", "F2", "F3", "F4", "F5"]
+    assert [place.distance_meters for place in places] == sorted(place.distance_meters for place in places)
+    # El segundo paso solo pide el anillo: resta el círculo ya descargado
+    assert len(queries) == 2
+    assert "->.excluded" in queries[1]
+
+
+def test_no_expansion_when_first_radius_is_enough(mock_http):
+    queries = _install(mock_http)
+    places, radius = _search(target_count=2)
+    assert (len(places), radius, len(queries)) == (2, 250, 1)
+
+
+def test_stops_at_max_radius(mock_http):
+    queries = _install(mock_http)
+    places, radius = _search(target_count=100, max_radius_meters=1500)
+    assert radius == 1500
+    assert len(places) == 15
+    assert len(queries) == 4  # 250 -> 500 -> 1000 -> 1500
+
+
+def test_stops_when_the_result_is_already_partial(mock_http):
+    queries = _install(mock_http)
+    deadline = Deadline(10)
+    deadline.mark_partial("overpass")
+    places, radius = _search(target_count=10, deadline=deadline)
+    assert (len(places), radius, len(queries)) == (2, 250, 1)
+
+
+def test_ring_error_keeps_the_current_radius(mock_http):
+    queries = _install(mock_http, fail_after=1)
+    places, radius = _search(target_count=10, deadline=Deadline(10))
+    assert [place.name for place in places] == ["F1", "F2"]
+    assert radius == 250
+    assert len(queries) == 2
@@ -0,0 +1,64 @@
+"""Tests del plazo por llamada: timeouts de etapa, pool de endpoints y aviso de resultado parcial."""
+import asyncio
+
+import pytest
+
+import main
+from src.deadline import Deadline, DeadlineExceeded, stage_timeout
+from src.endpoint_pool import EndpointPool
+from src.place import Place
+from src.resilience import CircuitBreaker
+
+
+def test_stage_timeout_is_capped_by_remaining_time():
+    assert stage_timeout(None, 10) == 10
+    assert stage_timeout(Deadline(60), 10) == 10
+    assert stage_timeout(Deadline(5), 10) <= 5
+    with pytest.raises(DeadlineExceeded):
+        stage_timeout(Deadline(0), 10)
+
+
+def test_mark_partial_keeps_distinct_reasons():
+    deadline = Deadline(10)
+    assert not deadline.partial
+    deadline.mark_partial("overpass")
+    deadline.mark_partial("overpass")
+    deadline.mark_partial("stale_cache")
+    assert deadline.partial_reasons == ["overpass", "stale_cache"]
+
+
+def test_own_deadline_does_not_penalize_endpoints():
+    pool = EndpointPool(["http://a.test", "http://b.test"])
+    tried = []
+
+    async def call(url):
+        tried.append(url)
+        raise DeadlineExceeded("Plazo agotado")
+
+    async def scenario():
+        for _ in range(pool.endpoints[0].breaker.failure_threshold + 1):
+            with pytest.raises(DeadlineExceeded):
+                await pool.run(call, Deadline(10))
+
+    asyncio.run(scenario())
+    # Sin failover: cada llamada prueba un solo endpoint
+    assert len(tried) == pool.endpoints[0].breaker.failure_threshold + 1
+    for endpoint in pool.endpoints:
+        assert endpoint.breaker.state == CircuitBreaker.CLOSED
+        assert endpoint.failures == 0
+        assert endpoint.error_rate == 0.0
+
+
+def test_partial_warning_reaches_the_model(monkeypatch):
+    place = Place("Farmacia Sol", 40.4, -3.7, "pharmacy", {}, None, 1, "node")
+
+    async def search_places(**kwargs):
+        kwargs["deadline"].mark_partial("overpass")
+        return [place.with_distance(10.0)]
+
+    monkeypatch.setattr(main.overpass_client, "search_places", search_places)
+    result = asyncio.run(main.handle_search_places({"query": "farmacias", "lat": 40.4, "lng": -3.7}, deadline=Deadline(10)))
+    texts = [item["text"] for item in result["content"] if item["type"] == "text"]
+    assert len(texts) == 1
+    assert "Farmacia Sol" in texts[0]
+    assert "Aviso: OpenStreetMap no respondió a tiempo" in texts[0]
@@ -0,0 +1,99 @@
+"""Tests del pool de endpoints Overpass: elección por salud, copias (hedging) y failover."""
+import asyncio
+
+import pytest
+
+import src.endpoint_pool as endpoint_pool_module
+from src.endpoint_pool import EndpointPool
+from src.resilience import RetryBudget, UpstreamError
+
+
+class QueryRejected(UpstreamError):
+    retryable = False
+
+
+@pytest.fixture
+def fast_hedge(monkeypatch):
+    monkeypatch.setattr(endpoint_pool_module, "OVERPASS_HEDGE_DEFAULT_DELAY", 0.02)
+    monkeypatch.setattr(endpoint_pool_module, "OVERPASS_HEDGE_MIN_DELAY", 0.0)
+
+
+def test_ranking_prefers_fast_healthy_endpoints():
+    pool = EndpointPool(["http://slow.test", "http://fast.test", "http://failing.test"])
+    slow, fast, failing = pool.endpoints
+    for _ in range(5):
+        slow.record(2.0, ok=True)
+        fast.record(0.5, ok=True)
+        failing.record(0.5, ok=False)
+    failing.record(0.5, ok=True)
+    assert [endpoint.url for endpoint in pool.ranked()] == ["http://fast.test", "http://failing.test", "http://slow.test"]
+
+
+def test_slow_primary_is_hedged_and_the_loser_cancelled(fast_hedge):
+    pool = EndpointPool(["http://a.test", "http://b.test"], retry_budget=RetryBudget())
+    cancelled = []
+
+    async def call(url):
+        if url == "http://a.test":
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                cancelled.append(url)
+                raise
+            return "a"
+        return "b"
+
+    async def scenario():
+        result = await pool.run(call)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "b"
+    assert cancelled == ["http://a.test"]
+    assert (pool.hedged, pool.hedge_wins) == (1, 1)
+    # La cancelación no cuenta como fallo del endpoint lento
+    assert pool.endpoints[0].failures == 0
+
+
+def test_no_hedge_without_retry_budget(fast_hedge):
+    pool = EndpointPool(["http://a.test", "http://b.test"], retry_budget=RetryBudget(ratio=0, max_tokens=0))
+    tried = []
+
+    async def call(url):
+        tried.append(url)
+        await asyncio.sleep(0.05)
+        return url
+
+    assert asyncio.run(pool.run(call)) == "http://a.test"
+    assert tried == ["http://a.test"]
+    assert pool.hedged == 0
+
+
+def test_failed_primary_fails_over_immediately():
+    pool = EndpointPool(["http://a.test", "http://b.test"])
+    tried = []
+
+    async def call(url):
+        tried.append(url)
+        if url == "http://a.test":
+            raise UpstreamError("502")
+        return "ok"
+
+    assert asyncio.run(pool.run(call)) == "ok"
+    assert tried == ["http://a.test", "http://b.test"]
+    assert pool.endpoints[0].failures == 1
+
+
+def test_rejected_query_is_not_retried_elsewhere():
+    pool = EndpointPool(["http://a.test", "http://b.test"])
+    tried = []
+
+    async def call(url):
+        tried.append(url)
+        raise QueryRejected("400 consulta no válida")
+
+    with pytest.raises(QueryRejected):
+        asyncio.run(pool.run(call))
+    assert tried == ["http://a.test"]
+    # Un error de la consulta no penaliza la salud del endpoint
+    assert pool.endpoints[0].failures == 0
@@ -0,0 +1,50 @@
+"""Tests de la caché de geocodificación (memoria LRU + SQLite)."""
+import asyncio
+
+from src.geocode_cache import GeocodeCache
+
+
+def test_persists_results_and_negative_results(tmp_path):
+    db_path = str(tmp_path / "geocode.sqlite3")
+
+    async def scenario():
+        cache = GeocodeCache(db_path)
+        await cache.set_async("Plaza Mayor, Madrid", {"lat": 40.4155, "lng": -3.7074})
+        await cache.set_async("Lugar inexistente", None)
+        cache.close()
+
+        # Una instancia nueva lee de disco; la clave no distingue acentos ni mayúsculas
+        reopened = GeocodeCache(db_path)
+        results = [
+            await reopened.get_async("plaza mayor,  MADRID"),
+            await reopened.get_async("Lugar inexistente"),
+            await reopened.get_async("Otro sitio"),
+        ]
+        stats = reopened.stats()
+        reopened.close()
+        return results, stats
+
+    results, stats = asyncio.run(scenario())
+    assert results == [(True, {"lat": 40.4155, "lng": -3.7074}), (True, None), (False, None)]
+    assert (stats["hits"], stats["negative_hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_expired_entries_are_misses():
+    async def scenario():
+        cache = GeocodeCache(None, ttl=-1)
+        await cache.set_async("Sol", {"lat": 40.41, "lng": -3.70})
+        return await cache.get_async("Sol")
+
+    assert asyncio.run(scenario()) == (False, None)
+
+
+def test_memory_is_lru_bounded():
+    async def scenario():
+        cache = GeocodeCache(None, max_entries=2)
+        await cache.set_async("a", {"lat": 1, "lng": 1})
+        await cache.set_async("b", {"lat": 2, "lng": 2})
+        await cache.get_async("a")
+        await cache.set_async("c", {"lat": 3, "lng": 3})
+        return [(await cache.get_async(text))[0] for text in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [True, False, True]
@@ -0,0 +1,97 @@
+"""Tests del endpoint /mcp: peticiones JSON-RPC 2.0 sueltas, batches y notificaciones."""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+INVALID_REQUEST = -32600
+
+
+@pytest.fixture(scope="module")
+def client():
+    # Sin 'with': no se ejecuta el lifespan (no hace falta red para estos métodos)
+    return TestClient(main.app)
+
+
+def _by_id(responses):
+    return {response["id"]: response for response in responses}
+
+
+def test_single_request(client):
+    response = client.post("/mcp", json={"jsonrpc": "2.0", "id": 1, "method": "tools/list"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == 1
+    assert {tool["name"] for tool in body["result"]["tools"]} >= {"search_places", "reverse_geocode"}
+
+
+def test_parse_error(client):
+    response = client.post("/mcp", content=b'{"jsonrpc": "2.0", "id": 1,', headers={"Content-Type": "application/json"})
+    assert response.json() == {
+        "jsonrpc": "2.0",
+        "id": None,
+        "error": {"code": -32700, "message": "Error de parseo: el cuerpo no es JSON válido"}
+    }
+
+
+@pytest.mark.parametrize("payload", [
+    {"jsonrpc": "2.0", "id": 7},
+    {"jsonrpc": "2.0", "id": 7, "method": 42},
+    {"id": 7, "method": "tools/list"},
+    {"jsonrpc": "1.0", "id": 7, "method": "tools/list"},
+])
+def test_single_invalid_request_keeps_id(client, payload):
+    body = client.post("/mcp", json=payload).json()
+    assert body["id"] == 7
+    assert body["error"]["code"] == INVALID_REQUEST
+
+
+def test_single_notification_has_no_body(client):
+    response = client.post("/mcp", json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+    assert response.status_code == 202
+    assert response.content == b""
+
+
+def test_batch_mixes_responses_and_skips_notifications(client):
+    response = client.post("/mcp", json=[
+        {"jsonrpc": "2.0", "id": 1, "method": "tools/list"},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": "b", "method": "initialize", "params": {}},
+    ])
+    assert response.status_code == 200
+    responses = _by_id(response.json())
+    assert set(responses) == {1, "b"}
+    assert "tools" in responses[1]["result"]
+    assert "serverInfo" in responses["b"]["result"]
+
+
+def test_batch_invalid_entries(client):
+    responses = client.post("/mcp", json=[
+        1,
+        {"jsonrpc": "2.0", "id": 2},
+        {"jsonrpc": "2.0", "method": 3},
+        {"jsonrpc": "2.0", "id": 4, "method": "tools/list"},
+    ]).json()
+    assert len(responses) == 4
+    errors = [response for response in responses if "error" in response]
+    assert {error["error"]["code"] for error in errors} == {INVALID_REQUEST}
+    # Las entradas mal formadas se responden aunque no lleven id (con id null)
+    assert sorted(errors, key=lambda error: str(error["id"]))[0]["id"] == 2
+    assert [error["id"] for error in errors].count(None) == 2
+    assert "result" in _by_id(responses)[4]
+
+
+def test_batch_of_notifications_only(client):
+    response = client.post("/mcp", json=[
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "method": "notifications/cancelled", "params": {"requestId": 1}},
+    ])
+    assert response.status_code == 202
+    assert response.content == b""
+
+
+def test_empty_or_oversized_batch(client):
+    for payload in ([], [{"jsonrpc": "2.0", "id": i, "method": "tools/list"} for i in range(main.MCP_BATCH_MAX_SIZE + 1)]):
+        body = client.post("/mcp", json=payload).json()
+        assert body["id"] is None
+        assert body["error"]["code"] == INVALID_REQUEST
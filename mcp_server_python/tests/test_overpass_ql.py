@@ -0,0 +1,96 @@
+"""Tests del compilador de consultas Overpass QL (escapado y estructura de la consulta)."""
+from src.overpass_ql import (
+    around_area,
+    bbox_area,
+    circle_area,
+    compile_filters,
+    compile_union,
+    escape_regex,
+    escape_string,
+    name_filter,
+    tag_filter,
+)
+
+
+def test_escape_string_quotes_backslashes_and_control_chars():
+    assert escape_string('Bar "El Sol"') == 'Bar \\"El Sol\\"'
+    assert escape_string("a\\b") == "a\\\\b"
+    assert escape_string("a\nb\tc") == "a\\nb\\tc"
+    assert escape_string("café") == "café"
+
+
+def test_escape_string_cannot_close_the_literal():
+    # Un intento de inyección queda dentro del literal
+    value = escape_string('x"];out;node["a')
+    assert '"]' not in value.replace('\\"', "")
+
+
+def test_escape_regex_makes_special_chars_literal():
+    # Primero se escapa para la regex (\.) y después para el literal QL (\\.)
+    assert escape_regex("C.C. Sol") == "C\\\\.C\\\\. Sol"
+    assert escape_regex("a+b(c)") == "a\\\\+b\\\\(c\\\\)"
+    assert escape_regex('[x]|"y"') == '\\\\[x\\\\]\\\\|\\"y\\"'
+
+
+def test_tag_and_name_filters():
+    assert tag_filter("amenity", "cafe") == '["amenity"="cafe"]'
+    assert tag_filter("amenity") == '["amenity"]'
+    # Prefiltro exacto de clave antes de la regex, sin distinguir mayúsculas
+    assert name_filter("sol") == '["name"]["name"~"sol",i]'
+
+
+def test_compile_filters_falls_back_to_generic_keys():
+    assert compile_filters([("amenity", "cafe")], ["  "]) == ['["amenity"="cafe"]']
+    assert compile_filters([], []) == ['["amenity"]', '["leisure"]', '["tourism"]']
+
+
+def test_circle_area_switches_to_bbox_for_large_radius():
+    area, is_bbox = circle_area(40.4168, -3.7038, 500, bbox_radius=3000)
+    assert (area, is_bbox) == ("(around:500,40.4168,-3.7038)", False)
+
+    area, is_bbox = circle_area(40.4168, -3.7038, 5000, bbox_radius=3000)
+    assert is_bbox
+    south, west, north, east = (float(value) for value in area.strip("()").split(","))
+    assert south < 40.4168 < north
+    assert west < -3.7038 < east
+
+
+def test_coordinates_never_use_scientific_notation():
+    assert around_area(0.00000001, -0.0000001, 100.4) == "(around:100,0,-0.0000001)"
+    assert bbox_area((1.5, 2.0, 3.25, 4.0)) == "(1.5,2,3.25,4)"
+
+
+def test_compile_union_one_statement_per_filter_and_area():
+    query = compile_union(
+        ['["amenity"="cafe"]', '["amenity"="bar"]'],
+        ["(around:500,40,-3)"],
+        timeout=25,
+        limit=100,
+        maxsize=1024
+    )
+    assert query == (
+        "[out:json][timeout:25][maxsize:1024];\n"
+        "(\n"
+        '  nwr["amenity"="cafe"](around:500,40,-3);\n'
+        '  nwr["amenity"="bar"](around:500,40,-3);\n'
+        ");\n"
+        "out center tags 100;\n"
+    )
+
+
+def test_compile_union_without_limit_or_maxsize():
+    query = compile_union(['["amenity"]'], ["(1,2,3,4)"], timeout=10, output_mode="meta")
+    assert query.startswith("[out:json][timeout:10];\n")
+    assert query.endswith("out center meta;\n")
+
+
+def test_compile_union_difference_with_excluded_areas():
+    query = compile_union(
+        ['["amenity"="cafe"]'],
+        ["(around:1000,40,-3)"],
+        timeout=25,
+        exclude_areas=["(around:500,40,-3)"]
+    )
+    assert '  nwr["amenity"="cafe"](around:1000,40,-3);\n)->.included;' in query
+    assert '  nwr["amenity"="cafe"](around:500,40,-3);\n)->.excluded;' in query
+    assert "(.included; - .excluded;);\nout center tags;\n" in query
@@ -0,0 +1,137 @@
+"""Tests del parser incremental de respuestas de Overpass, RunningTopK y su uso en OverpassClient."""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from src.deadline import Deadline
+from src.endpoint_pool import EndpointPool
+from src.overpass_client import OverpassClient, is_truncating_remark
+from src.overpass_stream import OverpassElementStream, OverpassStreamError, RunningTopK
+from src.result_cache import OverpassResultCache
+from src.single_flight import SingleFlight
+
+ELEMENTS = [
+    {"type": "node", "id": 1, "lat": 40.4, "lon": -3.7, "tags": {"name": 'Bar "El ] Sol", {x}'}},
+    {"type": "node", "id": 2, "lat": 40.5, "lon": -3.6, "tags": {"name": "Café\\Té ñ \U0001F37A"}},
+    {"type": "way", "id": 3, "center": {"lat": 40.6, "lon": -3.5}, "tags": {"name": "[{\"}]"}},
+]
+
+
+def _response(elements, remark=None) -> bytes:
+    data = {"version": 0.6, "osm3s": {"copyright": "ODbL"}, "elements": elements}
+    if remark is not None:
+        data["remark"] = remark
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _parse_in_chunks(body: bytes, size: int):
+    parser = OverpassElementStream()
+    elements = []
+    for start in range(0, len(body), size):
+        elements.extend(parser.feed(body[start:start + size]))
+    parser.close()
+    return parser, elements
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_chunk_boundaries_anywhere(size):
+    # Con fragmentos de 1 byte se corta dentro de cadenas, escapes y caracteres UTF-8 multibyte
+    parser, elements = _parse_in_chunks(_response(ELEMENTS), size)
+    assert elements == ELEMENTS
+    assert parser.element_count == len(ELEMENTS)
+
+
+def test_every_split_point_inside_strings_and_escapes():
+    body = _response(ELEMENTS)
+    for split in range(1, len(body)):
+        parser = OverpassElementStream()
+        elements = list(parser.feed(body[:split])) + list(parser.feed(body[split:]))
+        parser.close()
+        assert elements == ELEMENTS, split
+
+
+def test_remark_after_elements():
+    parser, elements = _parse_in_chunks(_response(ELEMENTS[:1], remark='runtime error: "Query" timed out'), 5)
+    assert elements == ELEMENTS[:1]
+    assert parser.remark == 'runtime error: "Query" timed out'
+
+
+def test_empty_elements():
+    parser, elements = _parse_in_chunks(_response([]), 3)
+    assert elements == []
+    assert parser.remark is None
+
+
+def test_truncated_response_raises():
+    body = _response(ELEMENTS)
+    parser = OverpassElementStream()
+    elements = list(parser.feed(body[:len(body) // 2]))
+    with pytest.raises(OverpassStreamError):
+        parser.close()
+    assert len(elements) < len(ELEMENTS)
+
+
+def test_running_top_k_keeps_nearest_in_order():
+    top_k = RunningTopK(2)
+    for distance, item in [(5.0, "e"), (1.0, "a"), (3.0, "c"), (2.0, "b"), (4.0, "d")]:
+        top_k.push(distance, item)
+    assert top_k.is_full
+    assert top_k.max_distance == 2.0
+    assert top_k.items() == [(1.0, "a"), (2.0, "b")]
+
+
+def _pharmacies(count):
+    return [
+        {"type": "node", "id": i, "lat": 40.4 + i * 1e-5, "lon": -3.7, "tags": {"name": f"F{i}", "amenity": "pharmacy"}}
+        for i in range(count)
+    ]
+
+
+def _client(streaming):
+    return OverpassClient(
+        endpoints=EndpointPool(["http://overpass.test/api/interpreter"]),
+        streaming=streaming,
+        result_cache=OverpassResultCache(),
+        single_flight=SingleFlight("test")
+    )
+
+
+def test_is_truncating_remark():
+    assert is_truncating_remark("runtime error: Query timed out in \"query\" at line 3 after 25 seconds.")
+    assert is_truncating_remark("runtime error: Query ran out of memory in \"query\" at line 3.")
+    assert not is_truncating_remark("runtime remark: Timeout is 25 and maxsize is 16777216.")
+    assert not is_truncating_remark(None)
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_runtime_error_remark_marks_partial_and_skips_cache(mock_http, streaming):
+    remark = "runtime error: Query ran out of memory in \"query\" at line 3."
+    mock_http(lambda request: httpx.Response(200, content=_response(_pharmacies(3), remark=remark)))
+    client = _client(streaming)
+
+    async def scenario():
+        deadline = Deadline(10)
+        places = await client.search_places("farmacias", 40.4, -3.7, radius_meters=500, limit=10, deadline=deadline)
+        return places, deadline
+
+    places, deadline = asyncio.run(scenario())
+    assert [place.name for place in places] == ["F0", "F1", "F2"]
+    assert deadline.partial_reasons == ["overpass truncado"]
+    # Una búsqueda contenida no debe servirse desde el resultado truncado
+    assert client.result_cache.lookup(["pharmacy"], 40.4, -3.7, 100) is None
+
+
+@pytest.mark.parametrize("streaming", [True, False])
+def test_complete_response_is_cached(mock_http, streaming):
+    mock_http(lambda request: httpx.Response(200, content=_response(_pharmacies(3))))
+    client = _client(streaming)
+
+    async def scenario():
+        deadline = Deadline(10)
+        await client.search_places("farmacias", 40.4, -3.7, radius_meters=500, limit=10, deadline=deadline)
+        return deadline
+
+    assert not asyncio.run(scenario()).partial
+    assert client.result_cache.lookup(["pharmacy"], 40.4, -3.7, 100) is not None
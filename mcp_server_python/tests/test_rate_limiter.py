@@ -0,0 +1,83 @@
+"""Tests del token bucket asíncrono (GCRA): turnos en ráfaga, espera y rechazo rápido."""
+import asyncio
+import time
+
+import pytest
+
+from src.rate_limiter import AsyncTokenBucket, RateLimitExceeded
+
+
+def test_rejects_when_wait_exceeds_max_wait():
+    async def scenario():
+        bucket = AsyncTokenBucket(rate=10, capacity=1, max_wait=0.01)
+        await bucket.acquire()
+        started = time.monotonic()
+        with pytest.raises(RateLimitExceeded):
+            await bucket.acquire()
+        # El rechazo es inmediato: no se espera el turno
+        assert time.monotonic() - started < 0.05
+        return bucket.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["acquired"] == 1
+    assert stats["rejected"] == 1
+
+
+def test_burst_up_to_capacity_then_reject():
+    async def scenario():
+        bucket = AsyncTokenBucket(rate=1, capacity=3, max_wait=0.1)
+        for _ in range(3):
+            await bucket.acquire()
+        with pytest.raises(RateLimitExceeded):
+            await bucket.acquire()
+
+    asyncio.run(scenario())
+
+
+def test_rejection_does_not_reserve_a_turn():
+    async def scenario():
+        bucket = AsyncTokenBucket(rate=20, capacity=1, max_wait=0.0)
+        await bucket.acquire()
+        for _ in range(5):
+            with pytest.raises(RateLimitExceeded):
+                await bucket.acquire()
+        # Los rechazos no alargan la cola: el siguiente turno sigue a un intervalo (50 ms)
+        started = time.monotonic()
+        await bucket.acquire(max_wait=1.0)
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.2
+
+
+def test_per_call_max_wait_overrides_default():
+    async def scenario():
+        bucket = AsyncTokenBucket(rate=20, capacity=1, max_wait=5.0)
+        await bucket.acquire()
+        with pytest.raises(RateLimitExceeded):
+            await bucket.acquire(max_wait=0.0)
+        await bucket.acquire()  # con el máximo por defecto sí espera su turno
+
+    asyncio.run(scenario())
+
+
+def test_waiting_callers_are_served_in_order():
+    async def scenario():
+        bucket = AsyncTokenBucket(rate=50, capacity=1, max_wait=1.0)
+        served = []
+
+        async def caller(index):
+            await bucket.acquire()
+            served.append(index)
+
+        await asyncio.gather(*(caller(index) for index in range(5)))
+        return served, bucket.stats()
+
+    served, stats = asyncio.run(scenario())
+    assert served == [0, 1, 2, 3, 4]
+    assert stats["max_queue_depth"] == 4
+    assert stats["queue_depth"] == 0
+
+
+def test_invalid_rate():
+    with pytest.raises(ValueError):
+        AsyncTokenBucket(rate=0)
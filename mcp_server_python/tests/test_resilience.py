@@ -0,0 +1,138 @@
+"""Tests de circuit breaker, presupuesto de reintentos, backoff y estado de slots de Overpass."""
+import asyncio
+import time
+
+import pytest
+
+import src.resilience as resilience
+from src.endpoint_pool import EndpointPool
+from src.overpass_client import parse_slot_status
+from src.resilience import CircuitBreaker, CircuitOpenError, RetryBudget, UpstreamError, backoff_delay
+
+
+def test_breaker_opens_after_threshold_and_probes_once():
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0.02)
+    for _ in range(2):
+        assert breaker.allow_request()
+        breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+
+    time.sleep(0.03)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # En semiabierto solo pasa una prueba a la vez
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+    assert not breaker.is_available()
+
+
+def test_failed_probe_reopens_and_successful_probe_closes():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.02)
+    breaker.record_failure()
+    time.sleep(0.03)
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+
+    time.sleep(0.03)
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.stats()["consecutive_failures"] == 0
+
+
+def test_released_probe_lets_another_one_through():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.allow_request()
+    breaker.release()
+    assert breaker.allow_request()
+
+
+def test_success_resets_consecutive_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_retry_budget_accounting():
+    budget = RetryBudget(ratio=0.5, min_per_second=0.0, max_tokens=2.0)
+    assert budget.try_withdraw()
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
+    # Cada petición original aporta 'ratio' fichas
+    budget.record_request()
+    assert not budget.try_withdraw()
+    budget.record_request()
+    assert budget.try_withdraw()
+    assert (budget.retries, budget.denied) == (3, 2)
+
+
+def test_retry_budget_is_capped():
+    budget = RetryBudget(ratio=1.0, min_per_second=0.0, max_tokens=1.0)
+    for _ in range(5):
+        budget.record_request()
+    assert budget.try_withdraw()
+    assert not budget.try_withdraw()
+
+
+def test_backoff_delay_bounds():
+    for attempt in range(1, 6):
+        assert 0.0 <= backoff_delay(attempt) <= min(resilience.RETRY_BACKOFF_CAP, resilience.RETRY_BACKOFF_BASE * 2 ** attempt)
+    assert 3.0 <= backoff_delay(1, retry_after=3.0) <= 3.0 + resilience.RETRY_BACKOFF_BASE
+
+
+def test_parse_slot_status():
+    assert parse_slot_status("Connected as: 1\n2 slots available now.\nCurrently running queries") == 0.0
+    status = "0 slots available now.\nSlot available after: 2024-01-01T00:00:10Z, in 7 seconds.\n" \
+             "Slot available after: 2024-01-01T00:00:04Z, in 3 seconds.\n"
+    assert parse_slot_status(status) == 3.0
+    assert parse_slot_status("<html>error</html>") is None
+
+
+def test_pool_retries_with_backoff_within_budget(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0.001)
+    pool = EndpointPool(["http://a.test"], max_retries=2)
+    attempts = []
+
+    async def call(url):
+        attempts.append(url)
+        if len(attempts) < 3:
+            raise UpstreamError("429", retry_after=0.0)
+        return "ok"
+
+    assert asyncio.run(pool.run(call)) == "ok"
+    assert len(attempts) == 3
+    assert pool.retry_budget.retries == 2
+
+
+def test_pool_gives_up_when_budget_is_empty(monkeypatch):
+    monkeypatch.setattr(resilience, "RETRY_BACKOFF_BASE", 0.001)
+    pool = EndpointPool(["http://a.test"], retry_budget=RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=0.0))
+    attempts = []
+
+    async def call(url):
+        attempts.append(url)
+        raise UpstreamError("503")
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(pool.run(call))
+    assert len(attempts) == 1
+
+
+def test_pool_fails_fast_when_every_circuit_is_open():
+    pool = EndpointPool(["http://a.test", "http://b.test"])
+    for endpoint in pool.endpoints:
+        for _ in range(endpoint.breaker.failure_threshold):
+            endpoint.breaker.record_failure()
+
+    async def call(url):
+        raise AssertionError("no debería enviarse nada")
+
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(pool.run(call))
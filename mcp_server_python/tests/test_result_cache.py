@@ -0,0 +1,72 @@
+"""Tests de la caché de resultados de Overpass consciente del radio."""
+from src.place import Place
+from src.result_cache import OverpassResultCache
+
+CENTER = (40.4168, -3.7038)
+
+
+def _place(osm_id, north_meters):
+    # ~111 km por grado de latitud
+    return Place(f"P{osm_id}", CENTER[0] + north_meters / 111195.0, CENTER[1], "pharmacy", {}, None, osm_id, "node")
+
+
+PLACES = [_place(1, 0), _place(2, 300), _place(3, 900)]
+
+
+def test_contained_search_is_filtered_locally():
+    cache = OverpassResultCache()
+    cache.store(["pharmacy"], *CENTER, 1000, PLACES)
+    places = cache.lookup(["pharmacy"], *CENTER, 500)
+    assert [place.name for place in places] == ["P1", "P2"]
+    assert cache.stats()["hits"] == 1
+
+
+def test_offset_center_must_stay_inside_the_cached_circle():
+    cache = OverpassResultCache()
+    cache.store(["pharmacy"], *CENTER, 1000, PLACES)
+    # 300 m al norte: 300 + 600 <= 1000 está contenido; 300 + 800 no
+    north = (CENTER[0] + 300 / 111195.0, CENTER[1])
+    assert [place.name for place in cache.lookup(["pharmacy"], *north, 600)] == ["P1", "P2", "P3"]
+    assert cache.lookup(["pharmacy"], *north, 800) is None
+
+
+def test_larger_radius_or_other_types_miss():
+    cache = OverpassResultCache()
+    cache.store(["pharmacy"], *CENTER, 1000, PLACES)
+    assert cache.lookup(["pharmacy"], *CENTER, 1500) is None
+    assert cache.lookup(["cafe"], *CENTER, 500) is None
+    assert cache.lookup(["pharmacy", "cafe"], *CENTER, 500) is None
+    # El orden de los tipos no importa
+    cache.store(["cafe", "pharmacy"], *CENTER, 1000, PLACES)
+    assert cache.lookup(["pharmacy", "cafe"], *CENTER, 500) is not None
+
+
+def test_larger_entry_replaces_contained_ones():
+    cache = OverpassResultCache()
+    cache.store(["pharmacy"], *CENTER, 500, PLACES[:2])
+    cache.store(["pharmacy"], *CENTER, 1000, PLACES)
+    assert sum(len(entries) for entries in cache._entries.values()) == 1
+    assert len(cache.lookup(["pharmacy"], *CENTER, 950)) == 3
+
+
+def test_expired_entries_only_served_as_stale():
+    cache = OverpassResultCache(ttl=-1, stale_ttl=3600)
+    cache.store(["pharmacy"], *CENTER, 1000, PLACES)
+    assert cache.lookup(["pharmacy"], *CENTER, 500) is None
+    assert len(cache.lookup(["pharmacy"], *CENTER, 500, allow_stale=True)) == 2
+
+
+def test_memory_budget_evicts_least_recently_used_cells():
+    size = OverpassResultCache()
+    size.store(["pharmacy"], *CENTER, 1000, PLACES)
+    one_entry = size.stats()["bytes"]
+
+    cache = OverpassResultCache(max_bytes=one_entry * 2)
+    far = [(CENTER[0] + offset, CENTER[1]) for offset in (0.0, 0.1, 0.2)]
+    cache.store(["pharmacy"], *far[0], 1000, PLACES)
+    cache.store(["pharmacy"], *far[1], 1000, PLACES)
+    cache.lookup(["pharmacy"], *far[0], 10)
+    cache.store(["pharmacy"], *far[2], 1000, PLACES)
+    assert cache.stats()["evictions"] == 1
+    assert cache.lookup(["pharmacy"], *far[0], 10) is not None
+    assert cache.lookup(["pharmacy"], *far[1], 10) is None
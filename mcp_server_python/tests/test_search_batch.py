@@ -0,0 +1,123 @@
+"""Tests de la búsqueda multi-centro: geocodificación de centros, reparto de lugares y resultados parciales."""
+import asyncio
+import re
+import urllib.parse
+
+import httpx
+
+import src.overpass_client as overpass_client_module
+from src.deadline import Deadline
+from src.endpoint_pool import EndpointPool
+from src.nominatim_client import NominatimClient
+from src.overpass_client import OverpassClient
+from src.rate_limiter import AsyncTokenBucket
+from src.result_cache import OverpassResultCache
+from src.single_flight import SingleFlight
+
+# Farmacias cada ~111 m hacia el norte desde (40.4, -3.7)
+PHARMACIES = [
+    {"type": "node", "id": i, "lat": 40.4 + i * 0.001, "lon": -3.7, "tags": {"name": f"F{i}", "amenity": "pharmacy"}}
+    for i in range(20)
+]
+
+
+def _install(mock_http, remark=None):
+    queries = []
+
+    def handler(request):
+        if "nominatim" in request.url.host:
+            index = int(request.url.params["q"].split()[-1])
+            return httpx.Response(200, json=[{"lat": str(40.4 + index * 0.001), "lon": "-3.7", "display_name": "x"}])
+        queries.append(urllib.parse.unquote_plus(request.content.decode())[len("data="):])
+        body = {"elements": PHARMACIES}
+        if remark:
+            body["remark"] = remark
+        return httpx.Response(200, json=body)
+
+    mock_http(handler)
+    return queries
+
+
+def _client(rate=100.0, max_wait=1.0):
+    nominatim = NominatimClient(
+        api_url="http://nominatim.test/search",
+        rate_limiter=AsyncTokenBucket(rate=rate, capacity=1, max_wait=max_wait),
+        single_flight=SingleFlight("test")
+    )
+    return OverpassClient(
+        endpoints=EndpointPool(["http://overpass.test/api/interpreter"]),
+        nominatim_client=nominatim,
+        result_cache=OverpassResultCache(),
+        single_flight=SingleFlight("test")
+    )
+
+
+def test_places_are_assigned_to_every_center_in_range(mock_http):
+    queries = _install(mock_http)
+    client = _client()
+    centers = [{"lat": 40.4, "lng": -3.7}, {"lat": 40.41, "lng": -3.7}, {"lat": 0.0, "lng": 0.0}]
+
+    groups = asyncio.run(client.search_places_batch("farmacias", centers, radius_meters=250, limit_per_center=2))
+
+    # Una sola consulta con un área por centro
+    assert len(queries) == 1
+    assert len(re.findall(r"\(around:250,", queries[0])) == 3
+    assert [place.name for place in groups[0]["places"]] == ["F0", "F1"]
+    assert [place.name for place in groups[1]["places"]] == ["F10", "F9"]
+    assert groups[2]["places"] == []
+    assert round(groups[0]["places"][1].distance_meters) == 111
+
+
+def test_cached_centers_skip_overpass(mock_http):
+    queries = _install(mock_http)
+    client = _client()
+    centers = [{"lat": 40.4, "lng": -3.7}]
+
+    async def scenario():
+        await client.search_places_batch("farmacias", centers, radius_meters=300)
+        # Un radio menor alrededor del mismo centro se sirve desde la caché
+        return await client.search_places_batch("farmacias", centers, radius_meters=150)
+
+    groups = asyncio.run(scenario())
+    assert len(queries) == 1
+    assert [place.name for place in groups[0]["places"]] == ["F0", "F1"]
+
+
+def test_truncated_chunk_is_partial_and_not_cached(mock_http):
+    queries = _install(mock_http, remark="runtime error: Query ran out of memory in \"query\" at line 3.")
+    client = _client()
+    deadline = Deadline(10)
+
+    groups = asyncio.run(client.search_places_batch("farmacias", [{"lat": 40.4, "lng": -3.7}], 250, deadline=deadline))
+
+    assert [place.name for place in groups[0]["places"]] == ["F0", "F1", "F2"]
+    assert deadline.partial_reasons == ["overpass truncado"]
+    assert client.result_cache.lookup(["pharmacy"], 40.4, -3.7, 100) is None
+    assert len(queries) == 1
+
+
+def test_text_centers_are_geocoded_one_at_a_time(mock_http):
+    _install(mock_http)
+    # En paralelo, los últimos superarían la espera máxima del limitador
+    client = _client(rate=50.0, max_wait=0.05)
+    centers = [{"location_text": f"sitio {i}"} for i in range(12)]
+
+    groups = asyncio.run(client.search_places_batch("farmacias", centers, radius_meters=50, deadline=Deadline(30)))
+
+    assert [group.get("error") for group in groups] == [None] * 12
+    assert [group["places"][0].name for group in groups] == [f"F{i}" for i in range(12)]
+
+
+def test_text_centers_beyond_the_budget_come_back_as_errors(mock_http, monkeypatch):
+    _install(mock_http)
+    # Ningún segundo disponible para geocodificar
+    monkeypatch.setattr(overpass_client_module, "BATCH_GEOCODE_RESERVE", 60.0)
+    client = _client()
+    deadline = Deadline(10)
+    centers = [{"location_text": "sitio 1"}, {"lat": 40.4, "lng": -3.7}, {"location_text": "sitio 2"}]
+
+    groups = asyncio.run(client.search_places_batch("farmacias", centers, radius_meters=50, deadline=deadline))
+
+    assert "error" in groups[0] and "error" in groups[2]
+    assert [place.name for place in groups[1]["places"]] == ["F0"]
+    assert "geocodificación de centros incompleta" in deadline.partial_reasons
@@ -0,0 +1,104 @@
+"""Tests de la coalescencia de peticiones idénticas en vuelo."""
+import asyncio
+
+import pytest
+
+from src.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"elements": []}
+
+    async def scenario():
+        results = await asyncio.gather(*(flight.do("q", fetch) for _ in range(5)))
+        return results
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result is results[0] for result in results)
+    assert flight.stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_different_keys_and_later_calls_are_not_coalesced():
+    flight = SingleFlight("test")
+    calls = []
+
+    async def fetch(key):
+        calls.append(key)
+        await asyncio.sleep(0)
+        return key
+
+    async def scenario():
+        first = await asyncio.gather(flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b")))
+        # Terminada la llamada, la misma clave vuelve a ejecutarse
+        second = await flight.do("a", lambda: fetch("a"))
+        return first, second
+
+    assert asyncio.run(scenario()) == (["a", "b"], "a")
+    assert calls == ["a", "b", "a"]
+
+
+def test_exception_is_shared_by_all_waiters():
+    flight = SingleFlight("test")
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("Overpass caído")
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("q", fail) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.in_flight == 0
+
+
+def test_cancelled_first_caller_does_not_cancel_the_others():
+    flight = SingleFlight("test")
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def scenario():
+        first = asyncio.ensure_future(flight.do("q", fetch))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("q", fetch))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_progress_is_sent_to_every_waiter():
+    flight = SingleFlight("test")
+    received = {"first": [], "second": []}
+
+    def listener(name):
+        async def progress(message, data=None):
+            received[name].append(message)
+        return progress
+
+    async def fetch():
+        progress = flight.progress_for("q")
+        await asyncio.sleep(0.01)
+        await progress("1000 elementos", None)
+        return "ok"
+
+    async def scenario():
+        return await asyncio.gather(
+            flight.do("q", fetch, listener("first")),
+            flight.do("q", fetch, listener("second")),
+        )
+
+    assert asyncio.run(scenario()) == ["ok", "ok"]
+    assert received == {"first": ["1000 elementos"], "second": ["1000 elementos"]}
@@ -0,0 +1,57 @@
+"""Tests de la búsqueda por tiles: solo se cachean los tiles de respuestas completas."""
+import asyncio
+
+import httpx
+
+from src.deadline import Deadline
+from src.endpoint_pool import EndpointPool
+from src.overpass_client import OverpassClient
+from src.single_flight import SingleFlight
+from src.tile_cache import TilePoiCache
+
+ELEMENTS = [
+    {"type": "node", "id": 1, "lat": 40.4, "lon": -3.7, "tags": {"name": "F1", "amenity": "pharmacy"}},
+    {"type": "node", "id": 2, "lat": 40.401, "lon": -3.7, "tags": {"name": "F2", "amenity": "pharmacy"}},
+]
+
+
+def _search(mock_http, body):
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=body)
+
+    mock_http(handler)
+    client = OverpassClient(
+        endpoints=EndpointPool(["http://overpass.test/api/interpreter"]),
+        tile_cache=TilePoiCache(),
+        single_flight=SingleFlight("test")
+    )
+
+    async def scenario():
+        deadlines = [Deadline(10), Deadline(10)]
+        results = [
+            await client.search_places("farmacias", 40.4, -3.7, radius_meters=300, limit=10, deadline=deadline)
+            for deadline in deadlines
+        ]
+        return results, deadlines
+
+    results, deadlines = asyncio.run(scenario())
+    return results, deadlines, requests
+
+
+def test_complete_tiles_are_reused(mock_http):
+    results, deadlines, requests = _search(mock_http, {"elements": ELEMENTS})
+    assert [[place.name for place in places] for places in results] == [["F1", "F2"], ["F1", "F2"]]
+    assert len(requests) == 1
+    assert not any(deadline.partial for deadline in deadlines)
+
+
+def test_tiles_with_runtime_error_are_not_cached(mock_http):
+    body = {"elements": ELEMENTS[:1], "remark": "runtime error: Query timed out in \"query\" at line 3 after 25 seconds."}
+    results, deadlines, requests = _search(mock_http, body)
+    assert [place.name for place in results[0]] == ["F1"]
+    # La segunda búsqueda vuelve a pedir los tiles en lugar de servir los incompletos
+    assert len(requests) == 2
+    assert all(deadline.partial_reasons == ["overpass truncado"] for deadline in deadlines)